@@ -1,18 +1,290 @@
+import argparse
 import os
 import json
-import psycopg2
+import datetime
+import hmac
+import secrets
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as GoogleTimeout
+from contextlib import contextmanager
+import httplib2
+from psycopg2.pool import ThreadedConnectionPool
 from flask import Flask, request, redirect
+from waitress import serve
+from google.oauth2.credentials import Credentials
+from google_auth_httplib2 import AuthorizedHttp
 from google_auth_oauthlib.flow import Flow
-from config import DB_CONFIG, GOOGLE_OAUTH_CLIENT_ID
+from googleapiclient.discovery import build_from_document
+from googleapiclient.errors import HttpError
+from config import DB_CONFIG, GOOGLE_OAUTH_CLIENT_ID, GOOGLE_CALENDAR_CONFIG, CALENDAR_WEBHOOK_CONFIG, AUTH_SERVER_CONFIG
+from core.google_calendar import load_discovery_document
 
 app = Flask(__name__)
 
+DISCOVERY = load_discovery_document(GOOGLE_CALENDAR_CONFIG.get("api_root"))
+
 CREDENTIALS_FILE = "credentials/client_secret.json"
 SCOPES = [
     "https://www.googleapis.com/auth/calendar.events",
     "https://www.googleapis.com/auth/calendar.readonly",
 ]
 
+CLIENT_CONFIG = None  # CREDENTIALS_FILE, read on first use
+
+def client_config():
+    global CLIENT_CONFIG
+    if CLIENT_CONFIG is None:
+        with open(CREDENTIALS_FILE) as f:
+            CLIENT_CONFIG = json.load(f)
+    return CLIENT_CONFIG
+
+# Saves a user's tokens and queues an immediate calendar pull (so the bot fetches
+# the calendar now rather than at its next poll) in one round trip. Prepared
+# once per pooled connection. calendar_tokens is created by the bot's
+# migrations (migrations/0001_initial.sql).
+LINK_CALENDAR_SQL = """
+    PREPARE link_calendar (text, text, text, text, text, text, text, timestamp) AS
+    WITH saved AS (
+        INSERT INTO calendar_tokens (user_id, token, refresh_token, token_uri, client_id, client_secret, scopes, expiry)
+        VALUES ($1, $2, $3, $4, $5, $6, $7, $8)
+        ON CONFLICT (user_id) DO UPDATE SET
+            token = EXCLUDED.token,
+            refresh_token = EXCLUDED.refresh_token,
+            token_uri = EXCLUDED.token_uri,
+            client_id = EXCLUDED.client_id,
+            client_secret = EXCLUDED.client_secret,
+            scopes = EXCLUDED.scopes,
+            expiry = EXCLUDED.expiry
+        RETURNING user_id
+    )
+    INSERT INTO calendar_pull_requests (user_id) SELECT user_id FROM saved
+    ON CONFLICT (user_id) DO NOTHING
+"""
+
+class PoolTimeout(Exception):
+    pass
+
+# Routes answer PoolTimeout with a 503 and this Retry-After, so callers
+# (Google's webhook delivery included) back off rather than count a failure
+POOL_RETRY_AFTER = {"Retry-After": "10"}
+
+# psycopg2's pool raises as soon as it is exhausted; here request threads wait
+# up to `timeout` seconds for a connection instead
+class ConnectionPool(ThreadedConnectionPool):
+    def __init__(self, minconn, maxconn, timeout, **kwargs):
+        self._slots = threading.BoundedSemaphore(maxconn)
+        self.timeout = timeout
+        super().__init__(minconn, maxconn, **kwargs)
+
+    def _connect(self, key=None):
+        conn = super()._connect(key)
+        conn.autocommit = True
+        with conn.cursor() as cur:
+            cur.execute(LINK_CALENDAR_SQL)
+        conn.autocommit = False
+        return conn
+
+    @contextmanager
+    def connection(self):
+        if not self._slots.acquire(timeout=self.timeout):
+            raise PoolTimeout(f"no database connection free after {self.timeout}s")
+        try:
+            conn = self.getconn()
+            try:
+                # `with conn` only commits or rolls back; the connection goes back to the pool
+                with conn:
+                    yield conn
+            finally:
+                self.putconn(conn, close=bool(conn.closed))
+        finally:
+            self._slots.release()
+
+_pool = None
+_pool_lock = threading.Lock()
+
+# Created on first use so each worker process gets its own
+def db_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ConnectionPool(
+                AUTH_SERVER_CONFIG["db_pool_min"], AUTH_SERVER_CONFIG["db_pool_max"],
+                AUTH_SERVER_CONFIG["db_pool_timeout"], **DB_CONFIG,
+            )
+        return _pool
+
+def db_connection():
+    return db_pool().connection()
+
+# Calls to Google (token exchange, watch channels) run on a bounded executor:
+# at most google_workers at once, google_queue more waiting, and anything past
+# that is turned away straight away instead of tying up a request thread.
+google_executor = ThreadPoolExecutor(max_workers=AUTH_SERVER_CONFIG["google_workers"], thread_name_prefix="google")
+GOOGLE_SLOTS = AUTH_SERVER_CONFIG["google_workers"] + AUTH_SERVER_CONFIG["google_queue"]
+_google_slots = threading.BoundedSemaphore(GOOGLE_SLOTS)
+_google_calls = 0  # running or queued
+_google_calls_lock = threading.Lock()
+
+class GoogleBusy(Exception):
+    pass
+
+def _google_call_done(_future):
+    global _google_calls
+    with _google_calls_lock:
+        _google_calls -= 1
+    _google_slots.release()
+
+def call_google(fn, *args):
+    global _google_calls
+    if not _google_slots.acquire(blocking=False):
+        raise GoogleBusy()
+    with _google_calls_lock:
+        _google_calls += 1
+    try:
+        future = google_executor.submit(fn, *args)
+    except BaseException:
+        _google_call_done(None)
+        raise
+    # The slot is held until the call really ends, even if we stop waiting for it
+    future.add_done_callback(_google_call_done)
+    return future.result(timeout=AUTH_SERVER_CONFIG["google_timeout"])
+
+def exchange_code(code):
+    flow = Flow.from_client_config(client_config(), scopes=SCOPES, redirect_uri=AUTH_SERVER_CONFIG["redirect_uri"])
+    flow.fetch_token(code=code)
+    return flow.credentials
+
+def calendar_service(credentials):
+    http = AuthorizedHttp(credentials, http=httplib2.Http(timeout=GOOGLE_CALENDAR_CONFIG.get("http_timeout", 30)))
+    return build_from_document(DISCOVERY, http=http)
+
+# Opens an events.watch channel on the user's primary calendar; save_watch()
+# records it. Google echoes the random token in every notification, which is how
+# the webhook tells real notifications from forged ones. The initial "sync"
+# message can arrive before the row commits and be rejected; it carries no change anyway.
+def open_watch(credentials):
+    channel_id = uuid.uuid4().hex
+    token = secrets.token_urlsafe(32)
+    channel = calendar_service(credentials).events().watch(calendarId="primary", body={
+        "id": channel_id,
+        "type": "web_hook",
+        "address": CALENDAR_WEBHOOK_CONFIG["address"],
+        "token": token,
+        "params": {"ttl": str(CALENDAR_WEBHOOK_CONFIG["ttl_seconds"])},
+    }).execute()
+    expiration = datetime.datetime.fromtimestamp(int(channel["expiration"]) / 1000, datetime.timezone.utc)
+    return channel_id, channel["resourceId"], token, expiration
+
+def save_watch(cur, user_id, watch):
+    channel_id, resource_id, token, expiration = watch
+    cur.execute("""
+        INSERT INTO calendar_watch_channels (channel_id, user_id, resource_id, token, expiration)
+        VALUES (%s, %s, %s, %s, %s)
+    """, (channel_id, user_id, resource_id, token, expiration))
+
+def stop_watch(credentials, channel_id, resource_id):
+    try:
+        calendar_service(credentials).channels().stop(body={"id": channel_id, "resourceId": resource_id}).execute()
+    except HttpError:
+        pass  # already expired or stopped
+
+# Channels are renewed RENEW_BATCH at a time. Each batch is claimed for long
+# enough to make all of its Google calls, so a slow Google never keeps a row
+# locked or a pooled connection busy, and several auth_server processes can
+# renew at once without renewing a channel twice.
+RENEW_BATCH = 20
+
+CLAIM_RENEWALS_SQL = """
+    WITH claimed AS (
+        UPDATE calendar_watch_channels w SET renewing_until = now() + %(lease)s * interval '1 second'
+        FROM (
+            SELECT channel_id FROM calendar_watch_channels
+            WHERE expiration < now() + %(renew_before)s * interval '1 second'
+              AND (renewing_until IS NULL OR renewing_until < now())
+            ORDER BY expiration
+            LIMIT %(batch)s
+            FOR UPDATE SKIP LOCKED
+        ) due
+        WHERE w.channel_id = due.channel_id
+        RETURNING w.channel_id, w.user_id, w.resource_id, w.renewing_until
+    )
+    SELECT c.channel_id, c.user_id, c.resource_id, c.renewing_until,
+           t.token, t.refresh_token, t.token_uri, t.client_id, t.client_secret, t.scopes, t.expiry
+    FROM claimed c
+    LEFT JOIN calendar_tokens t ON t.user_id = c.user_id
+"""
+
+# Replaces channels expiring within renew_before_seconds: claim a batch and
+# commit, call Google through call_google() with no connection held, then write
+# each result back in its own short transaction
+def renew_expiring_channels():
+    renewed = 0
+    lease = RENEW_BATCH * 2 * AUTH_SERVER_CONFIG["google_timeout"]  # a watch and a stop per channel
+    while True:
+        with db_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute(CLAIM_RENEWALS_SQL, {
+                    "lease": lease, "renew_before": CALENDAR_WEBHOOK_CONFIG["renew_before_seconds"], "batch": RENEW_BATCH,
+                })
+                claimed = cur.fetchall()
+        for row in claimed:
+            renewed += renew_channel(*row)
+        if len(claimed) < RENEW_BATCH:
+            return renewed
+
+def renew_channel(channel_id, user_id, resource_id, claim, token, refresh_token, token_uri, client_id, client_secret, scopes, expiry):
+    if refresh_token is None:
+        # Unlinked since; nothing left to watch
+        with db_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute("DELETE FROM calendar_watch_channels WHERE channel_id = %s AND renewing_until = %s", (channel_id, claim))
+        return 0
+    credentials = Credentials(
+        token=token, refresh_token=refresh_token, token_uri=token_uri, client_id=client_id,
+        client_secret=client_secret, scopes=scopes.split(), expiry=expiry,
+    )
+    try:
+        watch = call_google(open_watch, credentials)
+    except Exception as e:
+        # Keep the old row; it is retried once the claim runs out
+        print(f"⚠️ Could not renew calendar channel for {user_id}: {e!r}")
+        return 0
+
+    with db_connection() as conn:
+        with conn.cursor() as cur:
+            # Only while the claim is still ours: past it, another process may be renewing too
+            cur.execute("DELETE FROM calendar_watch_channels WHERE channel_id = %s AND renewing_until = %s", (channel_id, claim))
+            replaced = cur.rowcount > 0
+            if replaced:
+                save_watch(cur, user_id, watch)
+                if credentials.token != token:
+                    cur.execute(
+                        "UPDATE calendar_tokens SET token = %s, expiry = %s WHERE user_id = %s",
+                        (credentials.token, credentials.expiry, user_id),
+                    )
+    # Stop whichever channel is no longer recorded
+    stale = (channel_id, resource_id) if replaced else watch[:2]
+    try:
+        call_google(stop_watch, credentials, *stale)
+    except Exception as e:
+        print(f"⚠️ Could not stop calendar channel {stale[0]} for {user_id}: {e!r}")
+    return int(replaced)
+
+def start_channel_renewal():
+    def run():
+        while True:
+            try:
+                renewed = renew_expiring_channels()
+                if renewed:
+                    print(f"🔁 Renewed {renewed} calendar watch channel(s)")
+            except Exception as e:
+                print(f"⚠️ Calendar channel renewal failed: {e}")
+            time.sleep(CALENDAR_WEBHOOK_CONFIG["renew_check_seconds"])
+
+    threading.Thread(target=run, name="channel-renewal", daemon=True).start()
+
 @app.route("/")
 def index():
     # If it has code+state, forward to actual token handler
@@ -28,49 +300,114 @@ def oauth2callback():
     if not code or not state:
         return "Missing code or state", 400
 
-    flow = Flow.from_client_secrets_file(
-        CREDENTIALS_FILE,
-        scopes=SCOPES,
-        redirect_uri="http://localhost:8080/oauth2callback"  # ← THIS MUST MATCH EXACTLY
-    )
-    flow.fetch_token(code=code)
-    credentials = flow.credentials
+    try:
+        credentials = call_google(exchange_code, code)
+    except GoogleBusy:
+        return "⏳ Lots of people are linking right now. Please refresh this page in a minute.", 503, {"Retry-After": "30"}
+    except GoogleTimeout:
+        return "⏳ Google took too long to answer. Please refresh this page to try again.", 504
+    except Exception as e:
+        print(f"⚠️ Token exchange failed for {state}: {e}")
+        return "❌ Could not link your Google Calendar. Run /setup_calendar again for a fresh link.", 400
 
-    with psycopg2.connect(**DB_CONFIG) as conn:
-        with conn.cursor() as cur:
-            cur.execute("""
-                CREATE TABLE IF NOT EXISTS calendar_tokens (
-                    user_id TEXT PRIMARY KEY,
-                    token TEXT,
-                    refresh_token TEXT,
-                    token_uri TEXT,
-                    client_id TEXT,
-                    client_secret TEXT,
-                    scopes TEXT
-                )
-            """)
-            cur.execute("""
-                INSERT INTO calendar_tokens (user_id, token, refresh_token, token_uri, client_id, client_secret, scopes)
-                VALUES (%s, %s, %s, %s, %s, %s, %s)
-                ON CONFLICT (user_id) DO UPDATE SET
-                    token = EXCLUDED.token,
-                    refresh_token = EXCLUDED.refresh_token,
-                    token_uri = EXCLUDED.token_uri,
-                    client_id = EXCLUDED.client_id,
-                    client_secret = EXCLUDED.client_secret,
-                    scopes = EXCLUDED.scopes
-            """, (
-                state,
-                credentials.token,
-                credentials.refresh_token,
-                credentials.token_uri,
-                credentials.client_id,
-                credentials.client_secret,
-                " ".join(credentials.scopes)
-            ))
-            conn.commit()
+    try:
+        with db_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute("EXECUTE link_calendar (%s, %s, %s, %s, %s, %s, %s, %s)", (
+                    state,
+                    credentials.token,
+                    credentials.refresh_token,
+                    credentials.token_uri,
+                    credentials.client_id,
+                    credentials.client_secret,
+                    " ".join(credentials.scopes),
+                    credentials.expiry
+                ))
+                old_channels = []
+                if CALENDAR_WEBHOOK_CONFIG["address"]:
+                    # A relink replaces the user's channel rather than adding another
+                    cur.execute(
+                        "DELETE FROM calendar_watch_channels WHERE user_id = %s RETURNING channel_id, resource_id",
+                        (state,),
+                    )
+                    old_channels = cur.fetchall()
+    except PoolTimeout:
+        # The code is spent, so a refresh would fail; the user needs a new link
+        return "⏳ The server is busy. Please run /setup_calendar again in a minute.", 503, POOL_RETRY_AFTER
+
+    # Google calls happen after the commit so no connection is held while they run
+    if CALENDAR_WEBHOOK_CONFIG["address"]:
+        try:
+            for channel_id, resource_id in old_channels:
+                call_google(stop_watch, credentials, channel_id, resource_id)
+            watch = call_google(open_watch, credentials)
+            with db_connection() as conn:
+                with conn.cursor() as cur:
+                    save_watch(cur, state, watch)
+        except Exception as e:
+            print(f"⚠️ Could not watch calendar for {state}, falling back to polling: {e!r}")
 
     return "✅ Google Calendar successfully linked. You can return to Discord."
 
+# For load balancers and process supervisors: 200 while the database answers
+@app.route("/healthz")
+def healthz():
+    try:
+        with db_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1")
+        database = "ok"
+    except Exception as e:
+        database = f"error: {e}"
+    body = {
+        "status": "ok" if database == "ok" else "error",
+        "database": database,
+        "google_calls": _google_calls,
+        "google_capacity": GOOGLE_SLOTS,
+    }
+    return body, 200 if database == "ok" else 503
+
+# Google posts here whenever a watched calendar changes. The body is empty; the
+# headers say which channel fired. Only the owning user gets a pull queued.
+@app.route("/calendar/notifications", methods=["POST"])
+def calendar_notification():
+    channel_id = request.headers.get("X-Goog-Channel-ID")
+    resource_id = request.headers.get("X-Goog-Resource-ID")
+    token = request.headers.get("X-Goog-Channel-Token", "")
+    state = request.headers.get("X-Goog-Resource-State")
+    if not channel_id or not resource_id:
+        return "Missing channel headers", 400
+
+    try:
+        with db_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute(
+                    "SELECT user_id, resource_id, token FROM calendar_watch_channels WHERE channel_id = %s",
+                    (channel_id,),
+                )
+                row = cur.fetchone()
+                # compare_digest only takes ASCII str, and the header can be anything
+                if row is None or row[1] != resource_id or not hmac.compare_digest(row[2].encode(), token.encode()):
+                    return "Unknown channel", 403
+                # "sync" only confirms a new channel; nothing changed yet
+                if state != "sync":
+                    cur.execute(
+                        "INSERT INTO calendar_pull_requests (user_id) VALUES (%s) ON CONFLICT (user_id) DO NOTHING",
+                        (row[0],),
+                    )
+    except PoolTimeout:
+        return "Busy", 503, POOL_RETRY_AFTER
+
+    return "", 204
+
 if __name__ == "__main__":
-    app.run(port=8080, debug=True)
+    parser = argparse.ArgumentParser(description="Serve the Google OAuth callback and calendar webhooks")
+    parser.add_argument("--dev", action="store_true", help="use Flask's debug server with the reloader")
+    args = parser.parse_args()
+    if CALENDAR_WEBHOOK_CONFIG["address"]:
+        start_channel_renewal()
+    if args.dev:
+        app.run(port=AUTH_SERVER_CONFIG["port"], debug=True)
+    else:
+        print(f"✅ Auth server on {AUTH_SERVER_CONFIG['host']}:{AUTH_SERVER_CONFIG['port']} with {AUTH_SERVER_CONFIG['threads']} threads")
+        serve(app, host=AUTH_SERVER_CONFIG["host"], port=AUTH_SERVER_CONFIG["port"], threads=AUTH_SERVER_CONFIG["threads"])
@@ -1,138 +1,161 @@
 # Let's start restructuring the bot into a modular format using cogs.
 # First, create the main bot file that sets up and loads cogs.
 
-from discord.ext import commands, tasks
+from discord.ext import tasks
 from discord import app_commands
 import discord
+import argparse
 import asyncio
-import psycopg2
-from psycopg2.extras import RealDictCursor
-from config import DISCORD_TOKEN, DB_CONFIG, DEBUG_GUILD_ID
-
-# --- DB Setup ---
-def get_connection():
-    return psycopg2.connect(**DB_CONFIG)
-
-def init_db():
-    with get_connection() as conn:
-        with conn.cursor() as cur:
-            # Task list table
-            cur.execute("""
-                CREATE TABLE IF NOT EXISTS tasks (
-                    id SERIAL PRIMARY KEY,
-                    user_id TEXT,
-                    description TEXT,
-                    schedule_time TIME,
-                    schedule_date DATE,
-                    duration_minutes INTEGER DEFAULT 15,
-                    location TEXT,
-                    priority BOOLEAN DEFAULT FALSE,
-                    deadline TIMESTAMP,
-                    mirrored_users TEXT[],
-                    due_time TIMESTAMP,
-                    start_time TIMESTAMP,
-                    stop_time TIMESTAMP,
-                    status TEXT DEFAULT 'pending',
-                    num_sessions INTEGER DEFAULT 0,
-                    actual_duration FLOAT DEFAULT 0
-                )
-            """)
-            # Patch in missing columns for existing installs (For development - remove for production)
-            cur.execute("ALTER TABLE tasks ADD COLUMN IF NOT EXISTS schedule_time TIME;")
-            cur.execute("ALTER TABLE tasks ADD COLUMN IF NOT EXISTS schedule_date DATE;")
-            cur.execute("ALTER TABLE tasks ADD COLUMN IF NOT EXISTS duration_minutes INTEGER DEFAULT 15;")
-            cur.execute("ALTER TABLE tasks ADD COLUMN IF NOT EXISTS location TEXT;")
-            cur.execute("ALTER TABLE tasks ADD COLUMN IF NOT EXISTS priority BOOLEAN DEFAULT FALSE;")
-            cur.execute("ALTER TABLE tasks ADD COLUMN IF NOT EXISTS deadline TIMESTAMP;")
-            cur.execute("ALTER TABLE tasks ADD COLUMN IF NOT EXISTS mirrored_users TEXT[];")
-            cur.execute("ALTER TABLE tasks ADD COLUMN IF NOT EXISTS due_time TIMESTAMP;")
-            cur.execute("ALTER TABLE tasks ADD COLUMN IF NOT EXISTS start_time TIMESTAMP;")
-            cur.execute("ALTER TABLE tasks ADD COLUMN IF NOT EXISTS stop_time TIMESTAMP;")
-            cur.execute("ALTER TABLE tasks ADD COLUMN IF NOT EXISTS status TEXT DEFAULT 'pending';")
-            cur.execute("ALTER TABLE tasks ADD COLUMN IF NOT EXISTS num_sessions INTEGER DEFAULT 0;")
-            cur.execute("ALTER TABLE tasks ADD COLUMN IF NOT EXISTS actual_duration FLOAT DEFAULT 0;")
-
-            # User settings table
-            cur.execute("""
-                CREATE TABLE IF NOT EXISTS settings (
-                    guild_id TEXT PRIMARY KEY,
-                    reminder_channel_id TEXT
-                )
-            """)
-
-            # User preferences table
-            cur.execute("""
-                CREATE TABLE IF NOT EXISTS user_preferences (
-                    user_id TEXT PRIMARY KEY,
-                    work_start TIME DEFAULT '09:00',
-                    work_end TIME DEFAULT '17:00',
-                    lunch_duration_minutes INTEGER DEFAULT 30,
-                    time_zone TEXT DEFAULT 'GMT',
-                    lunch_window_start TIME DEFAULT '12:00',
-                    lunch_window_end TIME DEFAULT '14:00'
-                )
-            """)
-
-            # Task metrics table
-            cur.execute("""
-                CREATE TABLE IF NOT EXISTS task_metrics (
-                    task_id INTEGER PRIMARY KEY REFERENCES tasks(id) ON DELETE CASCADE,
-                    total_time_minutes INTEGER DEFAULT 0,
-                    sessions_count INTEGER DEFAULT 0,
-                    delayed_count INTEGER DEFAULT 0,
-                    estimated_vs_actual_ratio FLOAT
-                )
-            """)
-
-            # Google Calendar OAuth token storage
-            cur.execute("""
-                CREATE TABLE IF NOT EXISTS calendar_tokens (
-                    user_id TEXT PRIMARY KEY,
-                    token TEXT,
-                    refresh_token TEXT,
-                    token_uri TEXT,
-                    client_id TEXT,
-                    client_secret TEXT,
-                    scopes TEXT
-                )
-            """)
-            conn.commit()
-
-
+import sys
+import time
+from config import DISCORD_TOKEN, DEBUG_GUILD_ID, COMMAND_SYNC_MODE, GOOGLE_CALENDAR_CONFIG, CALENDAR_SYNC_CONFIG, REMINDER_CONFIG, CLUSTER_CONFIG, JOB_CONFIG, MEMBER_INDEX_CONFIG
+from core.db import open_pool
+from core.migrations import migrate
+from core.command_sync import sync_if_changed
+from core.drafts import create_draft_store
+from core.preference_cache import PreferencesCache
+from core.view_cache import ViewCache
+from core.member_index import MemberIndex
+from core.task_index import TaskIndex
+from core.google_calendar import CalendarClient
+from core.calendar_sync import CalendarSync
+from core.reminders import ReminderScheduler
+from core.cluster import ClusterBot, Supervisor, READY_PREFIX, shard_ranges
+from core.jobs import JobRunner, exclusive
+
+# psycopg's async driver can't run on the Proactor loop Windows uses by default
+if sys.platform == "win32":
+    asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
 
 intents = discord.Intents.default()
 intents.messages = True
 intents.guilds = True
 intents.dm_messages = True
-
-bot = commands.Bot(command_prefix="!", intents=intents)
+intents.members = True  # privileged: member join/update/leave events and fetch_members for the member index
+
+# `--cluster` is passed by the supervisor to the processes it starts (core/cluster.py)
+parser = argparse.ArgumentParser(description="Run the bot, or a supervisor for several bot clusters")
+parser.add_argument("--clusters", type=int, default=CLUSTER_CONFIG["clusters"])
+parser.add_argument("--cluster", type=int, help="run this cluster's shards only")
+parser.add_argument("--shard-count", type=int, default=CLUSTER_CONFIG["shard_count"])
+parser.add_argument("--identify-concurrency", type=int)
+args = parser.parse_args()
+
+if args.clusters > 1 and args.cluster is None:
+    supervisor = Supervisor(
+        args.clusters, shard_count=args.shard_count, identify_concurrency=args.identify_concurrency,
+        restart_delay=CLUSTER_CONFIG["restart_delay_seconds"],
+        max_restart_delay=CLUSTER_CONFIG["max_restart_delay_seconds"],
+        stable_after=CLUSTER_CONFIG["stable_after_seconds"],
+    )
+    try:
+        asyncio.run(supervisor.run(DISCORD_TOKEN))
+    except KeyboardInterrupt:
+        pass
+    sys.exit(0)
+
+clustered = args.cluster is not None
+bot = ClusterBot(
+    command_prefix="!", intents=intents,
+    chunk_guilds_at_startup=False,  # member search uses core/member_index.py, not the member cache
+    shard_ids=shard_ranges(args.shard_count, args.clusters)[args.cluster] if clustered else None,
+    shard_count=args.shard_count,
+    cluster_id=args.cluster or 0,
+    identify_concurrency=args.identify_concurrency or 1,
+)
+
+EXTENSIONS = [
+    "cogs.tasks",
+    "cogs.todo_modal",
+    "cogs.members",
+    "cogs.list_modal",
+    "cogs.search",
+    "cogs.transfer",
+    "cogs.calendar_oauth",
+    "cogs.calendar_ui",
+    "cogs.calendar_push_test",
+    "cogs.calendar_sync",
+    "cogs.reminders",
+    "cogs.schedule",
+    "cogs.report",
+    "cogs.charts",
+    "cogs.preferences",
+]
 
 @bot.event
 async def setup_hook():
-    
-    init_db()
+    # One pool for the whole bot; cogs reach it through `bot.db`
+    phase = time.perf_counter()
+    bot.db = await open_pool()
+    await migrate(bot.db)
+    bot.drafts = create_draft_store(bot.db, shared=clustered)
+    bot.preferences = PreferencesCache(bot.db)
+    bot.preferences.start()
+    bot.views = ViewCache()  # rendered /calendar_week embeds
+    bot.views.start()
+    bot.task_index = TaskIndex(bot.db)  # task autocomplete for /start, /finish, /delay and /edit
+    bot.task_index.start()
+    bot.members = MemberIndex(bot.db, **MEMBER_INDEX_CONFIG)  # started by cogs/members.py
+    bot.calendar = CalendarClient(bot.db, **GOOGLE_CALENDAR_CONFIG)
+    # Background jobs run in every process, each on the users whose partitions
+    # it holds; the runner starts handing out partitions once the cogs are loaded
+    bot.jobs = JobRunner(**JOB_CONFIG)
+    bot.calendar_sync = CalendarSync(
+        bot.db, bot.calendar, bot.preferences,
+        batch_size=CALENDAR_SYNC_CONFIG["batch_size"],
+        max_concurrency=CALENDAR_SYNC_CONFIG["max_concurrency"],
+        jobs=bot.jobs,
+    )
+    bot.calendar_sync.start()  # drains webhook pull requests
+    bot.reminders = ReminderScheduler(bot.db, **REMINDER_CONFIG, jobs=bot.jobs)  # started by cogs/reminders.py
+    print(f"⏱️ DB init: {time.perf_counter() - phase:.2f}s")
 
     # Debug
     guild = discord.Object(id=DEBUG_GUILD_ID)
 
     # Clear and re-register commands for this guild only
     bot.tree.clear_commands(guild=guild)
-    await bot.load_extension("cogs.tasks")
-    await bot.load_extension("cogs.todo_modal")
-    await bot.load_extension("cogs.list_modal")
-    await bot.load_extension("cogs.calendar_oauth")
-    await bot.load_extension("cogs.calendar_ui")
-    await bot.load_extension("cogs.calendar_push_test")
-    await bot.load_extension("cogs.preferences")
-    await bot.tree.sync()
-    await bot.tree.sync(guild=guild)
-    print("Commands synced.")    
+    phase = time.perf_counter()
+    for extension in EXTENSIONS:
+        await bot.load_extension(extension)
+    print(f"⏱️ Extensions loaded: {time.perf_counter() - phase:.2f}s")
+    bot.jobs.start()
+
+    # "auto" only syncs a scope whose command tree hash changed since the last sync.
+    # Commands are application-wide, so one process syncs while the rest skip.
+    phase = time.perf_counter()
+    async with exclusive(bot.db, "command_sync") as leader:
+        if COMMAND_SYNC_MODE == "off" or not leader:
+            print("Command sync disabled." if leader else "Command sync running in another process.")
+        else:
+            force = COMMAND_SYNC_MODE == "always"
+            synced_global = await sync_if_changed(bot, force=force)
+            synced_guild = await sync_if_changed(bot, guild=guild, force=force)
+            if synced_global or synced_guild:
+                print("Commands synced.")
+            else:
+                print("Command tree unchanged, skipped sync.")
+    print(f"⏱️ Command sync: {time.perf_counter() - phase:.2f}s")
     for cmd in bot.tree.get_commands(guild=guild):
         print(f"↪ Slash command: /{cmd.name}")
     
 
+@bot.event
+async def on_shard_ready(shard_id):
+    bot.shard_ready_times[shard_id] = time.perf_counter() - bot.started_at
+    print(f"⏱️ Shard {shard_id} ready: {bot.shard_ready_times[shard_id]:.2f}s")
+
+# Fires again after reconnects; only the first one is a startup time
 @bot.event
 async def on_ready():
-    print(f"✅ Bot connected as {bot.user}")
+    if bot.ready_at is not None:
+        return
+    bot.ready_at = time.perf_counter() - bot.started_at
+    times = bot.shard_ready_times.values()
+    print(
+        f"{READY_PREFIX} {bot.cluster_id} ready as {bot.user}: {len(bot.shards)} shards, "
+        f"{len(bot.guilds)} guilds in {bot.ready_at:.2f}s"
+        + (f" (first shard {min(times):.2f}s, last {max(times):.2f}s)" if times else "")
+    )
 
 bot.run(DISCORD_TOKEN)
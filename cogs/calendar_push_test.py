@@ -1,13 +1,7 @@
 from discord.ext import commands
 from discord import app_commands
 import discord
-import psycopg2
-from google.oauth2.credentials import Credentials
-from googleapiclient.discovery import build
-from config import DB_CONFIG
-
-def get_connection():
-    return psycopg2.connect(**DB_CONFIG)
+from core.google_calendar import CalendarNotLinked
 
 class CalendarPush(commands.Cog):
     def __init__(self, bot):
@@ -17,29 +11,6 @@ class CalendarPush(commands.Cog):
     async def push_test(self, interaction: discord.Interaction):
         user_id = str(interaction.user.id)
 
-        with get_connection() as conn:
-            with conn.cursor() as cur:
-                cur.execute("""
-                    SELECT token, refresh_token, token_uri, client_id, client_secret, scopes
-                    FROM calendar_tokens WHERE user_id = %s
-                """, (user_id,))
-                row = cur.fetchone()
-
-        if not row:
-            await interaction.response.send_message("❌ No Google Calendar token found. Please run /setup_calendar first.", ephemeral=True)
-            return
-
-        creds = Credentials(
-            token=row[0],
-            refresh_token=row[1],
-            token_uri=row[2],
-            client_id=row[3],
-            client_secret=row[4],
-            scopes=row[5].split()
-        )
-
-        service = build("calendar", "v3", credentials=creds)
-
         event = {
             "summary": "🧪 Whimsylabs Test Event",
             "description": "This is a test event created by the Discord bot.",
@@ -53,7 +24,13 @@ class CalendarPush(commands.Cog):
             },
         }
 
-        created = service.events().insert(calendarId="primary", body=event).execute()
+        try:
+            created = await self.bot.calendar.call(
+                user_id, lambda service: service.events().insert(calendarId="primary", body=event)
+            )
+        except CalendarNotLinked:
+            await interaction.response.send_message("❌ No Google Calendar token found. Please run /setup_calendar first.", ephemeral=True)
+            return
 
         await interaction.response.send_message(
             f"✅ Test event created: [{created['summary']}]({created['htmlLink']})",
@@ -0,0 +1,58 @@
+from discord.ext import commands, tasks
+from discord import app_commands
+import discord
+from config import CALENDAR_SYNC_CONFIG
+
+class CalendarSyncCog(commands.Cog):
+    def __init__(self, bot):
+        self.bot = bot
+        self.sync_loop.change_interval(seconds=CALENDAR_SYNC_CONFIG["interval_seconds"])
+
+    async def cog_load(self):
+        self.sync_loop.start()
+
+    async def cog_unload(self):
+        self.sync_loop.cancel()
+
+    # Pushes every linked user's changed tasks (users with nothing dirty cost nothing),
+    # then pulls calendar changes for users not pulled recently. Users with a watch
+    # channel are normally pulled by webhook, so they are polled far less often.
+    # Each process covers the users in the partitions it holds (core/jobs.py).
+    @tasks.loop(seconds=60)
+    async def sync_loop(self):
+        if not self.bot.jobs.owned("calendar_sync"):
+            return
+        try:
+            stats = await self.bot.calendar_sync.sync_all()
+            pulled = await self.bot.calendar_sync.pull_all(
+                max_age=CALENDAR_SYNC_CONFIG["pull_interval_seconds"],
+                watched_max_age=CALENDAR_SYNC_CONFIG["watched_pull_interval_seconds"],
+            )
+        except Exception as e:
+            print(f"⚠️ Calendar sync run failed: {e}")
+            return
+        if stats["users"]:
+            print(
+                f"📆 Calendar push: {stats['users']} users, {stats['created']} created, {stats['updated']} updated, "
+                f"{stats['deleted']} deleted, {stats['failed']} failed in {stats['requests']} batch requests"
+            )
+        if pulled["changed"]:
+            print(f"📆 Calendar pull: {pulled['users']} users, {pulled['changed']} changed events, {pulled['full']} full resyncs")
+
+    @app_commands.command(name="calendar_sync", description="Sync your tasks and Google Calendar now")
+    async def calendar_sync(self, interaction: discord.Interaction):
+        await interaction.response.defer(ephemeral=True)
+        stats = await self.bot.calendar_sync.sync_user(interaction.user.id)
+        pulled = await self.bot.calendar_sync.pull_user(interaction.user.id)
+        if stats is None or pulled is None:
+            await interaction.followup.send("❌ No Google Calendar linked (run /setup_calendar), or a sync is already running.", ephemeral=True)
+            return
+        await interaction.followup.send(
+            f"✅ Calendar synced: {stats['created']} created, {stats['updated']} updated, {stats['deleted']} removed, "
+            f"{pulled['changed']} calendar changes pulled"
+            + (f", {stats['failed']} will be retried" if stats["failed"] else ""),
+            ephemeral=True
+        )
+
+async def setup(bot):
+    await bot.add_cog(CalendarSyncCog(bot))
@@ -6,75 +6,132 @@ from discord import app_commands
 import discord
 import datetime
 import calendar
-import psycopg2
-from psycopg2.extras import RealDictCursor
-from config import DB_CONFIG
 
-def get_connection():
-    return psycopg2.connect(**DB_CONFIG)
+# The current week (Monday to Sunday) in the user's zone, one row per day with
+# that day's tasks and cached calendar events in time order. Task due times are
+# stored as local wall time; event times are absolute and converted here.
+# Events that began before the week (multi-day ones) are listed on Monday.
+WEEK_SQL = """
+    WITH week AS (
+        SELECT date_trunc('week', now() AT TIME ZONE %(tz)s) AS first_day
+    ),
+    entries AS (
+        SELECT t.due_time AS local_time, 0 AS source, FALSE AS all_day, t.description AS text, t.status
+        FROM tasks t, week
+        WHERE t.user_id = %(user_id)s
+          AND t.due_time >= week.first_day AND t.due_time < week.first_day + INTERVAL '7 days'
+        UNION ALL
+        SELECT GREATEST(e.start_time AT TIME ZONE %(tz)s, week.first_day), 1, e.all_day,
+               COALESCE(e.summary, '(no title)'), NULL
+        FROM calendar_events e, week
+        WHERE e.user_id = %(user_id)s AND e.task_id IS NULL
+          AND e.start_time < (week.first_day + INTERVAL '7 days') AT TIME ZONE %(tz)s
+          AND e.end_time > week.first_day AT TIME ZONE %(tz)s
+    )
+    SELECT day::date AS day,
+           COALESCE(json_agg(json_build_object(
+               'time', to_char(entries.local_time, 'HH24:MI'),
+               'event', entries.source = 1,
+               'all_day', entries.all_day,
+               'text', entries.text,
+               'status', entries.status
+           ) ORDER BY entries.local_time, entries.source) FILTER (WHERE entries.local_time IS NOT NULL), '[]') AS entries
+    FROM week
+    CROSS JOIN generate_series(week.first_day, week.first_day + INTERVAL '6 days', INTERVAL '1 day') AS day
+    LEFT JOIN entries ON date_trunc('day', entries.local_time) = day
+    GROUP BY day
+    ORDER BY day
+"""
 
 class CalendarUI(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
 
-    @app_commands.command(name="calendar_today", description="View your tasks for today")
+    # Tasks plus cached Google Calendar events (core/calendar_sync.py) between two
+    # times in the user's zone, as (local time, line) pairs in time order.
+    # Events pushed from tasks are skipped since the task itself is listed.
+    async def agenda(self, user_id, start, end):
+        async with self.bot.db.connection() as conn:
+            cur = await conn.execute("""
+                SELECT id, description, due_time, status FROM tasks
+                WHERE user_id = %s AND due_time >= %s AND due_time < %s
+                ORDER BY due_time ASC
+            """, (user_id, start.replace(tzinfo=None), end.replace(tzinfo=None)))
+            tasks = await cur.fetchall()
+            cur = await conn.execute("""
+                SELECT summary, start_time, all_day FROM calendar_events
+                WHERE user_id = %s AND task_id IS NULL AND start_time < %s AND end_time > %s
+                ORDER BY start_time ASC
+            """, (user_id, end, start))
+            events = await cur.fetchall()
+
+        entries = [
+            (t["due_time"], f"`{t['due_time'].strftime('%H:%M')}` {t['description']} (**{t['status']}**)")
+            for t in tasks
+        ]
+        for e in events:
+            # Events that began before the range (multi-day ones) are listed at its start
+            when = max(e["start_time"], start).astimezone(start.tzinfo).replace(tzinfo=None)
+            label = "All day" if e["all_day"] else when.strftime("%H:%M")
+            entries.append((when, f"`{label}` 📆 {e['summary'] or '(no title)'}"))
+        entries.sort(key=lambda entry: entry[0])
+        return entries
+
+    @app_commands.command(name="calendar_today", description="View your tasks and calendar events for today")
     async def calendar_today(self, interaction: discord.Interaction):
         user_id = str(interaction.user.id)
-        now = datetime.datetime.now()
+        prefs = await self.bot.preferences.get(user_id)
+        now = datetime.datetime.now(prefs.tz)
         today_start = now.replace(hour=0, minute=0, second=0, microsecond=0)
         today_end = today_start + datetime.timedelta(days=1)
 
-        with get_connection() as conn:
-            with conn.cursor(cursor_factory=RealDictCursor) as cur:
-                cur.execute("""
-                    SELECT id, description, due_time, status FROM tasks
-                    WHERE user_id = %s AND due_time BETWEEN %s AND %s
-                    ORDER BY due_time ASC
-                """, (user_id, today_start, today_end))
-                tasks = cur.fetchall()
-
-        if not tasks:
-            await interaction.response.send_message("📭 You have no tasks scheduled for today.", ephemeral=True)
+        entries = await self.agenda(user_id, today_start, today_end)
+        if not entries:
+            await interaction.response.send_message("📭 You have nothing scheduled for today.", ephemeral=True)
             return
 
         embed = discord.Embed(
-            title="📅 Tasks for Today",
-            description="\n".join([f"• `{t['due_time'].strftime('%H:%M')}` - {t['description']} (**{t['status']}**)" for t in tasks]),
+            title="📅 Today",
+            description="\n".join([f"• {line}" for _, line in entries]),
             color=discord.Color.blue()
         )
         await interaction.response.send_message(embed=embed, ephemeral=True)
 
-    @app_commands.command(name="calendar_week", description="View a week calendar of your tasks")
+    @app_commands.command(name="calendar_week", description="View a week calendar of your tasks and events")
     async def calendar_week(self, interaction: discord.Interaction):
         user_id = str(interaction.user.id)
-        today = datetime.datetime.now()
-        week_start = today - datetime.timedelta(days=today.weekday())  # Monday
-        week_end = week_start + datetime.timedelta(days=7)
+        prefs = await self.bot.preferences.get(user_id)
+        today = datetime.datetime.now(prefs.tz).date()
+        key = (today - datetime.timedelta(days=today.weekday()), prefs.tz.key)
 
-        with get_connection() as conn:
-            with conn.cursor(cursor_factory=RealDictCursor) as cur:
-                cur.execute("""
-                    SELECT id, description, due_time, status FROM tasks
-                    WHERE user_id = %s AND due_time BETWEEN %s AND %s
-                    ORDER BY due_time ASC
-                """, (user_id, week_start, week_end))
-                tasks = cur.fetchall()
+        embed = self.bot.views.get(user_id, key)
+        if embed is None:
+            version = self.bot.views.version(user_id)
+            embed, week_start = await self.week_embed(user_id, prefs.tz.key)
+            self.bot.views.put(user_id, (week_start, prefs.tz.key), version, embed)
 
-        days = {i: [] for i in range(7)}  # Mon–Sun
-        for t in tasks:
-            day_idx = t["due_time"].weekday()
-            time_str = t["due_time"].strftime("%H:%M")
-            days[day_idx].append(f"`{time_str}` {t['description']} (**{t['status']}**)")
+        await interaction.response.send_message(embed=embed, ephemeral=True)
 
-        embed = discord.Embed(title="🗓️ Week View", color=discord.Color.green())
-        for i in range(7):
-            day_name = calendar.day_name[i]
-            if days[i]:
-                embed.add_field(name=day_name, value="\n".join(days[i]), inline=False)
-            else:
-                embed.add_field(name=day_name, value="(no tasks)", inline=False)
+    async def week_embed(self, user_id, tz):
+        async with self.bot.db.connection() as conn:
+            cur = await conn.execute(WEEK_SQL, {"user_id": user_id, "tz": tz})
+            days = await cur.fetchall()
 
-        await interaction.response.send_message(embed=embed, ephemeral=True)
+        embed = discord.Embed(title="🗓️ Week View", color=discord.Color.green())
+        for day in days:
+            lines = []
+            for entry in day["entries"]:
+                if entry["event"]:
+                    label = "All day" if entry["all_day"] else entry["time"]
+                    lines.append(f"`{label}` 📆 {entry['text']}")
+                else:
+                    lines.append(f"`{entry['time']}` {entry['text']} (**{entry['status']}**)")
+            embed.add_field(
+                name=calendar.day_name[day["day"].weekday()],
+                value="\n".join(lines) if lines else "(no tasks)",
+                inline=False,
+            )
+        return embed, days[0]["day"]
 
 async def setup(bot):
     await bot.add_cog(CalendarUI(bot))
@@ -0,0 +1,49 @@
+from discord.ext import commands
+from discord import app_commands
+import discord
+import io
+from config import CHART_CONFIG
+from core.charts import ChartRenderer, fetch_progress
+
+class ChartCog(commands.Cog):
+    def __init__(self, bot):
+        self.bot = bot
+        self.renderer = ChartRenderer(
+            workers=CHART_CONFIG["workers"],
+            max_concurrent_renders=CHART_CONFIG["max_concurrent_renders"],
+            cache_entries=CHART_CONFIG["cache_entries"],
+        )
+
+    async def cog_load(self):
+        self.renderer.start()
+
+    async def cog_unload(self):
+        self.renderer.stop()
+
+    # The aggregate query is the only per-view cost when the numbers have not
+    # changed; otherwise the PNG is drawn in the renderer's process pool
+    @app_commands.command(name="chart", description="Chart the tasks you finished and the time you worked")
+    @app_commands.describe(days="How many days to show (default 14)")
+    async def chart(self, interaction: discord.Interaction, days: app_commands.Range[int, 7, 90] = 14):
+        await interaction.response.defer(ephemeral=True, thinking=True)
+        user_id = str(interaction.user.id)
+        prefs = await self.bot.preferences.get(user_id)
+        today = prefs.local_now().date()
+        data = await fetch_progress(self.bot.db, user_id, today, days)
+        if not any(data["finished"]):
+            await interaction.followup.send(f"📭 You have not finished any tasks in the last {days} days.", ephemeral=True)
+            return
+
+        try:
+            png = await self.renderer.render("progress", data)
+        except Exception as e:
+            print(f"⚠️ Chart render failed for {user_id}: {e}")
+            await interaction.followup.send("⚠️ Could not draw your chart, please try again.", ephemeral=True)
+            return
+        embed = discord.Embed(title="📈 Progress", color=discord.Color.purple())
+        embed.set_image(url="attachment://progress.png")
+        embed.set_footer(text=f"{sum(data['finished'])} tasks, {int(sum(data['minutes']))} minutes")
+        await interaction.followup.send(embed=embed, file=discord.File(io.BytesIO(png), filename="progress.png"), ephemeral=True)
+
+async def setup(bot):
+    await bot.add_cog(ChartCog(bot))
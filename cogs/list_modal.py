@@ -1,121 +1,186 @@
 from discord.ext import commands
 from discord import app_commands
 import discord
-import psycopg2
-from config import DB_CONFIG
+from core.task_counters import fetch_summary_and_page
+from core.task_metrics import record_finish, record_reopen
+from core.task_sessions import stop_task
+from core.reminders import TASK_COLUMNS
 
-# DB connection
-def get_connection():
-    return psycopg2.connect(**DB_CONFIG)
+# All list components are DynamicItems: their state lives in the custom_id and
+# handlers load what they need on click, so nothing is held in memory per list
+# and buttons keep working across restarts.
 
-# --- View with a dropdown and buttons for selected task ---
+# --- View with a dropdown and page buttons ---
 class TaskDropdownView(discord.ui.View):
-    def __init__(self, tasks):
-        super().__init__(timeout=120)
-        self.tasks = tasks
-        self.dropdown = TaskDropdown(tasks)
-        self.add_item(self.dropdown)
+    def __init__(self, tasks, status_filter="pending", has_prev=False, has_next=False):
+        super().__init__(timeout=None)
+        if tasks:
+            self.add_item(TaskDropdown(tasks, status_filter))
+
+        if not tasks and (has_prev or has_next):
+            # An emptied page has no cursor to page from, only the way back to the
+            # first page (two buttons would share one custom_id, which Discord rejects)
+            self.add_item(ListPageButton(status_filter, "first", 0, emoji="⏮️"))
+        elif has_prev or has_next:
+            self.add_item(ListPageButton(status_filter, "after", tasks[0]["id"], emoji="◀️", disabled=not has_prev))
+            self.add_item(ListPageButton(status_filter, "before", tasks[-1]["id"], emoji="▶️", disabled=not has_next))
+
+class TaskDropdown(discord.ui.DynamicItem[discord.ui.Select], template=r"list_select:(?P<status>\w+)"):
+    def __init__(self, tasks=None, status_filter="pending", options=None):
+        if options is None:
+            options = [
+                discord.SelectOption(label=task["description"][:100], value=str(task["id"]))
+                for task in tasks
+            ]
+        super().__init__(discord.ui.Select(
+            placeholder="Select a task to manage...",
+            min_values=1,
+            max_values=1,
+            options=options,
+            custom_id=f"list_select:{status_filter}",
+        ))
+
+    @classmethod
+    async def from_custom_id(cls, interaction, item, match):
+        return cls(status_filter=match["status"], options=item.options)
 
-        # Buttons are created and assigned callbacks but NOT added to this view
-        self.edit_btn = discord.ui.Button(emoji="✏️", style=discord.ButtonStyle.primary, custom_id="edit")
-        label = "Uncomplete" if self.tasks and self.tasks[0].get("status") == "done" else "Complete"
-        emoji = "🔁" if label == "Uncomplete" else "✅"
-        self.complete_btn = discord.ui.Button(label=label, emoji=emoji, style=discord.ButtonStyle.success, custom_id="complete")
-        self.delete_btn = discord.ui.Button(emoji="🗑️", style=discord.ButtonStyle.danger, custom_id="delete")
-
-        self.edit_btn.callback = self.button_callback
-        self.complete_btn.callback = self.button_callback
-        self.delete_btn.callback = self.button_callback
-
-        self.selected_task_id = None
-
-
-    async def button_callback(self, interaction: discord.Interaction):
-        if not self.selected_task_id:
-            await interaction.response.send_message("⚠️ Please select a task first.", ephemeral=True)
+    async def callback(self, interaction: discord.Interaction):
+        task_id = int(self.item.values[0])
+        async with interaction.client.db.connection() as conn:
+            cur = await conn.execute("""
+                SELECT id, description, due_time, duration_minutes, deadline, location, priority, status
+                FROM tasks WHERE id = %s AND user_id = %s
+            """, (task_id, str(interaction.user.id)))
+            task = await cur.fetchone()
+        if not task:
+            await interaction.response.send_message("❌ Task not found or access denied.", ephemeral=True)
             return
 
-        user_id = str(interaction.user.id)
-        task_id = self.selected_task_id
-        action = interaction.data["custom_id"]
-
-        with get_connection() as conn:
-            with conn.cursor() as cur:
-                if action == "delete":
-                    cur.execute("DELETE FROM tasks WHERE id = %s AND user_id = %s", (task_id, user_id))
-                    conn.commit()
-                    await interaction.response.send_message("🗑️ Task deleted.", ephemeral=True)
-                elif action == "complete":
-                    cur.execute("UPDATE tasks SET status = 'done' WHERE id = %s AND user_id = %s", (task_id, user_id))
-                    conn.commit()
-                    await interaction.response.send_message("✅ Task marked as complete.", ephemeral=True)
-                elif action == "edit":
-                    with get_connection() as edit_conn:
-                        with edit_conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as edit_cur:
-                            edit_cur.execute("""
-                            SELECT description, schedule_time, schedule_date, duration_minutes, deadline, location
-                            FROM tasks WHERE id = %s AND user_id = %s
-                            """, (task_id, user_id))
-                            row = edit_cur.fetchone()
-                            if not row:
-                                await interaction.response.send_message("❌ Task not found or access denied.", ephemeral=True)
-                                return
-
-                    from cogs.todo_modal import TaskModal
-                    modal = TaskModal(user_id, row['description'], task_id=task_id)
-                    modal.task_id = task_id  # Mark this as an edit modal
-                    if row['schedule_time'] and row['schedule_date']:
-                        modal.datetime_str.default = f"{row['schedule_date'].month:02}/{row['schedule_date'].day:02} {row['schedule_time'].strftime('%H:%M')}"
-                    if row['duration_minutes']:
-                        modal.duration.default = str(row['duration_minutes'])
-                    if row['deadline']:
-                        modal.deadline.default = row['deadline'].strftime('%Y-%m-%d %H:%M')
-                    if row['location']:
-                        modal.location.default = row['location']
-                    await interaction.response.send_modal(modal)
-
-class TaskDropdown(discord.ui.Select):
-    def __init__(self, tasks):
-        self.task_map = {str(task["id"]): task for task in tasks}
-        options = [
-            discord.SelectOption(label=task["description"][:100], value=str(task["id"]))
-            for task in tasks
-        ]
-        super().__init__(placeholder="Select a task to manage...", min_values=1, max_values=1, options=options)
-
-    async def callback(self, interaction: discord.Interaction):
-        task_id = int(self.values[0])
-        self.view.selected_task_id = task_id
-        task = self.task_map[str(task_id)]
         details = f"""
 **Task ID:** {task['id']}
 **Description:** {task['description']}
-**Due Time:** {task.get('due_time', '—')}
-**Duration:** {task.get('duration_minutes', '15')} minutes
-**Deadline:** {task.get('deadline', '—')}
-**Location:** {task.get('location', '—')}
-**Priority:** {'Yes' if task.get('priority') else 'No'}
+**Due Time:** {task['due_time'] or '—'}
+**Duration:** {task['duration_minutes'] or 15} minutes
+**Deadline:** {task['deadline'] or '—'}
+**Location:** {task['location'] or '—'}
+**Priority:** {'Yes' if task['priority'] else 'No'}
 """
         await interaction.response.defer(ephemeral=True)
 
-        view = discord.ui.View(timeout=120)
-        view.add_item(self.view.edit_btn)
-        view.add_item(self.view.complete_btn)
-        view.add_item(self.view.delete_btn)
+        complete_action = "uncomplete" if task["status"] == "done" else "complete"
+        view = discord.ui.View(timeout=None)
+        view.add_item(TaskActionButton("edit", task_id))
+        view.add_item(TaskActionButton(complete_action, task_id))
+        view.add_item(TaskActionButton("delete", task_id))
 
         await interaction.followup.send(content=details, view=view, ephemeral=True)
 
+# --- Buttons for the selected task ---
+class TaskActionButton(discord.ui.DynamicItem[discord.ui.Button], template=r"task_action:(?P<action>edit|complete|uncomplete|delete):(?P<task_id>[0-9]+)"):
+    STYLES = {
+        "edit": dict(emoji="✏️", style=discord.ButtonStyle.primary),
+        "complete": dict(label="Complete", emoji="✅", style=discord.ButtonStyle.success),
+        "uncomplete": dict(label="Uncomplete", emoji="🔁", style=discord.ButtonStyle.success),
+        "delete": dict(emoji="🗑️", style=discord.ButtonStyle.danger),
+    }
+
+    def __init__(self, action, task_id):
+        super().__init__(discord.ui.Button(custom_id=f"task_action:{action}:{task_id}", **self.STYLES[action]))
+        self.action = action
+        self.task_id = task_id
+
+    @classmethod
+    async def from_custom_id(cls, interaction, item, match):
+        return cls(match["action"], int(match["task_id"]))
+
+    async def callback(self, interaction: discord.Interaction):
+        user_id = str(interaction.user.id)
+        task_id = self.task_id
+        action = self.action
+
+        if action == "delete":
+            async with interaction.client.db.connection() as conn:
+                cur = await conn.execute("DELETE FROM tasks WHERE id = %s AND user_id = %s RETURNING id", (task_id, user_id))
+                deleted = await cur.fetchone()
+            if deleted:
+                interaction.client.reminders.forget(task_id)
+                interaction.client.task_index.forget(task_id)
+            await interaction.response.send_message("🗑️ Task deleted.", ephemeral=True)
+        elif action == "complete":
+            now = (await interaction.client.preferences.get(user_id)).local_now()
+            async with interaction.client.db.connection() as conn:
+                completed, session = await stop_task(conn, user_id, task_id, now, "done", ("pending", "in_progress"))
+                # A pending task finishes with no time worked, so /report still counts it
+                if completed:
+                    await record_finish(conn, task_id, now, session["minutes"] if session else 0)
+            if completed:
+                interaction.client.reminders.forget(task_id)
+                interaction.client.task_index.forget(task_id)
+            await interaction.response.send_message("✅ Task marked as complete.", ephemeral=True)
+        elif action == "uncomplete":
+            async with interaction.client.db.connection() as conn:
+                cur = await conn.execute(
+                    f"UPDATE tasks SET status = 'pending' WHERE id = %s AND user_id = %s AND status = 'done' RETURNING {TASK_COLUMNS}",
+                    (task_id, user_id),
+                )
+                uncompleted = await cur.fetchone()
+                if uncompleted:
+                    await record_reopen(conn, task_id)
+            interaction.client.reminders.track(uncompleted)
+            interaction.client.task_index.track(uncompleted)
+            await interaction.response.send_message("🔁 Task moved back to pending.", ephemeral=True)
+        elif action == "edit":
+            from cogs.todo_modal import TaskModal
+            modal = await TaskModal.for_task(interaction.client.db, user_id, task_id)
+            if modal is None:
+                await interaction.response.send_message("❌ Task not found or access denied.", ephemeral=True)
+                return
+            await interaction.response.send_modal(modal)
+
+# --- Page buttons, cursor encoded as list_page:<status>:<direction>:<task id> ---
+class ListPageButton(discord.ui.DynamicItem[discord.ui.Button], template=r"list_page:(?P<status>\w+):(?P<direction>first|before|after):(?P<cursor>[0-9]+)"):
+    def __init__(self, status_filter, direction, cursor, emoji=None, disabled=False):
+        super().__init__(discord.ui.Button(
+            emoji=emoji,
+            style=discord.ButtonStyle.secondary,
+            row=1,
+            disabled=disabled,
+            custom_id=f"list_page:{status_filter}:{direction}:{cursor}",
+        ))
+        self.status_filter = status_filter
+        self.direction = direction
+        self.cursor = cursor
+
+    @classmethod
+    async def from_custom_id(cls, interaction, item, match):
+        return cls(match["status"], match["direction"], int(match["cursor"]))
+
+    async def callback(self, interaction: discord.Interaction):
+        cog = interaction.client.get_cog("TaskListCog")
+        if self.direction == "before":
+            await cog.send_task_list(interaction, filter_status=self.status_filter, before_id=self.cursor, edit=True)
+        elif self.direction == "after":
+            await cog.send_task_list(interaction, filter_status=self.status_filter, after_id=self.cursor, edit=True)
+        else:
+            await cog.send_task_list(interaction, filter_status=self.status_filter, edit=True)
+
 # --- Toggle View (footer only) ---
 class TaskToggleFooter(discord.ui.View):
     def __init__(self, status_filter):
-        super().__init__(timeout=120)
-        self.status_filter = status_filter
+        super().__init__(timeout=None)
+        self.add_item(TaskToggleButton(status_filter))
+
+class TaskToggleButton(discord.ui.DynamicItem[discord.ui.Button], template=r"list_toggle:(?P<status>\w+)"):
+    def __init__(self, status_filter):
         toggle_label = "Show ✅ Done" if status_filter == "pending" else "Show 🕓 Pending"
-        toggle = discord.ui.Button(label=toggle_label, style=discord.ButtonStyle.secondary, custom_id=f"toggle_{status_filter}")
-        toggle.callback = self.toggle_callback
-        self.add_item(toggle)
+        super().__init__(discord.ui.Button(label=toggle_label, style=discord.ButtonStyle.secondary, custom_id=f"list_toggle:{status_filter}"))
+        self.status_filter = status_filter
+
+    @classmethod
+    async def from_custom_id(cls, interaction, item, match):
+        return cls(match["status"])
 
-    async def toggle_callback(self, interaction: discord.Interaction):
+    async def callback(self, interaction: discord.Interaction):
         new_status = "done" if self.status_filter == "pending" else "pending"
         cog = interaction.client.get_cog("TaskListCog")
         await cog.send_task_list(interaction, filter_status=new_status)
@@ -129,19 +194,18 @@ class TaskListCog(commands.Cog):
     async def list_tasks(self, interaction: discord.Interaction):
         await self.send_task_list(interaction, filter_status="pending")
 
-    async def send_task_list(self, interaction: discord.Interaction, filter_status="pending"):
+    async def send_task_list(self, interaction: discord.Interaction, filter_status="pending", before_id=None, after_id=None, edit=False):
         user_id = str(interaction.user.id)
 
-        with get_connection() as conn:
-            with conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cur:
-                cur.execute("SELECT COUNT(*) FROM tasks WHERE user_id = %s", (user_id,))
-                total = cur.fetchone()["count"]
-
-                cur.execute("SELECT COUNT(*) FROM tasks WHERE user_id = %s AND status = 'done'", (user_id,))
-                done = cur.fetchone()["count"]
+        # Counters come from user_task_counters, fetched together with the page
+        total, done, tasks, has_more = await fetch_summary_and_page(
+            self.bot.db, user_id, filter_status, before_id=before_id, after_id=after_id
+        )
 
-                cur.execute("SELECT id, description, due_time, duration_minutes, deadline, location, priority FROM tasks WHERE user_id = %s AND status = %s ORDER BY id DESC LIMIT 25", (user_id, filter_status))
-                tasks = cur.fetchall()
+        if after_id is not None:
+            has_prev, has_next = has_more, True
+        else:
+            has_prev, has_next = before_id is not None, has_more
 
         active = total - done
 
@@ -150,9 +214,18 @@ class TaskListCog(commands.Cog):
             description=f"**Total:** {total}  •  **Active:** {active}  •  **Completed:** {done}",
             color=discord.Color.purple()
         )
+        if not tasks:
+            summary_embed.set_footer(text=f"No {filter_status} tasks on this page.")
+
+        view = TaskDropdownView(tasks, filter_status, has_prev=has_prev, has_next=has_next)
+        if edit:
+            # Page buttons live on the list message itself, so turn the page in place
+            await interaction.response.edit_message(embed=summary_embed, view=view)
+            return
 
-        await interaction.response.send_message(embed=summary_embed, view=TaskDropdownView(tasks), ephemeral=True)
+        await interaction.response.send_message(embed=summary_embed, view=view, ephemeral=True)
         await interaction.followup.send(view=TaskToggleFooter(filter_status), ephemeral=True)
 
 async def setup(bot):
+    bot.add_dynamic_items(TaskDropdown, TaskActionButton, ListPageButton, TaskToggleButton)
     await bot.add_cog(TaskListCog(bot))
@@ -0,0 +1,46 @@
+from discord.ext import commands
+import discord
+
+# Keeps bot.members (core/member_index.py) current for the guilds on this
+# process's shards. Needs the privileged members intent; the member cache isn't used.
+
+class MemberIndexCog(commands.Cog):
+    def __init__(self, bot):
+        self.bot = bot
+
+    async def cog_load(self):
+        self.bot.members.start()
+
+    async def cog_unload(self):
+        await self.bot.members.stop()
+
+    @commands.Cog.listener()
+    async def on_guild_available(self, guild: discord.Guild):
+        self.bot.members.request_sync(guild)
+
+    @commands.Cog.listener()
+    async def on_guild_join(self, guild: discord.Guild):
+        self.bot.members.request_sync(guild, force=True)
+
+    @commands.Cog.listener()
+    async def on_guild_remove(self, guild: discord.Guild):
+        await self.bot.members.forget_guild(guild.id)
+
+    @commands.Cog.listener()
+    async def on_member_join(self, member: discord.Member):
+        await self.bot.members.upsert(member.guild.id, [member])
+
+    # Only fires for members discord.py has cached; changes to the rest are
+    # picked up by the next full sync
+    @commands.Cog.listener()
+    async def on_member_update(self, before: discord.Member, after: discord.Member):
+        if (before.display_name, before.name) != (after.display_name, after.name):
+            await self.bot.members.upsert(after.guild.id, [after])
+
+    # The raw event fires whether or not the member was cached
+    @commands.Cog.listener()
+    async def on_raw_member_remove(self, payload: discord.RawMemberRemoveEvent):
+        await self.bot.members.remove(payload.guild_id, payload.user.id)
+
+async def setup(bot):
+    await bot.add_cog(MemberIndexCog(bot))
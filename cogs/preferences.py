@@ -4,12 +4,6 @@ from discord.ext import commands
 from discord import app_commands
 import discord
 from discord.ui import View, Button, Modal, TextInput
-import psycopg2
-from psycopg2.extras import RealDictCursor
-from config import DB_CONFIG
-
-def get_connection():
-    return psycopg2.connect(**DB_CONFIG)
 
 class Preferences(commands.Cog):
     def __init__(self, bot):
@@ -19,82 +13,78 @@ class Preferences(commands.Cog):
     async def preferences(self, interaction: discord.Interaction):
         user_id = str(interaction.user.id)
 
-        with get_connection() as conn:
-            with conn.cursor(cursor_factory=RealDictCursor) as cur:
-                cur.execute("""
-                    INSERT INTO user_preferences (user_id)
-                    VALUES (%s)
-                    ON CONFLICT (user_id) DO NOTHING
-                """, (user_id,))
-                conn.commit()
-
-                cur.execute("SELECT * FROM user_preferences WHERE user_id = %s", (user_id,))
-                prefs = cur.fetchone()
+        prefs = await self.bot.preferences.get(user_id)
 
         embed = discord.Embed(title="🛠️ Your Preferences", color=discord.Color.teal())
-        embed.add_field(name="Work Start", value=str(prefs["work_start"]), inline=True)
-        embed.add_field(name="Work End", value=str(prefs["work_end"]), inline=True)
-        embed.add_field(name="Lunch Duration", value=f"{prefs['lunch_duration_minutes']} min", inline=True)
-        embed.add_field(name="Lunch Window", value=f"{prefs['lunch_window_start']}–{prefs['lunch_window_end']}", inline=True)
-        embed.add_field(name="Time Zone", value=prefs["time_zone"], inline=True)
+        embed.add_field(name="Work Start", value=str(prefs.work_start), inline=True)
+        embed.add_field(name="Work End", value=str(prefs.work_end), inline=True)
+        embed.add_field(name="Lunch Duration", value=f"{prefs.lunch_duration_minutes} min", inline=True)
+        embed.add_field(name="Lunch Window", value=f"{prefs.lunch_window_start}–{prefs.lunch_window_end}", inline=True)
+        embed.add_field(name="Time Zone", value=prefs.time_zone, inline=True)
 
         view = PreferencesView(user_id)
         await interaction.response.send_message(embed=embed, view=view, ephemeral=True)
 
+# Editable fields: field name -> (button label, input placeholder)
+PREFERENCE_FIELDS = {
+    "work_start": ("Work Start", "HH:MM (24h)"),
+    "work_end": ("Work End", "HH:MM (24h)"),
+    "lunch_duration_minutes": ("Lunch Duration", "Minutes"),
+    "lunch_window_start": ("Lunch Window Start", "HH:MM"),
+    "lunch_window_end": ("Lunch Window End", "HH:MM"),
+}
+
+TIME_ZONES = [
+    "GMT", "UTC", "Europe/London", "Europe/Berlin", "America/New_York",
+    "America/Los_Angeles", "Asia/Tokyo", "Asia/Kolkata"
+]
+
+# Components are DynamicItems and act on whoever clicks them, so the view holds no state
 class PreferencesView(View):
     def __init__(self, user_id):
-        super().__init__(timeout=180)
+        super().__init__(timeout=None)
         self.user_id = user_id
 
-        self.add_item(EditButton("Work Start", "work_start", "HH:MM (24h)", self.user_id))
-        self.add_item(EditButton("Work End", "work_end", "HH:MM (24h)", self.user_id))
-        self.add_item(EditButton("Lunch Duration", "lunch_duration_minutes", "Minutes", self.user_id))
-        self.add_item(EditButton("Lunch Window Start", "lunch_window_start", "HH:MM", self.user_id))
-        self.add_item(EditButton("Lunch Window End", "lunch_window_end", "HH:MM", self.user_id))
-        self.add_item(TimeZoneSelect(self.user_id))
+        for field_name in PREFERENCE_FIELDS:
+            self.add_item(EditButton(field_name))
+        self.add_item(TimeZoneSelect())
 
-class EditButton(Button):
-    def __init__(self, label, field_name, placeholder, user_id):
-        super().__init__(label=label, style=discord.ButtonStyle.secondary)
+class EditButton(discord.ui.DynamicItem[Button], template=r"prefs_edit:(?P<field>[a-z_]+)"):
+    def __init__(self, field_name):
+        label, placeholder = PREFERENCE_FIELDS[field_name]
+        super().__init__(Button(label=label, style=discord.ButtonStyle.secondary, custom_id=f"prefs_edit:{field_name}"))
+        self.label = label
         self.field_name = field_name
         self.placeholder = placeholder
-        self.user_id = user_id
+
+    @classmethod
+    async def from_custom_id(cls, interaction, item, match):
+        if match["field"] not in PREFERENCE_FIELDS:
+            raise ValueError(f"Unknown preference field {match['field']}")
+        return cls(match["field"])
 
     async def callback(self, interaction: discord.Interaction):
-        await interaction.response.send_modal(EditPreferenceModal(self.label, self.field_name, self.placeholder, self.user_id))
+        await interaction.response.send_modal(EditPreferenceModal(self.label, self.field_name, self.placeholder, str(interaction.user.id)))
 
-class TimeZoneSelect(discord.ui.Select):
-    def __init__(self, user_id):
-        self.user_id = user_id
+class TimeZoneSelect(discord.ui.DynamicItem[discord.ui.Select], template=r"prefs_tz"):
+    def __init__(self):
+        options = [discord.SelectOption(label=zone) for zone in TIME_ZONES]
 
-        options = [
-            discord.SelectOption(label="GMT"),
-            discord.SelectOption(label="UTC"),
-            discord.SelectOption(label="Europe/London"),
-            discord.SelectOption(label="Europe/Berlin"),
-            discord.SelectOption(label="America/New_York"),
-            discord.SelectOption(label="America/Los_Angeles"),
-            discord.SelectOption(label="Asia/Tokyo"),
-            discord.SelectOption(label="Asia/Kolkata"),
-        ]
-
-        super().__init__(
+        super().__init__(discord.ui.Select(
             placeholder="Select your time zone",
             min_values=1,
             max_values=1,
-            options=options
-        )
+            options=options,
+            custom_id="prefs_tz",
+        ))
+
+    @classmethod
+    async def from_custom_id(cls, interaction, item, match):
+        return cls()
 
     async def callback(self, interaction: discord.Interaction):
-        selected_zone = self.values[0]
-        with get_connection() as conn:
-            with conn.cursor() as cur:
-                cur.execute("""
-                    UPDATE user_preferences
-                    SET time_zone = %s
-                    WHERE user_id = %s
-                """, (selected_zone, self.user_id))
-                conn.commit()
+        selected_zone = self.item.values[0]
+        await interaction.client.preferences.update(interaction.user.id, "time_zone", selected_zone)
 
         await interaction.response.send_message(f"🕓 Time zone set to `{selected_zone}`", ephemeral=True)
 
@@ -128,22 +118,11 @@ class EditPreferenceModal(Modal, title="Edit Preference"):
 
             # --- Validate Time Zone ---
             elif self.field_name == "time_zone":
-                valid_zones = [
-                    "GMT", "UTC", "Europe/London", "Europe/Berlin", "America/New_York",
-                    "America/Los_Angeles", "Asia/Tokyo", "Asia/Kolkata"
-                ]
-                if value not in valid_zones:
+                if value not in TIME_ZONES:
                     raise ValueError(f"Use a valid time zone. e.g. 'Europe/London'")
 
-            # Update database
-            with get_connection() as conn:
-                with conn.cursor() as cur:
-                    cur.execute(f"""
-                        UPDATE user_preferences
-                        SET {self.field_name} = %s
-                        WHERE user_id = %s
-                    """, (value, self.user_id))
-                    conn.commit()
+            # Update database and this process's cache; other processes get a NOTIFY
+            await interaction.client.preferences.update(self.user_id, self.field_name, value)
 
             await interaction.response.send_message(f"✅ Updated **{self.field_name}** to `{value}`.", ephemeral=True)
 
@@ -151,4 +130,5 @@ class EditPreferenceModal(Modal, title="Edit Preference"):
             await interaction.response.send_message(f"❌ Error: {e}", ephemeral=True)
 
 async def setup(bot):
+    bot.add_dynamic_items(EditButton, TimeZoneSelect)
     await bot.add_cog(Preferences(bot))
@@ -0,0 +1,91 @@
+from discord.ext import commands
+from discord import app_commands
+import discord
+
+# Delivers reminders fired by bot.reminders (core/reminders.py): by DM, or in the
+# reminder channel (settings.reminder_channel_id) of a guild the user shares
+# with the bot when they block DMs
+
+class ReminderCog(commands.Cog):
+    def __init__(self, bot):
+        self.bot = bot
+
+    # Every process runs the scheduler for the users it holds (core/jobs.py)
+    async def cog_load(self):
+        self.bot.reminders.start(self.deliver)
+
+    async def cog_unload(self):
+        await self.bot.reminders.stop()
+
+    async def deliver(self, reminder):
+        await self.bot.wait_until_ready()
+        if reminder.kind == "due":
+            text = f"⏰ Time for **{reminder.description}**."
+        else:
+            text = f"⌛ The deadline for **{reminder.description}** has arrived."
+
+        user = self.bot.get_user(int(reminder.user_id)) or await self.bot.fetch_user(int(reminder.user_id))
+        try:
+            await user.send(text)
+            return
+        except discord.Forbidden:
+            pass
+
+        # Only guilds the user is in, per the member index (core/member_index.py),
+        # which every cluster keeps for its own shards. Channels cached here go
+        # first; a guild on another cluster's shards costs one channel fetch.
+        async with self.bot.db.connection() as conn:
+            cur = await conn.execute("""
+                SELECT s.reminder_channel_id FROM settings s
+                JOIN guild_members m ON m.guild_id = s.guild_id AND m.user_id = %s
+                WHERE s.reminder_channel_id IS NOT NULL
+            """, (str(user.id),))
+            channel_ids = [int(row["reminder_channel_id"]) for row in await cur.fetchall()]
+        channel_ids.sort(key=lambda channel_id: self.bot.get_channel(channel_id) is None)
+        for channel_id in channel_ids:
+            try:
+                channel = self.bot.get_channel(channel_id) or await self.bot.fetch_channel(channel_id)
+                await channel.send(f"{user.mention} {text}", allowed_mentions=discord.AllowedMentions(users=[user]))
+            except (discord.NotFound, discord.Forbidden):
+                continue
+            return
+        raise RuntimeError(f"user {reminder.user_id} has DMs closed and no reminder channel")
+
+    @app_commands.command(name="reminder_channel", description="Post reminders here for members who block DMs")
+    @app_commands.default_permissions(manage_guild=True)
+    @app_commands.guild_only()
+    async def reminder_channel(self, interaction: discord.Interaction, channel: discord.TextChannel):
+        async with self.bot.db.connection() as conn:
+            await conn.execute("""
+                INSERT INTO settings (guild_id, reminder_channel_id) VALUES (%s, %s)
+                ON CONFLICT (guild_id) DO UPDATE SET reminder_channel_id = EXCLUDED.reminder_channel_id
+            """, (str(interaction.guild_id), str(channel.id)))
+        await interaction.response.send_message(f"✅ Reminders will be posted in {channel.mention}.", ephemeral=True)
+
+    @app_commands.command(name="reminder_stats", description="Show reminder scheduler health")
+    @app_commands.default_permissions(manage_guild=True)
+    async def reminder_stats(self, interaction: discord.Interaction):
+        stats = self.bot.reminders.stats()
+        jobs = self.bot.jobs.stats()
+
+        def seconds(value):
+            return "n/a" if value is None else f"{value:.2f}s"
+
+        embed = discord.Embed(title="⏰ Reminder Scheduler", color=discord.Color.blurple())
+        embed.add_field(name="Scheduled", value=f"{stats['scheduled']} ({stats['heap_entries']} heap entries)")
+        embed.add_field(name="Loaded until", value=stats["window_end"].strftime("%H:%M UTC") if stats["window_end"] else "n/a")
+        embed.add_field(name="Sent / failed", value=f"{stats['fired']} / {stats['failed']} ({stats['caught_up']} caught up late)")
+        embed.add_field(
+            name="Scheduling lag",
+            value=f"p50 {seconds(stats['lag_p50'])}, p95 {seconds(stats['lag_p95'])}, max {seconds(stats['lag_max'])}",
+            inline=False,
+        )
+        embed.add_field(name="Delivery time p95", value=seconds(stats["delivery_p95"]))
+        embed.add_field(
+            name="This process",
+            value=f"{len(jobs['owned']['reminders'])} of {jobs['partitions']} user partitions, {jobs['processes']} processes running",
+        )
+        await interaction.response.send_message(embed=embed, ephemeral=True)
+
+async def setup(bot):
+    await bot.add_cog(ReminderCog(bot))
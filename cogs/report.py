@@ -0,0 +1,40 @@
+from discord.ext import commands
+from discord import app_commands
+import discord
+from core.task_metrics import fetch_report
+
+def percent(part, whole):
+    return f"{part / whole:.0%} ({part}/{whole})" if whole else "n/a"
+
+def minutes(value):
+    hours, mins = divmod(int(round(value)), 60)
+    return f"{hours}h {mins:02}m" if hours else f"{mins}m"
+
+class ReportCog(commands.Cog):
+    def __init__(self, bot):
+        self.bot = bot
+
+    # Reads the precomputed rollup row (core/task_metrics.py), never the task history
+    @app_commands.command(name="report", description="Your task completion statistics")
+    async def report(self, interaction: discord.Interaction):
+        r = await fetch_report(self.bot.db, interaction.user.id)
+        if not r or not (r["started"] or r["finished"]):
+            await interaction.response.send_message("📭 No tracked work yet. Use /start and /finish on your tasks.", ephemeral=True)
+            return
+
+        embed = discord.Embed(title="📊 Task Report", color=discord.Color.purple())
+        embed.add_field(name="Finished", value=str(r["finished"]))
+        embed.add_field(name="Time worked", value=minutes(r["total_minutes"]))
+        embed.add_field(name="Sessions / delays", value=f"{r['sessions']} / {r['delays']}")
+        embed.add_field(name="Started on time", value=percent(r["started_on_time"], r["started_with_due"]))
+        embed.add_field(name="Finished by deadline", value=percent(r["finished_on_time"], r["finished_with_deadline"]))
+        if r["finished"]:
+            embed.add_field(name="Avg time to complete", value=minutes(r["finished_minutes"] / r["finished"]))
+        if r["started_with_due"]:
+            embed.add_field(name="Avg start delay", value=minutes(r["start_delay_minutes"] / r["started_with_due"]))
+        if r["finished_minutes"] and r["finished_estimated_minutes"]:
+            embed.add_field(name="Actual vs estimate", value=f"{r['finished_minutes'] / r['finished_estimated_minutes']:.2f}×")
+        await interaction.response.send_message(embed=embed, ephemeral=True)
+
+async def setup(bot):
+    await bot.add_cog(ReportCog(bot))
@@ -0,0 +1,92 @@
+from discord.ext import commands, tasks
+from discord import app_commands
+import discord
+import datetime
+from config import SCHEDULE_CONFIG
+from core.daily_schedule import generate, pending_users
+from core.jobs import due_partitions, record_run
+
+JOB = "nightly_schedule"
+
+KIND_ICONS = {"task": "🟦", "fixed": "📌", "event": "📆", "lunch": "🍽️"}
+
+class ScheduleCog(commands.Cog):
+    schedule = app_commands.Group(name="schedule", description="Your generated daily schedule")
+
+    def __init__(self, bot):
+        self.bot = bot
+        hour, minute = map(int, SCHEDULE_CONFIG["nightly_time_utc"].split(":"))
+        self.nightly_time = datetime.time(hour, minute)
+        self.nightly.change_interval(minutes=SCHEDULE_CONFIG["check_minutes"])
+
+    async def cog_load(self):
+        self.nightly.start()
+
+    async def cog_unload(self):
+        self.nightly.cancel()
+
+    # The latest UTC day whose nightly time has passed
+    def run_day(self):
+        now = datetime.datetime.now(datetime.timezone.utc)
+        if now.time() >= self.nightly_time:
+            return now.date()
+        return now.date() - datetime.timedelta(days=1)
+
+    # Plans the users with pending tasks in each held partition (core/jobs.py) that
+    # hasn't finished today's run yet, in batches of the configured size. Progress
+    # is recorded per partition, so one taken over from a crashed process is
+    # completed by its new owner.
+    @tasks.loop(minutes=5)
+    async def nightly(self):
+        partitions = self.bot.jobs.owned(JOB)
+        if not partitions:
+            return
+        try:
+            day = self.run_day()
+            planned = 0
+            for partition in await due_partitions(self.bot.db, JOB, partitions, day):
+                if partition not in self.bot.jobs.owned(JOB):
+                    continue  # handed over meanwhile
+                user_ids = await pending_users(self.bot.db, [partition], self.bot.jobs.partition_count)
+                size = SCHEDULE_CONFIG["batch_size"]
+                for start in range(0, len(user_ids), size):
+                    await generate(self.bot.db, user_ids[start:start + size])
+                await record_run(self.bot.db, JOB, partition, day)
+                planned += len(user_ids)
+            if planned:
+                print(f"🗓️ Generated schedules for {planned} users")
+        except Exception as e:
+            print(f"⚠️ Nightly schedule generation failed: {e}")
+
+    @schedule.command(name="today", description="Plan your pending tasks into today's free time")
+    async def today(self, interaction: discord.Interaction):
+        user_id = str(interaction.user.id)
+        prefs = await self.bot.preferences.get(user_id)
+        day = datetime.datetime.now(prefs.tz).date()
+        _, entries = (await generate(self.bot.db, [user_id], day=day))[user_id]
+
+        lines, unscheduled = [], []
+        for e in entries:
+            if e["kind"] == "unscheduled":
+                unscheduled.append(f"• {e['title']}")
+                continue
+            line = f"`{e['starts_at'].strftime('%H:%M')}–{e['ends_at'].strftime('%H:%M')}` {KIND_ICONS[e['kind']]} {e['title'] or '(no title)'}"
+            if e["late"]:
+                line += " ⚠️ past deadline"
+            lines.append(line)
+
+        if not lines and not unscheduled:
+            await interaction.response.send_message("📭 Nothing to plan today.", ephemeral=True)
+            return
+
+        embed = discord.Embed(
+            title=f"🗓️ Schedule for {day.strftime('%A %d %B')}",
+            description="\n".join(lines) or "No free time left today.",
+            color=discord.Color.teal()
+        )
+        if unscheduled:
+            embed.add_field(name="Didn't fit today", value="\n".join(unscheduled)[:1024], inline=False)
+        await interaction.response.send_message(embed=embed, ephemeral=True)
+
+async def setup(bot):
+    await bot.add_cog(ScheduleCog(bot))
@@ -0,0 +1,68 @@
+from discord.ext import commands
+from discord import app_commands
+from typing import Literal, Optional
+import discord
+import datetime
+from core.task_search import search_tasks
+from cogs.list_modal import TaskDropdownView
+
+STATUS_LABELS = {"pending": "🕓", "in_progress": "▶️", "done": "✅"}
+
+def parse_date(value):
+    return datetime.datetime.strptime(value, "%Y-%m-%d").date() if value else None
+
+class SearchCog(commands.Cog):
+    def __init__(self, bot):
+        self.bot = bot
+
+    # Ranked full-text search (core/task_search.py); results can be opened from
+    # the same dropdown as /list
+    @app_commands.command(name="search", description="Search all your tasks by description and location")
+    @app_commands.describe(
+        query='Words to look for: "exact phrase", either OR other, -excluded',
+        status="Only tasks with this status",
+        priority="Only priority (or only non-priority) tasks",
+        since="Due or finished on or after this date (YYYY-MM-DD)",
+        until="Due or finished on or before this date (YYYY-MM-DD)",
+    )
+    async def search(
+        self, interaction: discord.Interaction, query: str,
+        status: Optional[Literal["pending", "in_progress", "done"]] = None,
+        priority: Optional[bool] = None,
+        since: Optional[str] = None, until: Optional[str] = None,
+    ):
+        try:
+            since_date, until_date = parse_date(since), parse_date(until)
+        except ValueError:
+            await interaction.response.send_message("❌ Dates must look like 2025-01-31.", ephemeral=True)
+            return
+
+        tasks = await search_tasks(
+            self.bot.db, interaction.user.id, query,
+            status=status, priority=priority, since=since_date, until=until_date,
+        )
+        if not tasks:
+            await interaction.response.send_message(f"🔍 No tasks match **{query}**.", ephemeral=True)
+            return
+
+        lines = []
+        for t in tasks:
+            when = t["due_time"] or t["stop_time"]
+            details = [f"`{t['id']}`", STATUS_LABELS.get(t["status"], t["status"])]
+            if t["priority"]:
+                details.append("⭐")
+            if when:
+                details.append(when.strftime("%Y-%m-%d"))
+            if t["location"]:
+                details.append(f"📍 {t['location']}")
+            lines.append(f"**{t['description']}**\n{' · '.join(details)}")
+
+        embed = discord.Embed(
+            title=f"🔍 Results for “{query}”",
+            description="\n".join(lines)[:4096],
+            color=discord.Color.blue(),
+        )
+        await interaction.response.send_message(embed=embed, view=TaskDropdownView(tasks, "search"), ephemeral=True)
+
+async def setup(bot):
+    await bot.add_cog(SearchCog(bot))
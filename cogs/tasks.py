@@ -1,115 +1,145 @@
 from discord.ext import commands
 from discord import app_commands
 import discord
-import datetime
 from typing import Optional, List
-import psycopg2
-from psycopg2.extras import RealDictCursor
-from config import DB_CONFIG
-
-def get_connection():
-    return psycopg2.connect(**DB_CONFIG)
+from core.task_metrics import record_start, record_finish, record_delay
+from core.task_sessions import start_task, stop_task
+from cogs.todo_modal import TaskModal
+
+# Starts one of the user's pending tasks; returns whether it did
+async def begin_task(client, user_id, task_id):
+    now = (await client.preferences.get(user_id)).local_now()
+    async with client.db.connection() as conn:
+        started = await start_task(conn, user_id, task_id, now)
+        if started:
+            await record_start(conn, task_id, now)
+    client.task_index.track(started)
+    return started is not None
+
+# Task choices for autocomplete, from the in-memory index (core/task_index.py)
+async def task_choices(interaction, current, statuses):
+    matches = await interaction.client.task_index.search(interaction.user.id, current, statuses=statuses)
+    return [app_commands.Choice(name=description[:100] or f"Task {task_id}", value=task_id) for task_id, description, _ in matches]
+
+# Stateless start button: the task id lives in the custom_id, so it keeps working across restarts
+class StartTaskButton(discord.ui.DynamicItem[discord.ui.Button], template=r"task_start:(?P<task_id>[0-9]+)"):
+    def __init__(self, task_id, description=None):
+        super().__init__(discord.ui.Button(
+            label=(description or f"Task {task_id}")[:40],
+            style=discord.ButtonStyle.primary,
+            custom_id=f"task_start:{task_id}",
+        ))
+        self.task_id = task_id
+
+    @classmethod
+    async def from_custom_id(cls, interaction, item, match):
+        return cls(int(match["task_id"]), item.label)
+
+    async def callback(self, interaction: discord.Interaction):
+        if await begin_task(interaction.client, str(interaction.user.id), self.task_id):
+            await interaction.response.edit_message(content=f"▶️ Started task `{self.task_id}`.", view=None)
+        else:
+            await interaction.response.edit_message(content=f"ℹ️ Task `{self.task_id}` is no longer pending.", view=None)
 
 class TaskManager(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
 
     @app_commands.command(name="start", description="Start a task")
-    async def start_task(self, interaction: discord.Interaction):
+    @app_commands.describe(task="Start typing to pick a pending task; leave empty to choose from your next ones")
+    async def start_task(self, interaction: discord.Interaction, task: Optional[int] = None):
         user_id = str(interaction.user.id)
-        with get_connection() as conn:
-            with conn.cursor(cursor_factory=RealDictCursor) as cur:
-                cur.execute("""
-                    SELECT id, description FROM tasks
-                    WHERE user_id = %s AND status = 'pending'
-                    ORDER BY due_time ASC NULLS LAST, id ASC LIMIT 10
-                """, (user_id,))
-                tasks = cur.fetchall()
+        if task is not None:
+            if await begin_task(self.bot, user_id, task):
+                await interaction.response.send_message(f"▶️ Started task `{task}`.", ephemeral=True)
+            else:
+                await interaction.response.send_message("❌ No pending task with that id (already started or finished?).", ephemeral=True)
+            return
+
+        async with self.bot.db.connection() as conn:
+            cur = await conn.execute("""
+                SELECT id, description FROM tasks
+                WHERE user_id = %s AND status = 'pending'
+                ORDER BY due_time ASC NULLS LAST, id ASC LIMIT 10
+            """, (user_id,))
+            tasks = await cur.fetchall()
 
         if not tasks:
             await interaction.response.send_message("No pending tasks found.", ephemeral=True)
             return
 
-        class TaskView(discord.ui.View):
-            def __init__(self, task_list):
-                super().__init__(timeout=60)
-                for t in task_list:
-                    self.add_item(discord.ui.Button(label=t['description'][:40], style=discord.ButtonStyle.primary, custom_id=str(t['id'])))
-
-        async def button_callback(i: discord.Interaction):
-            task_id = int(i.data['custom_id'])
-            now = datetime.datetime.now()
-            with get_connection() as conn:
-                with conn.cursor() as cur:
-                    cur.execute("""
-                        UPDATE tasks
-                        SET start_time = %s, status = 'in_progress'
-                        WHERE id = %s
-                    """, (now, task_id))
-                    cur.execute("""
-                        UPDATE tasks
-                        SET num_sessions = COALESCE(num_sessions, 0) + 1
-                        WHERE id = %s
-                    """, (task_id,))
-                    conn.commit()
-            await i.response.edit_message(content=f"▶️ Started task `{task_id}`.", view=None)
-
-        view = TaskView(tasks)
-        for item in view.children:
-            item.callback = button_callback
+        view = discord.ui.View(timeout=None)
+        for t in tasks:
+            view.add_item(StartTaskButton(t['id'], t['description']))
 
         await interaction.response.send_message("Select a task to start:", ephemeral=True, view=view)
 
+    @start_task.autocomplete("task")
+    async def start_task_autocomplete(self, interaction: discord.Interaction, current: str):
+        return await task_choices(interaction, current, ("pending",))
+
     @app_commands.command(name="finish", description="Finish your current task")
-    async def finish_task(self, interaction: discord.Interaction):
+    @app_commands.describe(task="Task in progress to finish (default: the one started last)")
+    async def finish_task(self, interaction: discord.Interaction, task: Optional[int] = None):
         user_id = str(interaction.user.id)
-        now = datetime.datetime.now()
-        with get_connection() as conn:
-            with conn.cursor(cursor_factory=RealDictCursor) as cur:
-                cur.execute("""
-                    SELECT id, start_time FROM tasks
-                    WHERE user_id = %s AND status = 'in_progress'
-                    ORDER BY start_time DESC LIMIT 1
-                """, (user_id,))
-                task = cur.fetchone()
-                if not task:
-                    await interaction.response.send_message("No task in progress.", ephemeral=True)
-                    return
-
-                duration = (now - task['start_time']).total_seconds() / 60
-
-                cur.execute("""
-                    UPDATE tasks
-                    SET stop_time = %s, status = 'done', actual_duration = COALESCE(actual_duration, 0) + %s
-                    WHERE id = %s
-                """, (now, duration, task['id']))
-                conn.commit()
-
-        await interaction.response.send_message(f"✅ Finished task `{task['id']}` after {int(duration)} minutes.", ephemeral=True)
+        now = (await self.bot.preferences.get(user_id)).local_now()
+        async with self.bot.db.connection() as conn:
+            finished, session = await stop_task(conn, user_id, task, now, "done")
+            if finished:
+                await record_finish(conn, finished["id"], now, session["minutes"] if session else 0)
+
+        if not finished:
+            await interaction.response.send_message("No task in progress.", ephemeral=True)
+            return
+
+        self.bot.reminders.forget(finished["id"])
+        self.bot.task_index.forget(finished["id"])
+        message = f"✅ Finished task `{finished['id']}`"
+        if session:
+            message += f" after {int(session['minutes'])} minutes"
+            if session["sessions"] > 1:
+                message += f" ({int(session['total_minutes'])} minutes over {session['sessions']} sessions)"
+        await interaction.response.send_message(message + ".", ephemeral=True)
+
+    @finish_task.autocomplete("task")
+    async def finish_task_autocomplete(self, interaction: discord.Interaction, current: str):
+        return await task_choices(interaction, current, ("in_progress",))
 
     @app_commands.command(name="delay", description="Delay the current task")
-    async def delay_task(self, interaction: discord.Interaction):
+    @app_commands.describe(task="Task in progress to put back (default: the one started last)")
+    async def delay_task(self, interaction: discord.Interaction, task: Optional[int] = None):
         user_id = str(interaction.user.id)
-        with get_connection() as conn:
-            with conn.cursor(cursor_factory=RealDictCursor) as cur:
-                cur.execute("""
-                    SELECT id FROM tasks
-                    WHERE user_id = %s AND status = 'in_progress'
-                    ORDER BY start_time DESC LIMIT 1
-                """, (user_id,))
-                task = cur.fetchone()
-                if not task:
-                    await interaction.response.send_message("No task is currently in progress.", ephemeral=True)
-                    return
-
-                cur.execute("""
-                    UPDATE tasks
-                    SET start_time = NULL, status = 'pending'
-                    WHERE id = %s
-                """, (task['id'],))
-                conn.commit()
-
-        await interaction.response.send_message(f"⏸️ Delayed task `{task['id']}`.", ephemeral=True)
+        now = (await self.bot.preferences.get(user_id)).local_now()
+        async with self.bot.db.connection() as conn:
+            delayed, session = await stop_task(conn, user_id, task, now, "pending")
+            if delayed:
+                await record_delay(conn, delayed["id"], session["minutes"] if session else 0)
+
+        if not delayed:
+            await interaction.response.send_message("No task is currently in progress.", ephemeral=True)
+            return
+
+        self.bot.task_index.track(delayed)
+        worked = f" after {int(session['minutes'])} minutes" if session else ""
+        await interaction.response.send_message(f"⏸️ Delayed task `{delayed['id']}`{worked}; the time is kept.", ephemeral=True)
+
+    @delay_task.autocomplete("task")
+    async def delay_task_autocomplete(self, interaction: discord.Interaction, current: str):
+        return await task_choices(interaction, current, ("in_progress",))
+
+    @app_commands.command(name="edit", description="Edit one of your open tasks")
+    @app_commands.describe(task="Start typing to pick a task")
+    async def edit_task(self, interaction: discord.Interaction, task: int):
+        modal = await TaskModal.for_task(self.bot.db, interaction.user.id, task)
+        if modal is None:
+            await interaction.response.send_message("❌ Task not found or access denied.", ephemeral=True)
+            return
+        await interaction.response.send_modal(modal)
+
+    @edit_task.autocomplete("task")
+    async def edit_task_autocomplete(self, interaction: discord.Interaction, current: str):
+        return await task_choices(interaction, current, ("pending", "in_progress"))
 
 async def setup(bot):
+    bot.add_dynamic_items(StartTaskButton)
     await bot.add_cog(TaskManager(bot))
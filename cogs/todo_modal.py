@@ -2,24 +2,16 @@ from discord.ext import commands
 from discord import app_commands
 import discord
 import datetime
-import psycopg2
-from config import DB_CONFIG
+from core.reminders import TASK_COLUMNS
 
-# Temporary cache to store first modal values
-USER_TASK_CACHE = {}
-
-# Store temporary mirror info
-USER_MIRROR_CACHE = {}
-
-def get_connection():
-    return psycopg2.connect(**DB_CONFIG)
+# Unsaved task drafts live in `bot.drafts` (see core/drafts.py), keyed by user id
 
 class TaskModal(discord.ui.Modal, title="📝 New Task"):
     def __init__(self, user_id, task_name, task_id=None):
         super().__init__()
-        self.user_id = user_id
+        self.user_id = int(user_id)  # custom_ids carry it as a number, keep draft keys consistent
         self.task_name = task_name
-        self.task_id = task_id 
+        self.task_id = task_id
 
         self.datetime_str = discord.ui.TextInput(label="Schedule (MM/DD HH:MM)", required=False)
         self.duration = discord.ui.TextInput(label="Duration in minutes (default 15)", required=False)
@@ -31,15 +23,38 @@ class TaskModal(discord.ui.Modal, title="📝 New Task"):
         self.add_item(self.deadline)
         self.add_item(self.location)
 
+    # An edit modal prefilled from the saved task, or None if it isn't the user's
+    @classmethod
+    async def for_task(cls, pool, user_id, task_id):
+        async with pool.connection() as conn:
+            cur = await conn.execute("""
+                SELECT description, schedule_time, schedule_date, duration_minutes, deadline, location
+                FROM tasks WHERE id = %s AND user_id = %s
+            """, (task_id, str(user_id)))
+            row = await cur.fetchone()
+        if not row:
+            return None
+
+        modal = cls(user_id, row['description'], task_id=task_id)
+        if row['schedule_time'] and row['schedule_date']:
+            modal.datetime_str.default = f"{row['schedule_date'].month:02}/{row['schedule_date'].day:02} {row['schedule_time'].strftime('%H:%M')}"
+        if row['duration_minutes']:
+            modal.duration.default = str(row['duration_minutes'])
+        if row['deadline']:
+            modal.deadline.default = row['deadline'].strftime('%Y-%m-%d %H:%M')
+        if row['location']:
+            modal.location.default = row['location']
+        return modal
+
     async def on_submit(self, interaction: discord.Interaction):
-        USER_TASK_CACHE[self.user_id] = {
+        await interaction.client.drafts.set(self.user_id, {
             "task": self.task_name,
             "datetime_str": self.datetime_str.value.strip(),
             "duration": self.duration.value.strip(),
             "deadline": self.deadline.value.strip(),
             "location": self.location.value.strip(),
             "mirrored_users": []
-        }
+        })
 
         await interaction.response.send_message(
             "✅ Task created. Would you like to configure more settings?",
@@ -47,35 +62,6 @@ class TaskModal(discord.ui.Modal, title="📝 New Task"):
             ephemeral=True
         )
 
-class MirrorUserView(discord.ui.View):
-    def __init__(self, user_id, guild):
-        super().__init__(timeout=60)
-        self.user_id = user_id
-        self.guild = guild
-        self.add_item(MirrorUserDropdown(user_id, guild))
-
-class MirrorUserDropdown(discord.ui.Select):
-    def __init__(self, user_id, guild):
-        self.user_id = user_id
-        self.guild = guild
-
-        options = [
-            discord.SelectOption(label=member.display_name, value=str(member.id))
-            for member in guild.members if not member.bot and member.id != user_id
-        ][:25]  # Max options
-
-        super().__init__(
-            placeholder="Select a user to mirror with...",
-            min_values=1,
-            max_values=1,
-            options=options
-        )
-
-    async def callback(self, interaction: discord.Interaction):
-        selected_id = self.values[0]
-
-        await interaction.response.send_modal(MirrorTimeModal(self.user_id, selected_id))
-
 class MirrorTimeModal(discord.ui.Modal, title="🕒 Mirror Time"):
     def __init__(self, user_id, mirror_user_id):
         super().__init__()
@@ -92,25 +78,27 @@ class MirrorTimeModal(discord.ui.Modal, title="🕒 Mirror Time"):
             hh, mi = map(int, datetime_str.split(" ")[1].split(":"))
             scheduled = datetime.datetime(datetime.datetime.now().year, mm, dd, hh, mi)
 
-            if self.user_id in USER_TASK_CACHE:
-                USER_TASK_CACHE[self.user_id]["mirrored_users"].append({"user_id": str(self.mirror_user_id), "time": scheduled})
+            draft = await interaction.client.drafts.get(self.user_id)
+            if draft:
+                draft["mirrored_users"].append({"user_id": str(self.mirror_user_id), "time": scheduled.isoformat()})
+                await interaction.client.drafts.set(self.user_id, draft)
 
             # Optional: add default task to mirror user in DB
-            with get_connection() as conn:
-                with conn.cursor() as cur:
-                    cur.execute("""
-                        INSERT INTO tasks (user_id, description, schedule_time, schedule_date, duration_minutes, priority, status)
-                        VALUES (%s, %s, %s, %s, %s, %s, %s)
-                    """, (
-                        self.mirror_user_id,
-                        f"Mirrored Task from <@{self.user_id}>",
-                        scheduled.time(),
-                        scheduled.date(),
-                        15,
-                        False,
-                        'pending'
-                    ))
-                    conn.commit()
+            async with interaction.client.db.connection() as conn:
+                cur = await conn.execute(f"""
+                    INSERT INTO tasks (user_id, description, schedule_time, schedule_date, duration_minutes, priority, status)
+                    VALUES (%s, %s, %s, %s, %s, %s, %s)
+                    RETURNING {TASK_COLUMNS}
+                """, (
+                    self.mirror_user_id,
+                    f"Mirrored Task from <@{self.user_id}>",
+                    scheduled.time(),
+                    scheduled.date(),
+                    15,
+                    False,
+                    'pending'
+                ))
+                interaction.client.task_index.track(await cur.fetchone())
 
             await interaction.response.send_message(f"🔁 Task mirrored with <@{self.mirror_user_id}> at {scheduled}.", ephemeral=True)
 
@@ -119,35 +107,66 @@ class MirrorTimeModal(discord.ui.Modal, title="🕒 Mirror Time"):
 
 class PostCreateOptions(discord.ui.View):
     def __init__(self, user_id, task_id=None):
-        super().__init__(timeout=120)
-        self.user_id = user_id
+        super().__init__(timeout=None)
+        for action in PostCreateButton.BUTTONS:
+            self.add_item(PostCreateButton(action, user_id, task_id))
+
+# Draft buttons encode draft:<action>:<user id>:<task id, 0 for a new task>; the draft itself is in bot.drafts
+class PostCreateButton(discord.ui.DynamicItem[discord.ui.Button], template=r"draft:(?P<action>priority|mirror|edit|confirm):(?P<user_id>[0-9]+):(?P<task_id>[0-9]+)"):
+    BUTTONS = {
+        "priority": dict(label="⭐ Set Priority", style=discord.ButtonStyle.primary),
+        "mirror": dict(label="👥 Mirror Task", style=discord.ButtonStyle.secondary),
+        "edit": dict(label="✏️ Edit Settings", style=discord.ButtonStyle.success),
+        "confirm": dict(label="✅ Confirm & Save", style=discord.ButtonStyle.green),
+    }
+
+    def __init__(self, action, user_id, task_id=None):
+        super().__init__(discord.ui.Button(custom_id=f"draft:{action}:{user_id}:{task_id or 0}", **self.BUTTONS[action]))
+        self.action = action
+        self.user_id = int(user_id)
         self.task_id = task_id
 
-    @discord.ui.button(label="⭐ Set Priority", style=discord.ButtonStyle.primary)
-    async def set_priority(self, interaction: discord.Interaction, button: discord.ui.Button):
+    @classmethod
+    async def from_custom_id(cls, interaction, item, match):
+        return cls(match["action"], int(match["user_id"]), int(match["task_id"]) or None)
+
+    async def callback(self, interaction: discord.Interaction):
+        if self.action == "priority":
+            await self.set_priority(interaction)
+        elif self.action == "mirror":
+            await self.mirror_task(interaction)
+        elif self.action == "edit":
+            await self.edit_task(interaction)
+        else:
+            await self.confirm(interaction)
+
+    async def set_priority(self, interaction: discord.Interaction):
         if interaction.user.id != self.user_id:
             await interaction.response.send_message("Not your task.", ephemeral=True)
             return
-        data = USER_TASK_CACHE.get(self.user_id)
+        data = await interaction.client.drafts.get(self.user_id)
         if data:
             data["priority"] = True
+            await interaction.client.drafts.set(self.user_id, data)
             await interaction.response.send_message("⭐ Priority enabled.", ephemeral=True)
+        else:
+            await interaction.response.send_message("❌ This draft has expired, please run /todo again.", ephemeral=True)
 
-    @discord.ui.button(label="👥 Mirror Task", style=discord.ButtonStyle.secondary)
-    async def mirror_task(self, interaction: discord.Interaction, button: discord.ui.Button):
-        await interaction.response.send_message("Choose a user to mirror this task with:", view=MirrorUserView(self.user_id, interaction.guild), ephemeral=True)
+    async def mirror_task(self, interaction: discord.Interaction):
+        await interaction.response.send_message("👥 Run `/mirror` and start typing a name to choose who to mirror this task with.", ephemeral=True)
 
-    @discord.ui.button(label="✏️ Edit Settings", style=discord.ButtonStyle.success)
-    async def edit_task(self, interaction: discord.Interaction, button: discord.ui.Button):
+    async def edit_task(self, interaction: discord.Interaction):
         if interaction.user.id != self.user_id:
             await interaction.response.send_message("Not your task.", ephemeral=True)
             return
-        task = USER_TASK_CACHE.get(self.user_id)
-        await interaction.response.send_modal(TaskModal(self.user_id, task["task"]))
+        task = await interaction.client.drafts.get(self.user_id)
+        if not task:
+            await interaction.response.send_message("❌ This draft has expired, please run /todo again.", ephemeral=True)
+            return
+        await interaction.response.send_modal(TaskModal(self.user_id, task["task"], task_id=self.task_id))
 
-    @discord.ui.button(label="✅ Confirm & Save", style=discord.ButtonStyle.green)
-    async def confirm(self, interaction: discord.Interaction, button: discord.ui.Button):
-        data = USER_TASK_CACHE.get(self.user_id)
+    async def confirm(self, interaction: discord.Interaction):
+        data = await interaction.client.drafts.get(self.user_id)
         if not data:
             await interaction.response.send_message("❌ No task data to save.", ephemeral=True)
             return
@@ -179,55 +198,58 @@ class PostCreateOptions(discord.ui.View):
             await interaction.response.send_message(f"❌ Invalid input: {e}", ephemeral=True)
             return
 
-        with get_connection() as conn:
-            with conn.cursor() as cur:
-                if self.task_id is not None:
-                    cur.execute("""
-                        UPDATE tasks SET
-                            description = %s,
-                            schedule_time = %s,
-                            schedule_date = %s,
-                            duration_minutes = %s,
-                            priority = %s,
-                            deadline = %s,
-                            mirrored_users = %s,
-                            location = %s,
-                            due_time = %s
-                        WHERE id = %s AND user_id = %s
-                    """, (
-                        task,
-                        schedule_time,
-                        schedule_date,
-                        duration,
-                        priority,
-                        deadline,
-                        [m["user_id"] for m in mirrored_users] if mirrored_users else None,
-                        location,
-                        due_time,
-                        self.task_id,
-                        str(self.user_id)
-                    ))
-                else:
-                    cur.execute("""
-                        INSERT INTO tasks (
-                            user_id, description, schedule_time, schedule_date, duration_minutes,
-                            priority, deadline, mirrored_users, location, due_time
-                        ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-                    """, (
-                        str(self.user_id),
-                        task,
-                        schedule_time,
-                        schedule_date,
-                        duration,
-                        priority,
-                        deadline,
-                        [m["user_id"] for m in mirrored_users] if mirrored_users else None,
-                        location,
-                        due_time
-                    ))
-                conn.commit()
-
-        USER_TASK_CACHE.pop(self.user_id, None)
+        async with interaction.client.db.connection() as conn:
+            if self.task_id is not None:
+                cur = await conn.execute(f"""
+                    UPDATE tasks SET
+                        description = %s,
+                        schedule_time = %s,
+                        schedule_date = %s,
+                        duration_minutes = %s,
+                        priority = %s,
+                        deadline = %s,
+                        mirrored_users = %s,
+                        location = %s,
+                        due_time = %s
+                    WHERE id = %s AND user_id = %s
+                    RETURNING {TASK_COLUMNS}
+                """, (
+                    task,
+                    schedule_time,
+                    schedule_date,
+                    duration,
+                    priority,
+                    deadline,
+                    [m["user_id"] for m in mirrored_users] if mirrored_users else None,
+                    location,
+                    due_time,
+                    self.task_id,
+                    str(self.user_id)
+                ))
+            else:
+                cur = await conn.execute(f"""
+                    INSERT INTO tasks (
+                        user_id, description, schedule_time, schedule_date, duration_minutes,
+                        priority, deadline, mirrored_users, location, due_time
+                    ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+                    RETURNING {TASK_COLUMNS}
+                """, (
+                    str(self.user_id),
+                    task,
+                    schedule_time,
+                    schedule_date,
+                    duration,
+                    priority,
+                    deadline,
+                    [m["user_id"] for m in mirrored_users] if mirrored_users else None,
+                    location,
+                    due_time
+                ))
+            saved = await cur.fetchone()
+
+        interaction.client.reminders.track(saved)
+        interaction.client.task_index.track(saved)
+        await interaction.client.drafts.pop(self.user_id)
         if self.task_id is not None:
             await interaction.response.send_message(f"✏️ Task **{task}** updated.", ephemeral=True)
         else:
@@ -243,5 +265,24 @@ class TaskTodoModalCog(commands.Cog):
     async def open_modal(self, interaction: discord.Interaction, task_name: str):
         await interaction.response.send_modal(TaskModal(interaction.user.id, task_name))
 
+    @app_commands.command(name="mirror", description="Mirror your task with another member")
+    @app_commands.describe(member="Start typing a name")
+    @app_commands.guild_only()
+    async def mirror(self, interaction: discord.Interaction, member: str):
+        if member == str(interaction.user.id) or not await self.bot.members.contains(interaction.guild_id, member):
+            await interaction.response.send_message("❌ Pick another member from the suggestions.", ephemeral=True)
+            return
+        await interaction.response.send_modal(MirrorTimeModal(interaction.user.id, member))
+
+    # Suggestions come from the member index (core/member_index.py), never guild.members
+    @mirror.autocomplete("member")
+    async def mirror_member_autocomplete(self, interaction: discord.Interaction, current: str):
+        matches = await self.bot.members.search(interaction.guild_id, current, exclude_user_id=interaction.user.id)
+        return [
+            app_commands.Choice(name=f"{m['display_name']} (@{m['username']})"[:100], value=m["user_id"])
+            for m in matches
+        ]
+
 async def setup(bot):
+    bot.add_dynamic_items(PostCreateButton)
     await bot.add_cog(TaskTodoModalCog(bot))
\ No newline at end of file
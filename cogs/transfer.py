@@ -0,0 +1,114 @@
+from discord.ext import commands
+from discord import app_commands
+from typing import Literal, Optional
+import discord
+import datetime
+import tempfile
+import aiohttp
+import psycopg
+from config import TRANSFER_CONFIG
+from core.task_transfer import import_tasks, export_tasks, MAX_REPORTED_ERRORS
+
+CHUNK_SIZE = 64 * 1024
+
+def file_kind(attachment):
+    name = attachment.filename.lower()
+    if name.endswith(".csv") or (attachment.content_type or "").startswith("text/csv"):
+        return "csv"
+    if name.endswith((".ics", ".ical", ".ifb")) or (attachment.content_type or "").startswith("text/calendar"):
+        return "ics"
+    return None
+
+# The attachment in CHUNK_SIZE pieces, as Discord's CDN sends it
+async def attachment_chunks(attachment):
+    async with aiohttp.ClientSession() as session:
+        async with session.get(attachment.url) as response:
+            response.raise_for_status()
+            async for chunk in response.content.iter_chunked(CHUNK_SIZE):
+                yield chunk
+
+class TransferCog(commands.Cog):
+    def __init__(self, bot):
+        self.bot = bot
+
+    # Bulk-creates tasks from a file (core/task_transfer.py): all of it or, if any row is invalid, none
+    @app_commands.command(name="import", description="Create tasks in bulk from a CSV or iCalendar (.ics) file")
+    @app_commands.describe(file="CSV with a header row (description, due_time, deadline, duration_minutes, location, priority, status) or .ics")
+    async def import_file(self, interaction: discord.Interaction, file: discord.Attachment):
+        kind = file_kind(file)
+        if kind is None:
+            await interaction.response.send_message("❌ Attach a `.csv` or `.ics` file.", ephemeral=True)
+            return
+        if file.size > TRANSFER_CONFIG["max_import_bytes"]:
+            await interaction.response.send_message(
+                f"❌ That file is over {TRANSFER_CONFIG['max_import_bytes'] // 1_000_000} MB; split it and import each part.", ephemeral=True
+            )
+            return
+
+        await interaction.response.defer(ephemeral=True, thinking=True)
+        prefs = await self.bot.preferences.get(interaction.user.id)
+        try:
+            result = await import_tasks(
+                self.bot.db, interaction.user.id, prefs.tz, attachment_chunks(file), kind, TRANSFER_CONFIG["max_import_rows"]
+            )
+        except UnicodeDecodeError:
+            await interaction.followup.send("❌ The file must be UTF-8 text.", ephemeral=True)
+            return
+        except aiohttp.ClientError as e:
+            print(f"⚠️ Could not download import {file.url}: {e!r}")
+            await interaction.followup.send("⚠️ Could not download the file, please try again.", ephemeral=True)
+            return
+        except psycopg.Error as e:
+            # Rows are validated before COPY, so this is the database, not the file
+            print(f"⚠️ Import for {interaction.user.id} failed in the database: {e!r}")
+            await interaction.followup.send("⚠️ Nothing was imported: the database rejected the file. Please try again later.", ephemeral=True)
+            return
+
+        if result.error_count:
+            lines = [f"• line {line}: {message}" for line, message in result.errors]
+            if result.error_count > MAX_REPORTED_ERRORS:
+                lines.append(f"…and {result.error_count - MAX_REPORTED_ERRORS} more")
+            await interaction.followup.send(
+                "❌ Nothing was imported. Fix these and try again:\n" + "\n".join(lines), ephemeral=True
+            )
+        elif not result.rows:
+            await interaction.followup.send("📭 No tasks found in that file.", ephemeral=True)
+        else:
+            if result.imported:
+                # Bulk inserts aren't tracked row by row, and this process skips its own notifications
+                self.bot.task_index.invalidate(interaction.user.id)
+            skipped = result.rows - result.imported
+            note = f" ({skipped} already existed)" if skipped else ""
+            await interaction.followup.send(f"📥 Imported {result.imported} tasks{note}.", ephemeral=True)
+
+    # Streams the tasks through a temp file (core/task_transfer.py), so history size doesn't matter
+    @app_commands.command(name="export", description="Download your tasks as CSV or iCalendar (.ics)")
+    @app_commands.describe(format="File format", status="Only tasks with this status")
+    async def export_file(
+        self, interaction: discord.Interaction,
+        format: Literal["csv", "ics"] = "csv",
+        status: Optional[Literal["pending", "in_progress", "done"]] = None,
+    ):
+        await interaction.response.defer(ephemeral=True, thinking=True)
+        prefs = await self.bot.preferences.get(interaction.user.id)
+        with tempfile.TemporaryFile() as out:
+            count = await export_tasks(
+                self.bot.db, interaction.user.id, prefs.tz, format, out,
+                status=status, batch_size=TRANSFER_CONFIG["export_batch_size"],
+            )
+            if not count:
+                await interaction.followup.send("📭 You have no tasks to export.", ephemeral=True)
+                return
+            size = out.seek(0, 2)
+            out.seek(0)
+            if size > interaction.filesize_limit:
+                await interaction.followup.send(
+                    f"❌ The export is {size / 1_000_000:.1f} MB, over Discord's upload limit here. Try exporting one status at a time.",
+                    ephemeral=True,
+                )
+                return
+            filename = f"tasks-{datetime.date.today():%Y-%m-%d}.{format}"
+            await interaction.followup.send(f"📤 {count} tasks.", file=discord.File(out, filename=filename), ephemeral=True)
+
+async def setup(bot):
+    await bot.add_cog(TransferCog(bot))
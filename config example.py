@@ -10,3 +10,117 @@ DB_CONFIG = {
     "port": 5432
 }
 
+# Shared async connection pool used by the bot (see core/db.py)
+DB_POOL_CONFIG = {
+    "min_size": 2,         # connections kept open at all times
+    "max_size": 10,        # hard cap on concurrent connections
+    "timeout": 10,         # seconds to wait for a free connection before failing
+    "max_idle": 300,       # close idle connections above min_size after this many seconds
+    "max_lifetime": 3600,  # recycle connections after this many seconds
+}
+
+# Slash-command sync on startup: "auto" only syncs when the command tree changed,
+# "always" syncs on every start, "off" never syncs
+COMMAND_SYNC_MODE = "auto"
+
+# Unsaved /todo drafts (see core/drafts.py). "memory" keeps them in this process;
+# "postgres" shares them between bot processes through the task_drafts table.
+DRAFT_STORE_CONFIG = {
+    "backend": "memory",
+    "max_size": 10000,  # drafts kept before the least recently used is evicted
+    "ttl": 3600,        # seconds an untouched draft is kept
+}
+
+# Google Calendar client (see core/google_calendar.py)
+GOOGLE_CALENDAR_CONFIG = {
+    "max_workers": 8,    # threads running blocking Calendar API calls
+    "cache_size": 1000,  # users whose credentials and service objects stay cached
+    "http_timeout": 30,  # seconds per HTTP request to Google
+    "api_root": None,    # override for testing, e.g. "http://127.0.0.1:8085/" (scripts/fake_calendar_server.py)
+}
+
+# Two-way Google Calendar sync (see core/calendar_sync.py)
+CALENDAR_SYNC_CONFIG = {
+    "interval_seconds": 60,                  # how often changed tasks are pushed
+    "pull_interval_seconds": 300,            # how stale a user's cached calendar events may get before the next pull
+    "watched_pull_interval_seconds": 21600,  # the same for users with a push-notification channel
+    "batch_size": 50,                        # Calendar API requests per batch HTTP call (Google allows at most 50)
+    "max_concurrency": 8,                    # users synced at the same time
+}
+
+# Google Calendar push notifications, received by auth_server.py. Google only
+# delivers to a public HTTPS address; leave "address" as None to rely on polling.
+CALENDAR_WEBHOOK_CONFIG = {
+    "address": None,                 # e.g. "https://example.com/calendar/notifications"
+    "ttl_seconds": 604800,           # requested channel lifetime (Google caps it)
+    "renew_before_seconds": 86400,   # re-register channels expiring within this window
+    "renew_check_seconds": 3600,     # how often auth_server looks for channels to renew
+}
+
+# auth_server.py, served by waitress unless started with --dev
+AUTH_SERVER_CONFIG = {
+    "host": "127.0.0.1",          # put a reverse proxy in front for HTTPS
+    "port": 8080,
+    "threads": 16,                # requests handled at once
+    "redirect_uri": "http://localhost:8080/oauth2callback",  # must match the Google Cloud console
+    "db_pool_min": 2,             # connections opened at startup
+    "db_pool_max": 10,            # requests beyond this wait for a free connection
+    "db_pool_timeout": 10,        # seconds to wait before giving up
+    "google_workers": 8,          # token exchanges and other Google calls running at once
+    "google_queue": 64,           # calls allowed to wait; beyond this requests get a 503
+    "google_timeout": 30,         # seconds before a request stops waiting on Google (504)
+}
+
+# Task reminders (see core/reminders.py)
+REMINDER_CONFIG = {
+    "window_minutes": 60,    # how far ahead reminders are loaded into memory at a time
+    "catch_up_minutes": 15,  # reminders missed by up to this much (e.g. during a restart) are still sent
+}
+
+# Daily schedule generation (see core/daily_schedule.py)
+SCHEDULE_CONFIG = {
+    "nightly_time_utc": "04:00",  # when the batch plans every user's day
+    "batch_size": 2000,           # users planned per NumPy batch
+    "check_minutes": 5,           # how often each process looks for its partitions still due a run
+}
+
+# /chart rendering (see core/charts.py)
+CHART_CONFIG = {
+    "workers": 2,                  # render processes, each importing matplotlib once at startup
+    "max_concurrent_renders": 4,   # renders handed to the pool at once; further requests wait their turn
+    "cache_entries": 256,          # rendered PNGs kept in memory, keyed by a hash of the plotted data
+}
+
+# Member search behind /mirror's autocomplete (see core/member_index.py). Needs
+# the Server Members intent enabled in the Discord developer portal.
+MEMBER_INDEX_CONFIG = {
+    "resync_hours": 24,   # a guild's full member list is re-fetched when it comes online after this long
+    "batch_size": 1000,   # members written per round trip during a full sync (Discord returns 1000 per page)
+}
+
+# /import and /export of tasks as CSV or iCalendar (see core/task_transfer.py)
+TRANSFER_CONFIG = {
+    "max_import_bytes": 10_000_000,  # larger attachments are refused before downloading
+    "max_import_rows": 20_000,       # tasks per imported file
+    "export_batch_size": 2000,       # rows fetched per round trip while exporting
+}
+
+# Cluster mode (see core/cluster.py). With more than one cluster, bot_main.py
+# supervises that many processes, each owning an even range of shards and its
+# own DB pool (size DB_POOL_CONFIG with that in mind). Drafts are then always
+# kept in Postgres.
+CLUSTER_CONFIG = {
+    "clusters": 1,
+    "shard_count": None,               # None asks Discord for its recommended count
+    "restart_delay_seconds": 5,        # first wait before restarting a crashed cluster, doubled per crash
+    "max_restart_delay_seconds": 300,
+    "stable_after_seconds": 600,       # a cluster that ran this long restarts with the first delay again
+}
+
+# Background jobs (reminders, calendar sync, nightly schedules) are split into
+# partitions by user and shared out between all running bot processes, on any
+# number of hosts (see core/jobs.py). Every process must use the same count.
+JOB_CONFIG = {
+    "partitions": 16,     # upper bound on how many processes can share a job
+    "check_seconds": 5,   # how often leases are renewed and rebalanced; bounds handover after a crash
+}
@@ -0,0 +1,437 @@
+# Two-way Google Calendar sync.
+#
+# Push: a trigger marks tasks dirty when their calendar-visible fields change
+# (migrations/0008_task_calendar_sync.sql). Each run reads only dirty tasks,
+# sends them as batched Calendar API requests and records the Google event id
+# and etag per task, so unchanged tasks are never resent.
+#
+# Pull: each user's events are copied into calendar_events
+# (migrations/0009_calendar_events.sql) with incremental events.list calls.
+# After the first full listing only the changes since the stored syncToken are
+# transferred; a 410 from Google means the token expired and triggers a full resync.
+# Users with a push-notification channel are pulled as soon as auth_server queues
+# a request for them (migrations/0010_calendar_watch_channels.sql); polling is
+# only a slow safety net for them.
+# With a job runner (core/jobs.py), background runs and queued pull requests
+# only cover the users in the partitions this process holds; explicit
+# sync_user/pull_user calls are not limited.
+
+import asyncio
+import datetime
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+import psycopg
+from googleapiclient.errors import HttpError
+from config import DB_CONFIG
+from core.google_calendar import CalendarNotLinked
+from core.jobs import partition_filter, partition_params
+
+BATCH_SIZE = 50  # Calendar API limit per batch request
+PULL_PAGE_SIZE = 250
+PULL_HISTORY_DAYS = 30  # how far back a full resync reaches
+PULL_REQUEST_CHANNEL = "calendar_pull_requested"
+JOB = "calendar_sync"
+
+
+def event_body(task, prefs):
+    start = task["due_time"]
+    end = start + datetime.timedelta(minutes=task["duration_minutes"] or 15)
+    body = {
+        "summary": task["description"],
+        "start": {"dateTime": start.isoformat(), "timeZone": prefs.time_zone},
+        "end": {"dateTime": end.isoformat(), "timeZone": prefs.time_zone},
+        "extendedProperties": {"private": {"task_id": str(task["id"])}},
+    }
+    if task["location"]:
+        body["location"] = task["location"]
+    return body
+
+
+# Google gives timed events a dateTime (an offset, or a separate timeZone) and all-day ones a date
+def _event_time(value, tz):
+    if "dateTime" in value:
+        moment = datetime.datetime.fromisoformat(value["dateTime"].replace("Z", "+00:00"))
+        if moment.tzinfo is None:
+            try:
+                moment = moment.replace(tzinfo=ZoneInfo(value["timeZone"]))
+            except (KeyError, ZoneInfoNotFoundError, ValueError):
+                moment = moment.replace(tzinfo=tz)
+        return moment, False
+    if "date" in value:
+        day = datetime.date.fromisoformat(value["date"])
+        return datetime.datetime.combine(day, datetime.time(), tzinfo=tz), True
+    return None, False
+
+
+def event_row(event, tz):
+    start, all_day = _event_time(event.get("start", {}), tz)
+    end, _ = _event_time(event.get("end", {}), tz)
+    task_id = event.get("extendedProperties", {}).get("private", {}).get("task_id")
+    updated = event.get("updated")
+    return (
+        event["id"],
+        event.get("summary"),
+        event.get("location"),
+        start,
+        end or start,
+        all_day,
+        int(task_id) if task_id and task_id.isdigit() else None,
+        datetime.datetime.fromisoformat(updated.replace("Z", "+00:00")) if updated else None,
+    )
+
+
+class CalendarSync:
+    RECONNECT_DELAY = 5  # seconds before re-opening a dropped LISTEN connection
+
+    def __init__(self, pool, calendar, preferences, batch_size=BATCH_SIZE, max_concurrency=8, jobs=None):
+        self.pool = pool
+        self.jobs = jobs
+        self.calendar = calendar
+        self.preferences = preferences
+        self.batch_size = min(batch_size, BATCH_SIZE)
+        self.max_concurrency = max_concurrency
+        self._running = set()  # ("push" | "pull", user id) in flight, so two pushes never create duplicate events
+        self._rerun = set()    # of those, the ones requested again meanwhile
+        self._listener = None
+        self._drain = None
+        self._drain_again = False
+        if jobs is not None:
+            jobs.subscribe(JOB, self._partitions_changed)
+
+    # Requests queued for users nobody held are drained by the new owner
+    def _partitions_changed(self, gained, lost):
+        if gained and self._listener is not None:
+            self._request_drain()
+
+    async def dirty_users(self):
+        async with self.pool.connection() as conn:
+            cur = await conn.execute(f"""
+                SELECT DISTINCT t.user_id FROM tasks t
+                JOIN calendar_tokens c ON c.user_id = t.user_id
+                WHERE t.calendar_dirty AND {partition_filter("c.user_id")}
+                UNION
+                SELECT DISTINCT d.user_id FROM calendar_deletions d
+                JOIN calendar_tokens c ON c.user_id = d.user_id
+                WHERE {partition_filter("c.user_id")}
+            """, partition_params(self.jobs, JOB))
+            return [row["user_id"] for row in await cur.fetchall()]
+
+    async def _for_users(self, run, user_ids):
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        async def guarded(user_id):
+            async with semaphore:
+                try:
+                    return await run(user_id)
+                except Exception as e:
+                    print(f"⚠️ Calendar sync failed for {user_id}: {e}")
+                    return None
+
+        return await asyncio.gather(*(guarded(user_id) for user_id in user_ids))
+
+    # Runs one push or pull per user at a time; a request arriving meanwhile
+    # returns None and makes the running one go again once it finishes
+    async def _exclusive(self, kind, user_id, run):
+        key = (kind, str(user_id))
+        if key in self._running:
+            self._rerun.add(key)
+            return None
+        self._running.add(key)
+        try:
+            result = await run(str(user_id))
+            while key in self._rerun:
+                self._rerun.discard(key)
+                result = await run(str(user_id))
+            return result
+        except CalendarNotLinked:
+            return None
+        finally:
+            self._running.discard(key)
+            self._rerun.discard(key)
+
+    async def sync_all(self, user_ids=None):
+        if user_ids is None:
+            user_ids = await self.dirty_users()
+        totals = {"users": 0, "created": 0, "updated": 0, "deleted": 0, "failed": 0, "requests": 0}
+        for stats in await self._for_users(self.sync_user, user_ids):
+            if stats:
+                totals["users"] += 1
+                for key in ("created", "updated", "deleted", "failed", "requests"):
+                    totals[key] += stats[key]
+        return totals
+
+    async def sync_user(self, user_id):
+        return await self._exclusive("push", user_id, self._sync_user)
+
+    async def _sync_user(self, user_id):
+        stats = {"created": 0, "updated": 0, "deleted": 0, "failed": 0, "requests": 0}
+        prefs = await self.preferences.get(user_id)
+
+        async with self.pool.connection() as conn:
+            cur = await conn.execute("""
+                SELECT id, description, due_time, duration_minutes, location, gcal_event_id, gcal_etag, calendar_version
+                FROM tasks WHERE user_id = %s AND calendar_dirty
+                ORDER BY id
+            """, (user_id,))
+            tasks = await cur.fetchall()
+            cur = await conn.execute("SELECT id, event_id FROM calendar_deletions WHERE user_id = %s", (user_id,))
+            deletions = await cur.fetchall()
+
+        # (request id, kind, row); request ids are "t<task id>" or "d<deletion id>"
+        ops = [(f"d{row['id']}", "purge", row) for row in deletions]
+        nothing_to_send = []
+        for task in tasks:
+            if task["due_time"] is not None:
+                ops.append((f"t{task['id']}", "update" if task["gcal_event_id"] else "create", task))
+            elif task["gcal_event_id"]:
+                ops.append((f"t{task['id']}", "remove", task))
+            else:
+                nothing_to_send.append(task)
+
+        if nothing_to_send:
+            await self._record([(t["id"], None, None, t["calendar_version"]) for t in nothing_to_send], [], [], [])
+
+        for start in range(0, len(ops), self.batch_size):
+            chunk = ops[start:start + self.batch_size]
+            results = await self._send_batch(user_id, chunk, prefs)
+            stats["requests"] += 1
+
+            synced, reset_event, reset_etag, purged = [], [], [], []
+            for request_id, kind, row in chunk:
+                response, error = results.get(request_id, (None, None))
+                status = error.resp.status if isinstance(error, HttpError) else None
+                if kind == "purge":
+                    if error is None or status in (404, 410):
+                        purged.append(row["id"])
+                        stats["deleted"] += 1
+                    else:
+                        stats["failed"] += 1
+                elif kind == "remove":
+                    if error is None or status in (404, 410):
+                        synced.append((row["id"], None, None, row["calendar_version"]))
+                        stats["deleted"] += 1
+                    else:
+                        stats["failed"] += 1
+                elif error is None and response is not None:
+                    synced.append((row["id"], response["id"], response.get("etag"), row["calendar_version"]))
+                    stats["created" if kind == "create" else "updated"] += 1
+                else:
+                    # 404/410: the event was deleted in Google, recreate it next run.
+                    # 412: it was edited in Google since our last push, overwrite it next run.
+                    if status in (404, 410):
+                        reset_event.append(row["id"])
+                    elif status == 412:
+                        reset_etag.append(row["id"])
+                    stats["failed"] += 1
+
+            await self._record(synced, reset_event, reset_etag, purged)
+
+        return stats
+
+    async def _send_batch(self, user_id, chunk, prefs):
+        results = {}
+
+        def collect(request_id, response, exception):
+            results[request_id] = (response, exception)
+
+        def make_batch(service):
+            batch = service.new_batch_http_request(callback=collect)
+            events = service.events()
+            for request_id, kind, row in chunk:
+                if kind == "create":
+                    request = events.insert(calendarId="primary", body=event_body(row, prefs))
+                elif kind == "update":
+                    request = events.patch(calendarId="primary", eventId=row["gcal_event_id"], body=event_body(row, prefs))
+                    if row["gcal_etag"]:
+                        request.headers["If-Match"] = row["gcal_etag"]
+                else:
+                    event_id = row["event_id"] if kind == "purge" else row["gcal_event_id"]
+                    request = events.delete(calendarId="primary", eventId=event_id)
+                batch.add(request, request_id=request_id)
+            return batch
+
+        await self.calendar.call(user_id, make_batch)
+        return results
+
+    # Writes one batch's outcome back in a single transaction. A task stays dirty
+    # if it was edited again while its push was in flight (calendar_version moved on).
+    async def _record(self, synced, reset_event, reset_etag, purged):
+        async with self.pool.connection() as conn:
+            if synced:
+                ids, event_ids, etags, versions = map(list, zip(*synced))
+                await conn.execute("""
+                    UPDATE tasks t SET
+                        gcal_event_id = v.event_id,
+                        gcal_etag = v.etag,
+                        calendar_dirty = t.calendar_version <> v.version
+                    FROM unnest(%s::int[], %s::text[], %s::text[], %s::bigint[]) AS v(id, event_id, etag, version)
+                    WHERE t.id = v.id
+                """, (ids, event_ids, etags, versions))
+            if reset_event:
+                await conn.execute("UPDATE tasks SET gcal_event_id = NULL, gcal_etag = NULL WHERE id = ANY(%s)", (reset_event,))
+            if reset_etag:
+                await conn.execute("UPDATE tasks SET gcal_etag = NULL WHERE id = ANY(%s)", (reset_etag,))
+            if purged:
+                await conn.execute("DELETE FROM calendar_deletions WHERE id = ANY(%s)", (purged,))
+
+    # Users with a live watch channel get pushed changes, so they may go watched_max_age unpolled
+    async def stale_users(self, max_age, watched_max_age=None):
+        async with self.pool.connection() as conn:
+            cur = await conn.execute(f"""
+                SELECT c.user_id FROM calendar_tokens c
+                LEFT JOIN calendar_pull_state p ON p.user_id = c.user_id
+                WHERE {partition_filter("c.user_id")} AND (
+                    p.last_pulled IS NULL
+                    OR p.last_pulled < now() - interval '1 second' * CASE
+                        WHEN EXISTS (
+                            SELECT 1 FROM calendar_watch_channels w
+                            WHERE w.user_id = c.user_id AND w.expiration > now()
+                        ) THEN %(watched_max_age)s
+                        ELSE %(max_age)s
+                    END
+                )
+            """, {
+                "watched_max_age": watched_max_age if watched_max_age is not None else max_age,
+                "max_age": max_age,
+                **partition_params(self.jobs, JOB),
+            })
+            return [row["user_id"] for row in await cur.fetchall()]
+
+    # Pulls every linked user not pulled recently enough (see stale_users), or the given users
+    async def pull_all(self, user_ids=None, max_age=0, watched_max_age=None):
+        if user_ids is None:
+            user_ids = await self.stale_users(max_age, watched_max_age)
+        totals = {"users": 0, "changed": 0, "full": 0}
+        for stats in await self._for_users(self.pull_user, user_ids):
+            if stats:
+                totals["users"] += 1
+                totals["changed"] += stats["changed"]
+                totals["full"] += stats["full"]
+        return totals
+
+    async def pull_user(self, user_id):
+        return await self._exclusive("pull", user_id, self._pull_user)
+
+    async def _pull_user(self, user_id):
+        prefs = await self.preferences.get(user_id)
+        async with self.pool.connection() as conn:
+            cur = await conn.execute("SELECT sync_token FROM calendar_pull_state WHERE user_id = %s", (user_id,))
+            row = await cur.fetchone()
+        sync_token = row["sync_token"] if row else None
+
+        try:
+            items, next_token = await self._list_events(user_id, sync_token)
+        except HttpError as e:
+            if e.resp.status != 410 or sync_token is None:
+                raise
+            sync_token = None
+            items, next_token = await self._list_events(user_id, None)
+
+        full = sync_token is None
+        cancelled = [item["id"] for item in items if item.get("status") == "cancelled"]
+        # Later entries win: a page can repeat an event that changed while listing
+        rows = {item["id"]: event_row(item, prefs.tz) for item in items if item.get("status") != "cancelled"}
+        for event_id in cancelled:
+            rows.pop(event_id, None)
+
+        async with self.pool.connection() as conn:
+            if full:
+                await conn.execute("DELETE FROM calendar_events WHERE user_id = %s", (user_id,))
+            elif cancelled:
+                await conn.execute(
+                    "DELETE FROM calendar_events WHERE user_id = %s AND event_id = ANY(%s)", (user_id, cancelled)
+                )
+            if rows:
+                await conn.execute("""
+                    INSERT INTO calendar_events (user_id, event_id, summary, location, start_time, end_time, all_day, task_id, updated)
+                    SELECT %s, * FROM unnest(
+                        %s::text[], %s::text[], %s::text[], %s::timestamptz[], %s::timestamptz[],
+                        %s::boolean[], %s::int[], %s::timestamptz[]
+                    )
+                    ON CONFLICT (user_id, event_id) DO UPDATE SET
+                        summary = EXCLUDED.summary,
+                        location = EXCLUDED.location,
+                        start_time = EXCLUDED.start_time,
+                        end_time = EXCLUDED.end_time,
+                        all_day = EXCLUDED.all_day,
+                        task_id = EXCLUDED.task_id,
+                        updated = EXCLUDED.updated
+                """, (user_id, *map(list, zip(*rows.values()))))
+            await conn.execute("""
+                INSERT INTO calendar_pull_state (user_id, sync_token, last_pulled) VALUES (%s, %s, now())
+                ON CONFLICT (user_id) DO UPDATE SET sync_token = EXCLUDED.sync_token, last_pulled = EXCLUDED.last_pulled
+            """, (user_id, next_token))
+
+        return {"changed": len(items), "full": full}
+
+    # Lists all pages of a full listing (no token) or of the changes since sync_token
+    async def _list_events(self, user_id, sync_token):
+        items, page_token = [], None
+        while True:
+            params = {"calendarId": "primary", "singleEvents": True, "maxResults": PULL_PAGE_SIZE}
+            if sync_token:
+                params["syncToken"] = sync_token
+            else:
+                since = datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(days=PULL_HISTORY_DAYS)
+                params["timeMin"] = since.isoformat()
+            if page_token:
+                params["pageToken"] = page_token
+
+            page = await self.calendar.call(user_id, lambda service, params=params: service.events().list(**params))
+            items.extend(page.get("items", []))
+            page_token = page.get("nextPageToken")
+            if not page_token:
+                return items, page.get("nextSyncToken")
+
+    # Serves the pull requests auth_server queued from webhook notifications
+    async def drain_pull_requests(self):
+        totals = {"users": 0, "changed": 0, "full": 0}
+        while True:
+            self._drain_again = False
+            async with self.pool.connection() as conn:
+                cur = await conn.execute(
+                    f"DELETE FROM calendar_pull_requests WHERE {partition_filter('user_id')} RETURNING user_id",
+                    partition_params(self.jobs, JOB),
+                )
+                user_ids = [row["user_id"] for row in await cur.fetchall()]
+            if user_ids:
+                stats = await self.pull_all(user_ids)
+                for key in totals:
+                    totals[key] += stats[key]
+            if not self._drain_again:
+                return totals
+
+    def _request_drain(self):
+        if self._drain is not None and not self._drain.done():
+            self._drain_again = True
+            return
+        self._drain = asyncio.create_task(self._drain_logged())
+
+    async def _drain_logged(self):
+        try:
+            await self.drain_pull_requests()
+        except Exception as e:
+            print(f"⚠️ Calendar pull requests failed: {e}")
+
+    def start(self):
+        if self._listener is None:
+            self._listener = asyncio.create_task(self._listen())
+
+    async def stop(self):
+        if self._listener is not None:
+            self._listener.cancel()
+            self._listener = None
+
+    async def _listen(self):
+        while True:
+            try:
+                async with await psycopg.AsyncConnection.connect(**DB_CONFIG, autocommit=True) as conn:
+                    await conn.execute(f"LISTEN {PULL_REQUEST_CHANNEL}")
+                    # Requests may have been queued while we weren't listening
+                    self._request_drain()
+                    async for notify in conn.notifies():
+                        self._request_drain()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"⚠️ Calendar pull listener disconnected: {e}")
+            await asyncio.sleep(self.RECONNECT_DELAY)
@@ -0,0 +1,156 @@
+# Progress charts rendered off the event loop (`/chart` in cogs/charts.py).
+# matplotlib is slow to import and every render is CPU-bound, so PNGs are drawn
+# in a process pool whose workers import it once when they start. Images are
+# cached under a hash of the aggregate data they plot: the same numbers never
+# render twice, and changed numbers give a new key, so nothing is invalidated.
+# This module is imported by the pool workers too, so it must not pull in
+# discord or the database at import time.
+
+import asyncio
+import datetime
+import hashlib
+import io
+import json
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+PROGRESS_SQL = """
+    SELECT day::date AS day, COUNT(t.id) AS finished, COALESCE(SUM(t.actual_duration), 0) AS minutes
+    FROM generate_series(%(first)s::date, %(last)s::date, INTERVAL '1 day') AS day
+    LEFT JOIN tasks t ON t.user_id = %(user_id)s AND t.status = 'done'
+        AND t.stop_time >= day AND t.stop_time < day + INTERVAL '1 day'
+    GROUP BY day
+    ORDER BY day
+"""
+
+
+# Tasks finished and minutes worked per day for the `days` days ending `today`,
+# shaped as the JSON-friendly dict render_progress() takes. Days are the user's:
+# stop_time is written in their wall time (UserPreferences.local_now()), so
+# `today` must come from the same clock.
+async def fetch_progress(pool, user_id, today, days):
+    first = today - datetime.timedelta(days=days - 1)
+    async with pool.connection() as conn:
+        cur = await conn.execute(PROGRESS_SQL, {"user_id": str(user_id), "first": first, "last": today})
+        rows = await cur.fetchall()
+    return {
+        "days": [r["day"].isoformat() for r in rows],
+        "finished": [r["finished"] for r in rows],
+        "minutes": [round(r["minutes"], 1) for r in rows],
+    }
+
+
+def chart_key(kind, data):
+    payload = json.dumps([kind, data], sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+# ----- Worker side -----
+
+def warm_up():
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot  # noqa: F401
+
+
+def render_progress(data):
+    import matplotlib.pyplot as plt
+
+    labels = [datetime.date.fromisoformat(day).strftime("%d %b") for day in data["days"]]
+    fig, minutes_ax = plt.subplots(figsize=(8, 4), dpi=100)
+    try:
+        minutes_ax.bar(labels, data["minutes"], color="#5865f2", label="Minutes worked")
+        minutes_ax.set_ylabel("Minutes worked")
+        minutes_ax.tick_params(axis="x", labelrotation=45, labelsize=8)
+        finished_ax = minutes_ax.twinx()
+        finished_ax.plot(labels, data["finished"], color="#57f287", marker="o", label="Tasks finished")
+        finished_ax.set_ylabel("Tasks finished")
+        finished_ax.set_ylim(bottom=0)
+        finished_ax.yaxis.get_major_locator().set_params(integer=True)
+        minutes_ax.set_title(f"Progress over the last {len(labels)} days")
+        fig.legend(loc="upper left", bbox_to_anchor=(0.08, 0.9), fontsize=8)
+        fig.tight_layout()
+        buffer = io.BytesIO()
+        fig.savefig(buffer, format="png")
+        return buffer.getvalue()
+    finally:
+        plt.close(fig)
+
+
+RENDERERS = {"progress": render_progress}
+
+
+# ----- Bot side -----
+
+class ChartRenderer:
+    def __init__(self, workers=2, max_concurrent_renders=4, cache_entries=256):
+        self.workers = workers
+        self.cache_entries = cache_entries
+        self._limit = asyncio.Semaphore(max_concurrent_renders)
+        self._pool = None
+        self._cache = OrderedDict()   # key -> PNG bytes, least recently used first
+        self._inflight = {}           # key -> future of a render in progress
+        self.hits = 0
+        self.renders = 0
+        self.render_seconds = 0.0
+
+    # Submitting one job per worker spawns them all now, so matplotlib is
+    # imported in the background and the first /chart does not pay for it
+    def start(self):
+        self._pool = ProcessPoolExecutor(max_workers=self.workers, initializer=warm_up)
+        return [self._pool.submit(warm_up) for _ in range(self.workers)]
+
+    def stop(self):
+        if self._pool:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    async def render(self, kind, data):
+        key = chart_key(kind, data)
+        png = self._cache.get(key)
+        if png is not None:
+            self._cache.move_to_end(key)
+            self.hits += 1
+            return png
+
+        # Concurrent requests for the same chart share one render, which carries
+        # on even if the interaction that started it goes away
+        pending = self._inflight.get(key)
+        if pending is None:
+            pending = asyncio.ensure_future(self._render(key, kind, data))
+            self._inflight[key] = pending
+            pending.add_done_callback(lambda _: self._inflight.pop(key, None))
+        else:
+            self.hits += 1
+        return await asyncio.shield(pending)
+
+    # At most max_concurrent_renders jobs are handed to the pool at once; the
+    # rest wait here instead of piling up in the executor's queue
+    async def _render(self, key, kind, data):
+        async with self._limit:
+            loop = asyncio.get_running_loop()
+            started = time.perf_counter()
+            try:
+                png = await loop.run_in_executor(self._pool, RENDERERS[kind], data)
+            except BrokenProcessPool:
+                # A worker died (e.g. killed for memory); replace the pool for later renders
+                self._pool.shutdown(wait=False, cancel_futures=True)
+                self._pool = ProcessPoolExecutor(max_workers=self.workers, initializer=warm_up)
+                raise
+            self.renders += 1
+            self.render_seconds += time.perf_counter() - started
+        self._cache[key] = png
+        if len(self._cache) > self.cache_entries:
+            self._cache.popitem(last=False)
+        return png
+
+    def stats(self):
+        return {
+            "cached": len(self._cache),
+            "cache_bytes": sum(len(png) for png in self._cache.values()),
+            "hits": self.hits,
+            "renders": self.renders,
+            "avg_render_ms": 1000 * self.render_seconds / self.renders if self.renders else None,
+        }
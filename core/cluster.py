@@ -0,0 +1,156 @@
+# Cluster mode: several bot processes, each owning a contiguous range of shards.
+# `python bot_main.py` with CLUSTER_CONFIG["clusters"] > 1 runs the Supervisor,
+# which starts one `bot_main.py --cluster N` child per cluster, prefixes their
+# output, restarts any that exit, and reports when every cluster is ready.
+# Children share nothing but Postgres. Identifies are paced across processes
+# with advisory locks, and background jobs are shared out by the job runner
+# (core/jobs.py).
+
+import asyncio
+import os
+import signal
+import sys
+import time
+import aiohttp
+from discord.ext import commands
+
+# Prefix of the line a cluster prints once all its shards are ready; the
+# supervisor watches for it to time each cluster
+READY_PREFIX = "✅ Cluster"
+
+# Advisory lock keys for identify buckets (see migrations.MIGRATION_LOCK_ID)
+IDENTIFY_LOCK_BASE = 7_130_100
+IDENTIFY_INTERVAL = 5.5  # Discord allows one identify per bucket every 5 seconds
+
+
+# Shard ids for each cluster, as even contiguous ranges
+def shard_ranges(shard_count, clusters):
+    return [list(range(i * shard_count // clusters, (i + 1) * shard_count // clusters)) for i in range(clusters)]
+
+
+# Discord's recommended shard count and identify concurrency for this token
+async def gateway_info(token):
+    async with aiohttp.ClientSession() as session:
+        async with session.get(
+            "https://discord.com/api/v10/gateway/bot", headers={"Authorization": f"Bot {token}"}
+        ) as response:
+            response.raise_for_status()
+            data = await response.json()
+    return data["shards"], data["session_start_limit"]["max_concurrency"]
+
+
+class ClusterBot(commands.AutoShardedBot):
+    def __init__(self, *args, cluster_id=0, identify_concurrency=1, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.cluster_id = cluster_id
+        self.identify_concurrency = identify_concurrency
+        self.started_at = time.perf_counter()
+        self.shard_ready_times = {}  # shard id -> seconds from process start to READY
+        self.ready_at = None         # seconds from process start to the first on_ready
+        self._identify_holds = set()
+
+    # Clusters identify in parallel, so the per-bucket rate limit is enforced
+    # with a Postgres advisory lock held for the bucket's interval instead of
+    # discord.py's in-process sleep
+    async def before_identify_hook(self, shard_id, *, initial=False):
+        if self.shard_ids is None:  # single process owning every shard
+            return await super().before_identify_hook(shard_id, initial=initial)
+        acquired = asyncio.Event()
+        hold = asyncio.create_task(self._hold_identify_slot(shard_id % self.identify_concurrency, acquired))
+        self._identify_holds.add(hold)
+        hold.add_done_callback(self._identify_holds.discard)
+        await acquired.wait()
+
+    async def _hold_identify_slot(self, bucket, acquired):
+        async with self.db.connection() as conn:
+            await conn.execute("SELECT pg_advisory_lock(%s)", (IDENTIFY_LOCK_BASE + bucket,))
+            try:
+                acquired.set()
+                await asyncio.sleep(IDENTIFY_INTERVAL)
+            finally:
+                await conn.execute("SELECT pg_advisory_unlock(%s)", (IDENTIFY_LOCK_BASE + bucket,))
+
+
+class Supervisor:
+    def __init__(self, clusters, shard_count=None, identify_concurrency=None,
+                 restart_delay=5, max_restart_delay=300, stable_after=600):
+        self.clusters = clusters
+        self.shard_count = shard_count
+        self.identify_concurrency = identify_concurrency
+        self.restart_delay = restart_delay
+        self.max_restart_delay = max_restart_delay
+        self.stable_after = stable_after  # a cluster up this long has its restart backoff reset
+        self._processes = {}
+        self._ready = {}  # cluster -> seconds from spawn to ready, for the current start
+        self._stopping = False
+        self._started = None
+        self._all_ready = False
+
+    def command(self, cluster):
+        return [
+            sys.executable, os.path.abspath(sys.argv[0]),
+            "--cluster", str(cluster), "--clusters", str(self.clusters),
+            "--shard-count", str(self.shard_count),
+            "--identify-concurrency", str(self.identify_concurrency),
+        ]
+
+    async def run(self, token):
+        if self.shard_count is None or self.identify_concurrency is None:
+            recommended, concurrency = await gateway_info(token)
+            self.shard_count = self.shard_count or max(recommended, self.clusters)
+            self.identify_concurrency = self.identify_concurrency or concurrency
+        for cluster, shards in enumerate(shard_ranges(self.shard_count, self.clusters)):
+            print(f"🧩 Cluster {cluster}: shards {shards[0]}-{shards[-1]}")
+
+        loop = asyncio.get_running_loop()
+        if sys.platform != "win32":
+            loop.add_signal_handler(signal.SIGTERM, lambda: asyncio.ensure_future(self.stop()))
+        self._started = time.perf_counter()
+        try:
+            await asyncio.gather(*(self._keep_running(cluster) for cluster in range(self.clusters)))
+        finally:
+            await self.stop()
+
+    async def stop(self):
+        self._stopping = True
+        for process in self._processes.values():
+            if process.returncode is None:
+                process.terminate()
+        for process in list(self._processes.values()):
+            try:
+                await asyncio.wait_for(process.wait(), 30)
+            except asyncio.TimeoutError:
+                process.kill()
+
+    # Restarts the cluster whenever it exits, backing off while it keeps crashing
+    async def _keep_running(self, cluster):
+        delay = self.restart_delay
+        while not self._stopping:
+            spawned = time.perf_counter()
+            self._ready.pop(cluster, None)
+            process = await asyncio.create_subprocess_exec(
+                *self.command(cluster),
+                stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.STDOUT,
+                env={**os.environ, "PYTHONUNBUFFERED": "1"},
+            )
+            self._processes[cluster] = process
+            await self._relay(cluster, process, spawned)
+            code = await process.wait()
+            if self._stopping:
+                break
+            if time.perf_counter() - spawned >= self.stable_after:
+                delay = self.restart_delay
+            print(f"⚠️ Cluster {cluster} exited with code {code}, restarting in {delay}s")
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, self.max_restart_delay)
+
+    async def _relay(self, cluster, process, spawned):
+        async for line in process.stdout:
+            text = line.decode(errors="replace").rstrip()
+            print(f"[cluster {cluster}] {text}")
+            if text.startswith(READY_PREFIX) and cluster not in self._ready:
+                self._ready[cluster] = time.perf_counter() - spawned
+                if len(self._ready) == self.clusters and not self._all_ready:
+                    self._all_ready = True
+                    times = ", ".join(f"{c}: {seconds:.1f}s" for c, seconds in sorted(self._ready.items()))
+                    print(f"⏱️ All {self.clusters} clusters ready after {time.perf_counter() - self._started:.1f}s ({times})")
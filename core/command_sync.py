@@ -0,0 +1,34 @@
+# Slash-command sync that only talks to Discord when the command tree changed.
+# The serialized tree is hashed per scope (global or one guild) and the hash of
+# the last successful sync is kept in bot_state.
+
+import hashlib
+import json
+
+
+def tree_hash(tree, guild=None):
+    payload = [cmd.to_dict(tree) for cmd in tree.get_commands(guild=guild)]
+    payload.sort(key=lambda c: (c.get("type", 1), c["name"]))
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode()).hexdigest()
+
+
+async def sync_if_changed(bot, guild=None, force=False):
+    scope = f"guild:{guild.id}" if guild else "global"
+    key = f"command_tree_hash:{bot.application_id}:{scope}"
+    digest = tree_hash(bot.tree, guild)
+
+    async with bot.db.connection() as conn:
+        cur = await conn.execute("SELECT value FROM bot_state WHERE key = %s", (key,))
+        row = await cur.fetchone()
+
+    if not force and row and row["value"] == digest:
+        return False
+
+    await bot.tree.sync(guild=guild)
+
+    async with bot.db.connection() as conn:
+        await conn.execute("""
+            INSERT INTO bot_state (key, value) VALUES (%s, %s)
+            ON CONFLICT (key) DO UPDATE SET value = EXCLUDED.value, updated_at = NOW()
+        """, (key, digest))
+    return True
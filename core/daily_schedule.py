@@ -0,0 +1,258 @@
+# Daily schedule generator.
+# Every user's day is a row of a (users x 1440) minute bitmap: free inside
+# working hours, minus fixed tasks and cached calendar events. Lunch goes into
+# the earliest free run inside the lunch window, then pending tasks are packed
+# first-fit in priority/deadline order. Each step places the k-th task of every
+# user at once with NumPy, so a batch costs a few array passes per task rank
+# rather than a Python loop per user.
+
+import datetime
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+import numpy as np
+from core.jobs import partition_filter
+
+MINUTES_PER_DAY = 24 * 60
+DEFAULT_TASK_MINUTES = 15
+
+# user_preferences defaults (migrations/0001_initial.sql) for users without a row
+DEFAULT_PREFERENCES = {
+    "work_start": datetime.time(9, 0),
+    "work_end": datetime.time(17, 0),
+    "lunch_window_start": datetime.time(12, 0),
+    "lunch_window_end": datetime.time(14, 0),
+    "lunch_duration_minutes": 30,
+    "time_zone": "GMT",
+}
+
+
+def _minute(value):
+    return value.hour * 60 + value.minute
+
+
+def _zone(name):
+    try:
+        return ZoneInfo(name)
+    except (ZoneInfoNotFoundError, ValueError, TypeError):
+        return ZoneInfo("UTC")
+
+
+# Length of the free run starting at each minute, per row
+def _free_runs(free):
+    reversed_free = free[:, ::-1].astype(np.int32)
+    total = np.cumsum(reversed_free, axis=1)
+    reset = np.maximum.accumulate(np.where(reversed_free == 0, total, 0), axis=1)
+    return (total - reset)[:, ::-1]
+
+
+# Earliest column per row with `lengths` free columns from it on, or -1. With
+# no columns at all (everyone's working day already over) nothing fits.
+def _first_fit(free, lengths):
+    if free.shape[1] == 0:
+        return np.full(free.shape[0], -1)
+    fits = _free_runs(free) >= lengths[:, None]
+    return np.where(fits.any(axis=1), fits.argmax(axis=1), -1)
+
+
+def _block(free, rows, starts, lengths):
+    columns = np.arange(free.shape[1])
+    free[rows] &= ~((columns >= starts[:, None]) & (columns < (starts + lengths)[:, None]))
+
+
+# Pure array core, no DB. Per user: working hours, lunch window and length, and the
+# first usable minute (now, for today). Busy intervals and tasks refer to users by
+# row index; tasks must already be sorted by user and then packing order.
+# Returns (lunch start per user, start per task), -1 where nothing fitted.
+def pack(work_start, work_end, lunch_start, lunch_end, lunch_length, not_before,
+         busy_user, busy_start, busy_end, task_user, task_length):
+    users = len(work_start)
+    # Only the span anyone can work in is materialised; column 0 is minute `first`
+    first = int(np.clip(np.maximum(work_start, not_before).min(), 0, MINUTES_PER_DAY)) if users else 0
+    span = max(int(np.clip(work_end.max(), 0, MINUTES_PER_DAY)) - first, 0) if users else 0
+    minutes = np.arange(first, first + span)
+    free = (minutes >= np.maximum(work_start, not_before)[:, None]) & (minutes < work_end[:, None])
+
+    # Fixed tasks and events via a difference array: +1 where each starts, -1 where it ends
+    busy = np.zeros((users, span + 1), dtype=np.int32)
+    np.add.at(busy, (busy_user, np.clip(busy_start - first, 0, span)), 1)
+    np.add.at(busy, (busy_user, np.clip(busy_end - first, 0, span)), -1)
+    free &= np.cumsum(busy, axis=1)[:, :span] == 0
+
+    lunch_window = (minutes >= lunch_start[:, None]) & (minutes < lunch_end[:, None])
+    lunch = np.where(lunch_length > 0, _first_fit(free & lunch_window, np.maximum(lunch_length, 1)), -1)
+    has_lunch = lunch >= 0
+    _block(free, np.nonzero(has_lunch)[0], lunch[has_lunch], lunch_length[has_lunch])
+
+    # Rank of each task within its user: 0 for the first, 1 for the second...
+    task_start = np.full(len(task_user), -1)
+    if len(task_user):
+        starts_of_user = np.r_[0, np.nonzero(np.diff(task_user))[0] + 1]
+        rank = np.arange(len(task_user)) - np.repeat(starts_of_user, np.diff(np.r_[starts_of_user, len(task_user)]))
+        for k in range(rank.max() + 1):
+            selected = np.nonzero(rank == k)[0]
+            rows = task_user[selected]
+            starts = _first_fit(free[rows], task_length[selected])
+            task_start[selected] = starts
+            placed = starts >= 0
+            _block(free, rows[placed], starts[placed], task_length[selected][placed])
+
+    return np.where(lunch >= 0, lunch + first, -1), np.where(task_start >= 0, task_start + first, -1)
+
+
+# Which day to plan for each user when the batch runs: today until their work
+# ends, tomorrow after that, so one nightly run suits every time zone
+def planning_day(prefs, now_utc):
+    local = now_utc.astimezone(_zone(prefs["time_zone"]))
+    if local.time() >= prefs["work_end"]:
+        return local.date() + datetime.timedelta(days=1)
+    return local.date()
+
+
+async def _load_preferences(conn, user_ids):
+    cur = await conn.execute("""
+        SELECT u.user_id, p.work_start, p.work_end, p.lunch_window_start, p.lunch_window_end,
+               p.lunch_duration_minutes, p.time_zone
+        FROM unnest(%s::text[]) AS u(user_id)
+        LEFT JOIN user_preferences p ON p.user_id = u.user_id
+    """, (user_ids,))
+    prefs = {}
+    for row in await cur.fetchall():
+        prefs[row["user_id"]] = {key: row[key] if row[key] is not None else default for key, default in DEFAULT_PREFERENCES.items()}
+    return prefs
+
+
+# Optionally only the users in the given job partitions (core/jobs.py)
+async def pending_users(pool, partitions=None, partition_count=None):
+    async with pool.connection() as conn:
+        cur = await conn.execute(f"""
+            SELECT DISTINCT user_id FROM tasks
+            WHERE status = 'pending' AND user_id IS NOT NULL AND {partition_filter("user_id")}
+        """, {"partitions": partitions, "partition_count": partition_count})
+        return [row["user_id"] for row in await cur.fetchall()]
+
+
+# Plans `day` (or each user's planning_day) for the given users and, with store,
+# replaces their saved schedule for that day. Returns {user id: (day, entries)},
+# entries sorted by start with unscheduled tasks last.
+async def generate(pool, user_ids, day=None, store=True):
+    now_utc = datetime.datetime.now(datetime.timezone.utc)
+    async with pool.connection() as conn:
+        prefs = await _load_preferences(conn, user_ids)
+        days = [day or planning_day(prefs[user_id], now_utc) for user_id in user_ids]
+        zones = [_zone(prefs[user_id]["time_zone"]) for user_id in user_ids]
+        day_starts = [datetime.datetime.combine(d, datetime.time(), tzinfo=tz) for d, tz in zip(days, zones)]
+
+        cur = await conn.execute("""
+            SELECT t.user_id, t.id, t.description, t.duration_minutes, t.deadline, t.due_time
+            FROM unnest(%s::text[], %s::date[]) AS u(user_id, day)
+            JOIN tasks t ON t.user_id = u.user_id
+            WHERE t.status = 'pending' AND (t.due_time IS NULL OR t.due_time < u.day + 1)
+            ORDER BY t.user_id, t.priority DESC NULLS LAST, t.deadline ASC NULLS LAST, t.id
+        """, (user_ids, days))
+        tasks = await cur.fetchall()
+
+        cur = await conn.execute("""
+            SELECT e.user_id, e.summary, e.start_time, e.end_time, e.all_day
+            FROM unnest(%s::text[], %s::timestamptz[]) AS u(user_id, day_start)
+            JOIN calendar_events e ON e.user_id = u.user_id
+            WHERE e.task_id IS NULL AND e.start_time < u.day_start + interval '1 day' AND e.end_time > u.day_start
+        """, (user_ids, day_starts))
+        events = await cur.fetchall()
+
+    row_of = {user_id: i for i, user_id in enumerate(user_ids)}
+    today = [now_utc.astimezone(tz).date() == d for d, tz in zip(days, zones)]
+    now_minutes = [_minute(now_utc.astimezone(tz)) for tz in zones]
+
+    def minutes_of(key):
+        return np.array([_minute(prefs[user_id][key]) for user_id in user_ids], dtype=np.int64)
+
+    entries = {user_id: [] for user_id in user_ids}
+    busy_user, busy_start, busy_end = [], [], []
+    flexible = []
+    for task in tasks:
+        row = row_of[task["user_id"]]
+        length = max(task["duration_minutes"] or DEFAULT_TASK_MINUTES, 1)
+        local_midnight = datetime.datetime.combine(days[row], datetime.time())
+        if task["due_time"] is not None and task["due_time"] >= local_midnight:
+            start = int((task["due_time"] - local_midnight).total_seconds() // 60)
+            busy_user.append(row)
+            busy_start.append(start)
+            busy_end.append(start + length)
+            entries[task["user_id"]].append(_entry(local_midnight, start, length, "fixed", task))
+        else:
+            flexible.append((row, length, task))  # no time yet, or overdue from an earlier day
+
+    for event in events:
+        if event["all_day"]:
+            continue  # holidays and reminders shouldn't block the working day
+        row = row_of[event["user_id"]]
+        start = int((event["start_time"] - day_starts[row]).total_seconds() // 60)
+        end = int((event["end_time"] - day_starts[row]).total_seconds() // 60)
+        busy_user.append(row)
+        busy_start.append(start)
+        busy_end.append(end)
+        local_midnight = datetime.datetime.combine(days[row], datetime.time())
+        entries[event["user_id"]].append({
+            "starts_at": local_midnight + datetime.timedelta(minutes=max(start, 0)),
+            "ends_at": local_midnight + datetime.timedelta(minutes=min(end, MINUTES_PER_DAY)),
+            "kind": "event", "title": event["summary"], "task_id": None, "late": False,
+        })
+
+    lunch_length = np.array([prefs[user_id]["lunch_duration_minutes"] for user_id in user_ids], dtype=np.int64)
+    lunch, task_start = pack(
+        minutes_of("work_start"), minutes_of("work_end"), minutes_of("lunch_window_start"), minutes_of("lunch_window_end"),
+        lunch_length,
+        np.array([now if is_today else 0 for now, is_today in zip(now_minutes, today)], dtype=np.int64),
+        np.array(busy_user, dtype=np.int64), np.array(busy_start, dtype=np.int64), np.array(busy_end, dtype=np.int64),
+        np.array([row for row, _, _ in flexible], dtype=np.int64),
+        np.array([length for _, length, _ in flexible], dtype=np.int64),
+    )
+
+    for user_id, row in row_of.items():
+        if lunch[row] >= 0:
+            local_midnight = datetime.datetime.combine(days[row], datetime.time())
+            entries[user_id].append({
+                "starts_at": local_midnight + datetime.timedelta(minutes=int(lunch[row])),
+                "ends_at": local_midnight + datetime.timedelta(minutes=int(lunch[row] + lunch_length[row])),
+                "kind": "lunch", "title": "Lunch", "task_id": None, "late": False,
+            })
+    for (row, length, task), start in zip(flexible, task_start):
+        local_midnight = datetime.datetime.combine(days[row], datetime.time())
+        if start >= 0:
+            entries[task["user_id"]].append(_entry(local_midnight, int(start), length, "task", task))
+        else:
+            entries[task["user_id"]].append({
+                "starts_at": None, "ends_at": None, "kind": "unscheduled",
+                "title": task["description"], "task_id": task["id"], "late": False,
+            })
+
+    for user_entries in entries.values():
+        user_entries.sort(key=lambda e: (e["starts_at"] is None, e["starts_at"] or datetime.datetime.min))
+
+    if store:
+        await _store(pool, user_ids, days, entries)
+    return {user_id: (days[row], entries[user_id]) for user_id, row in row_of.items()}
+
+
+def _entry(local_midnight, start, length, kind, task):
+    starts_at = local_midnight + datetime.timedelta(minutes=start)
+    ends_at = starts_at + datetime.timedelta(minutes=length)
+    return {
+        "starts_at": starts_at, "ends_at": ends_at, "kind": kind, "title": task["description"],
+        "task_id": task["id"], "late": task["deadline"] is not None and ends_at > task["deadline"],
+    }
+
+
+async def _store(pool, user_ids, days, entries):
+    async with pool.connection() as conn:
+        await conn.execute("""
+            DELETE FROM daily_schedule_entries s
+            USING unnest(%s::text[], %s::date[]) AS u(user_id, day)
+            WHERE s.user_id = u.user_id AND s.day = u.day
+        """, (user_ids, days))
+        async with conn.cursor() as cur:
+            async with cur.copy(
+                "COPY daily_schedule_entries (user_id, day, starts_at, ends_at, kind, title, task_id, late) FROM STDIN"
+            ) as copy:
+                for user_id, day in zip(user_ids, days):
+                    for e in entries[user_id]:
+                        await copy.write_row((user_id, day, e["starts_at"], e["ends_at"], e["kind"], e["title"], e["task_id"], e["late"]))
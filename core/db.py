@@ -0,0 +1,32 @@
+# Shared async Postgres connection pool.
+# Created once in bot_main.setup_hook and exposed as `bot.db`, so no cog ever
+# opens its own connection or blocks the event loop on a DB call.
+
+import uuid
+from psycopg.rows import dict_row
+from psycopg_pool import AsyncConnectionPool
+from config import DB_CONFIG, DB_POOL_CONFIG
+
+# Tags every write from this process (migrations/0023_task_index_notify.sql),
+# so listeners can tell their own changes from other processes'
+ORIGIN = uuid.uuid4().hex
+
+
+def create_pool():
+    return AsyncConnectionPool(
+        kwargs={**DB_CONFIG, "row_factory": dict_row, "options": f"-c organiser.origin={ORIGIN}"},
+        min_size=DB_POOL_CONFIG.get("min_size", 2),
+        max_size=DB_POOL_CONFIG.get("max_size", 10),
+        timeout=DB_POOL_CONFIG.get("timeout", 10),  # seconds to wait for a free connection
+        max_idle=DB_POOL_CONFIG.get("max_idle", 300),
+        max_lifetime=DB_POOL_CONFIG.get("max_lifetime", 3600),
+        check=AsyncConnectionPool.check_connection,  # health check before handing a connection out
+        open=False,
+        name="bot",
+    )
+
+
+async def open_pool():
+    pool = create_pool()
+    await pool.open(wait=True, timeout=DB_POOL_CONFIG.get("timeout", 10))
+    return pool
@@ -0,0 +1,102 @@
+# Draft store for /todo tasks that have been filled in but not saved yet.
+# Drafts are keyed by user id and expire `ttl` seconds after they were last used;
+# the in-memory store also caps its size and evicts the least recently used draft.
+# PostgresDraftStore keeps drafts in task_drafts so every bot process sees them.
+
+import time
+from collections import OrderedDict
+from psycopg.types.json import Jsonb
+from config import DRAFT_STORE_CONFIG
+
+
+class MemoryDraftStore:
+    def __init__(self, max_size=10_000, ttl=3600):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._drafts = OrderedDict()  # user id -> (expires_at, draft), least recently used first
+
+    async def get(self, user_id):
+        key = str(user_id)
+        entry = self._drafts.get(key)
+        if entry is None or entry[0] < time.monotonic():
+            if entry is not None:
+                del self._drafts[key]
+            return None
+        self._drafts[key] = (time.monotonic() + self.ttl, entry[1])
+        self._drafts.move_to_end(key)
+        return entry[1]
+
+    async def set(self, user_id, draft):
+        key = str(user_id)
+        self._drafts[key] = (time.monotonic() + self.ttl, draft)
+        self._drafts.move_to_end(key)
+        self._evict()
+
+    async def pop(self, user_id):
+        entry = self._drafts.pop(str(user_id), None)
+        return entry[1] if entry else None
+
+    def _evict(self):
+        now = time.monotonic()
+        # Expired drafts first (oldest use is at the front), then trim to max_size
+        while self._drafts:
+            key, (expires_at, _) = next(iter(self._drafts.items()))
+            if expires_at >= now and len(self._drafts) <= self.max_size:
+                break
+            del self._drafts[key]
+
+
+class PostgresDraftStore:
+    EVICT_INTERVAL = 60  # seconds between eviction sweeps per process
+
+    def __init__(self, pool, max_size=10_000, ttl=3600):
+        self.pool = pool
+        self.max_size = max_size
+        self.ttl = ttl
+        self._last_evict = 0.0
+
+    async def get(self, user_id):
+        async with self.pool.connection() as conn:
+            cur = await conn.execute("""
+                UPDATE task_drafts SET updated_at = NOW()
+                WHERE user_id = %s AND updated_at > NOW() - make_interval(secs => %s)
+                RETURNING data
+            """, (str(user_id), self.ttl))
+            row = await cur.fetchone()
+        return row["data"] if row else None
+
+    async def set(self, user_id, draft):
+        async with self.pool.connection() as conn:
+            await conn.execute("""
+                INSERT INTO task_drafts (user_id, data, updated_at) VALUES (%s, %s, NOW())
+                ON CONFLICT (user_id) DO UPDATE SET data = EXCLUDED.data, updated_at = NOW()
+            """, (str(user_id), Jsonb(draft)))
+        if time.monotonic() - self._last_evict > self.EVICT_INTERVAL:
+            await self._evict()
+
+    async def pop(self, user_id):
+        async with self.pool.connection() as conn:
+            cur = await conn.execute("DELETE FROM task_drafts WHERE user_id = %s RETURNING data", (str(user_id),))
+            row = await cur.fetchone()
+        return row["data"] if row else None
+
+    async def _evict(self):
+        self._last_evict = time.monotonic()
+        async with self.pool.connection() as conn:
+            await conn.execute("""
+                DELETE FROM task_drafts WHERE user_id IN (
+                    SELECT user_id FROM task_drafts WHERE updated_at < NOW() - make_interval(secs => %s)
+                    UNION
+                    (SELECT user_id FROM task_drafts ORDER BY updated_at DESC OFFSET %s)
+                )
+            """, (self.ttl, self.max_size))
+
+
+# `shared` is set in cluster mode, where a user's interactions in different
+# guilds can reach different processes, so drafts must live in Postgres
+def create_draft_store(pool, shared=False):
+    max_size = DRAFT_STORE_CONFIG.get("max_size", 10_000)
+    ttl = DRAFT_STORE_CONFIG.get("ttl", 3600)
+    if shared or DRAFT_STORE_CONFIG.get("backend", "memory") == "postgres":
+        return PostgresDraftStore(pool, max_size=max_size, ttl=ttl)
+    return MemoryDraftStore(max_size=max_size, ttl=ttl)
@@ -0,0 +1,118 @@
+# Non-blocking Google Calendar client shared by the whole bot (`bot.calendar`).
+# The discovery document is parsed once, each user's Credentials and service
+# object are kept in an LRU cache, and the blocking googleapiclient calls run on
+# a bounded thread pool. Refreshed access tokens are written back to calendar_tokens.
+
+import asyncio
+import json
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import httplib2
+from google.auth.exceptions import RefreshError
+from google.oauth2.credentials import Credentials
+from google_auth_httplib2 import AuthorizedHttp
+from googleapiclient.discovery import build_from_document
+from googleapiclient.discovery_cache import get_static_doc
+
+
+class CalendarNotLinked(Exception):
+    pass
+
+
+def load_discovery_document(api_root=None):
+    # Ships with googleapiclient, so no network round trip. `api_root` points the
+    # client (including batch requests) at another server, e.g. a local fake.
+    doc = json.loads(get_static_doc("calendar", "v3"))
+    if api_root:
+        doc["rootUrl"] = api_root
+    return doc
+
+
+class _UserClient:
+    __slots__ = ("creds", "service", "lock", "token")
+
+    def __init__(self, creds, service):
+        self.creds = creds
+        self.service = service
+        self.lock = asyncio.Lock()  # httplib2 isn't thread-safe, so one call per user at a time
+        self.token = creds.token
+
+
+class CalendarClient:
+    def __init__(self, pool, max_workers=8, cache_size=1000, http_timeout=30, api_root=None):
+        self.pool = pool
+        self.cache_size = cache_size
+        self.http_timeout = http_timeout
+        self.discovery = load_discovery_document(api_root)
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="calendar")
+        self._clients = OrderedDict()  # user id -> _UserClient, least recently used first
+
+    # Runs `make_request(service)` for a user and returns the executed result.
+    # `make_request` must build the request (e.g. service.events().insert(...)),
+    # not execute it; execution happens on the thread pool.
+    async def call(self, user_id, make_request):
+        user_id = str(user_id)
+        for attempt in range(2):
+            client = await self._get_client(user_id)
+            async with client.lock:
+                try:
+                    result = await asyncio.get_running_loop().run_in_executor(
+                        self.executor, lambda: make_request(client.service).execute()
+                    )
+                except RefreshError:
+                    # The cached refresh token may have been replaced by a relink; retry from the DB once
+                    self._clients.pop(user_id, None)
+                    if attempt:
+                        raise
+                    continue
+                await self._save_refreshed_token(user_id, client)
+                return result
+
+    async def _get_client(self, user_id):
+        client = self._clients.get(user_id)
+        if client is not None:
+            self._clients.move_to_end(user_id)
+            return client
+
+        async with self.pool.connection() as conn:
+            cur = await conn.execute("""
+                SELECT token, refresh_token, token_uri, client_id, client_secret, scopes, expiry
+                FROM calendar_tokens WHERE user_id = %s
+            """, (user_id,))
+            row = await cur.fetchone()
+        if not row:
+            raise CalendarNotLinked(user_id)
+
+        creds = Credentials(
+            token=row["token"],
+            refresh_token=row["refresh_token"],
+            token_uri=row["token_uri"],
+            client_id=row["client_id"],
+            client_secret=row["client_secret"],
+            scopes=row["scopes"].split(),
+            expiry=row["expiry"],
+        )
+        http = AuthorizedHttp(creds, http=httplib2.Http(timeout=self.http_timeout))
+        service = build_from_document(self.discovery, http=http)
+
+        client = _UserClient(creds, service)
+        self._clients[user_id] = client
+        while len(self._clients) > self.cache_size:
+            self._clients.popitem(last=False)
+        return client
+
+    async def _save_refreshed_token(self, user_id, client):
+        if client.creds.token == client.token:
+            return
+        client.token = client.creds.token
+        async with self.pool.connection() as conn:
+            await conn.execute("""
+                UPDATE calendar_tokens SET token = %s, expiry = %s
+                WHERE user_id = %s
+            """, (client.creds.token, client.creds.expiry, user_id))
+
+    def forget(self, user_id):
+        self._clients.pop(str(user_id), None)
+
+    def close(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,203 @@
+# Job runner (`bot.jobs`): decides which bot process runs which share of each
+# background job, however many processes and hosts there are.
+# Every job is split into JOB_CONFIG["partitions"] partitions by user (see
+# user_partition), and a process works on a partition only while it holds the
+# matching Postgres advisory lock on its lease connection. Each process also
+# holds a shared "presence" lock, so all of them can count the live processes
+# and take an even share: a process releases partitions above
+# ceil(partitions / processes) and tries to lock free ones below it, so adding
+# a node spreads the work further. Locks die with their connection, so the
+# partitions of a crashed process are taken over within one check interval,
+# and those of a vanished host once Postgres' TCP keepalives give up on it.
+# A process that loses its connection, or can't renew within a check
+# interval, stops working on everything it held.
+
+import asyncio
+import contextlib
+import hashlib
+import math
+import random
+import psycopg
+from psycopg.rows import dict_row
+from config import DB_CONFIG
+
+# Two-key advisory locks: (LOCK_CLASS + job number, partition). The presence
+# lock is (LOCK_CLASS, 0). See migrations.MIGRATION_LOCK_ID for the others.
+LOCK_CLASS = 7_130_200
+JOBS = {"reminders": 1, "calendar_sync": 2, "nightly_schedule": 3, "command_sync": 4}
+PARTITIONED_JOBS = ("reminders", "calendar_sync", "nightly_schedule")
+
+# Postgres drops the session (and its locks) of an unreachable host after
+# idle + interval * count seconds
+KEEPALIVE_SQL = "SET tcp_keepalives_idle = 10; SET tcp_keepalives_interval = 5; SET tcp_keepalives_count = 3"
+
+COUNT_PROCESSES_SQL = """
+    SELECT COUNT(*) AS processes FROM pg_locks
+    WHERE locktype = 'advisory' AND granted AND mode = 'ShareLock'
+      AND database = (SELECT oid FROM pg_database WHERE datname = current_database())
+      AND classid = %s::oid AND objid = 0 AND objsubid = 2
+"""
+
+# Stops at `limit` acquired locks; the candidates are shuffled by the caller
+# so processes starting together don't all race for the same partitions
+TRY_LOCK_SQL = """
+    SELECT p AS partition FROM unnest(%(candidates)s::int[]) AS p
+    WHERE pg_try_advisory_lock(%(job)s, p)
+    LIMIT %(limit)s
+"""
+
+
+# Must match user_partition() in migrations/0015_job_partitions.sql
+def user_partition(user_id, partitions):
+    return int(hashlib.md5(str(user_id).encode()).hexdigest()[:8], 16) % partitions
+
+
+# SQL condition limiting a background query to the partitions this process
+# holds, with parameters from partition_params(); jobs=None means no runner
+# and matches every user
+def partition_filter(column):
+    return f"(%(partitions)s::int[] IS NULL OR user_partition({column}, %(partition_count)s) = ANY(%(partitions)s))"
+
+
+def partition_params(jobs, job):
+    if jobs is None:
+        return {"partitions": None, "partition_count": None}
+    return {"partitions": list(jobs.owned(job)), "partition_count": jobs.partition_count}
+
+
+# One-off exclusive work (e.g. command sync at startup): yields whether this
+# process got the lock; whoever doesn't should skip the work
+@contextlib.asynccontextmanager
+async def exclusive(pool, job):
+    async with pool.connection() as conn:
+        cur = await conn.execute("SELECT pg_try_advisory_lock(%s, 0) AS acquired", (LOCK_CLASS + JOBS[job],))
+        acquired = (await cur.fetchone())["acquired"]
+        try:
+            yield acquired
+        finally:
+            if acquired:
+                await conn.execute("SELECT pg_advisory_unlock(%s, 0)", (LOCK_CLASS + JOBS[job],))
+
+
+# Held partitions of a once-a-day job that haven't completed `day` yet. A
+# partition seen for the first time counts as done for that day, so a new
+# deployment waits for the next scheduled time instead of running at once.
+async def due_partitions(pool, job, partitions, day):
+    async with pool.connection() as conn:
+        await conn.execute("""
+            INSERT INTO job_runs (job, partition, last_run)
+            SELECT %(job)s, p, %(day)s FROM unnest(%(partitions)s::int[]) AS p
+            ON CONFLICT (job, partition) DO NOTHING
+        """, {"job": job, "partitions": list(partitions), "day": day})
+        cur = await conn.execute("""
+            SELECT partition FROM job_runs
+            WHERE job = %s AND partition = ANY(%s) AND last_run < %s
+            ORDER BY partition
+        """, (job, list(partitions), day))
+        return [row["partition"] for row in await cur.fetchall()]
+
+
+async def record_run(pool, job, partition, day):
+    async with pool.connection() as conn:
+        await conn.execute(
+            "UPDATE job_runs SET last_run = GREATEST(last_run, %s) WHERE job = %s AND partition = %s",
+            (day, job, partition),
+        )
+
+
+class JobRunner:
+    RECONNECT_DELAY = 5  # seconds before re-opening a dropped lease connection
+
+    def __init__(self, partitions=16, check_seconds=5):
+        self.partition_count = partitions
+        self.check_seconds = check_seconds
+        self._owned = {job: frozenset() for job in PARTITIONED_JOBS}
+        self._subscribers = {job: [] for job in PARTITIONED_JOBS}
+        self._runner = None
+        self.backend_pid = None  # of the lease connection, to match against pg_locks
+        self.processes = 0
+        self.acquired = 0
+        self.released = 0
+
+    def owned(self, job):
+        return self._owned[job]
+
+    def owns(self, job, user_id):
+        return user_partition(user_id, self.partition_count) in self._owned[job]
+
+    # callback(gained, lost) runs synchronously whenever the job's partitions change
+    def subscribe(self, job, callback):
+        self._subscribers[job].append(callback)
+
+    def start(self):
+        if self._runner is None:
+            self._runner = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._runner is not None:
+            self._runner.cancel()
+            self._runner = None
+            self._drop_all()
+
+    async def _run(self):
+        while True:
+            try:
+                async with await psycopg.AsyncConnection.connect(**DB_CONFIG, autocommit=True, row_factory=dict_row) as conn:
+                    await conn.execute(KEEPALIVE_SQL)
+                    self.backend_pid = conn.info.backend_pid
+                    await conn.execute("SELECT pg_advisory_lock_shared(%s, 0)", (LOCK_CLASS,))
+                    while True:
+                        await asyncio.wait_for(self._balance(conn), self.check_seconds)
+                        await asyncio.sleep(self.check_seconds)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # Our locks may already be someone else's; stop before they start
+                self._drop_all()
+                print(f"⚠️ Job runner lost its lease connection: {e!r}")
+            await asyncio.sleep(self.RECONNECT_DELAY)
+
+    async def _balance(self, conn):
+        cur = await conn.execute(COUNT_PROCESSES_SQL, (LOCK_CLASS,))
+        self.processes = max((await cur.fetchone())["processes"], 1)
+        share = math.ceil(self.partition_count / self.processes)
+
+        for job in PARTITIONED_JOBS:
+            owned = self._owned[job]
+            key = LOCK_CLASS + JOBS[job]
+            if len(owned) > share:
+                lost = frozenset(sorted(owned)[share:])
+                await conn.execute("SELECT pg_advisory_unlock(%s, p) FROM unnest(%s::int[]) AS p", (key, list(lost)))
+                self.released += len(lost)
+                self._change(job, owned - lost, frozenset(), lost)
+            elif len(owned) < share:
+                candidates = [p for p in range(self.partition_count) if p not in owned]
+                random.shuffle(candidates)
+                cur = await conn.execute(TRY_LOCK_SQL, {"candidates": candidates, "job": key, "limit": share - len(owned)})
+                gained = frozenset(row["partition"] for row in await cur.fetchall())
+                if gained:
+                    self.acquired += len(gained)
+                    self._change(job, owned | gained, gained, frozenset())
+
+    def _drop_all(self):
+        for job, owned in self._owned.items():
+            if owned:
+                self._change(job, frozenset(), frozenset(), owned)
+
+    def _change(self, job, owned, gained, lost):
+        self._owned[job] = owned
+        for callback in self._subscribers[job]:
+            try:
+                callback(gained, lost)
+            except Exception as e:
+                print(f"⚠️ Job runner subscriber for {job} failed: {e}")
+
+    def stats(self):
+        return {
+            "processes": self.processes,
+            "backend_pid": self.backend_pid,
+            "partitions": self.partition_count,
+            "owned": {job: sorted(owned) for job, owned in self._owned.items()},
+            "acquired": self.acquired,
+            "released": self.released,
+        }
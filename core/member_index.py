@@ -0,0 +1,154 @@
+# Member search for pickers such as /mirror's autocomplete (bot.members).
+# Members live in guild_members with every word of their names indexed in
+# guild_member_names (migrations/0017_guild_member_index.sql), so a prefix
+# search is one index range scan however big the guild is, and no process
+# needs the guild's members in memory. Each process keeps the guilds on its
+# own shards current: member events write through as they arrive, and a guild
+# is re-fetched in full when it becomes available and its last full sync is
+# older than resync_hours, which also catches changes made while offline.
+# Bots aren't indexed.
+
+import asyncio
+import datetime
+
+SEARCH_SQL = """
+    SELECT m.user_id, m.display_name, m.username
+    FROM (
+        SELECT DISTINCT user_id FROM (
+            SELECT user_id FROM guild_member_names
+            WHERE guild_id = %(guild_id)s
+              AND name_key >= lower(%(query)s::text) AND name_key < lower(%(query)s::text) || chr(1114111)
+            ORDER BY name_key
+            LIMIT %(scan)s
+        ) matches
+    ) hits
+    JOIN guild_members m ON m.guild_id = %(guild_id)s AND m.user_id = hits.user_id
+    WHERE m.user_id IS DISTINCT FROM %(exclude)s
+    ORDER BY NOT starts_with(lower(m.display_name), lower(%(query)s::text)), lower(m.display_name), m.user_id
+    LIMIT %(limit)s
+"""
+
+UPSERT_SQL = """
+    INSERT INTO guild_members (guild_id, user_id, display_name, username, synced_at)
+    SELECT %s, * FROM unnest(%s::text[], %s::text[], %s::text[]), now()
+    ON CONFLICT (guild_id, user_id) DO UPDATE SET
+        display_name = EXCLUDED.display_name,
+        username = EXCLUDED.username,
+        synced_at = EXCLUDED.synced_at
+"""
+
+
+class MemberIndex:
+    SCAN_LIMIT = 200  # name keys read per search; a member matches on a few at most
+
+    def __init__(self, pool, resync_hours=24, batch_size=1000):
+        self.pool = pool
+        self.resync_hours = resync_hours
+        self.batch_size = batch_size  # members fetched and written per round trip during a sync
+        self._queue = asyncio.Queue()
+        self._queued = set()  # guild ids waiting for or running a sync
+        self._worker = None
+        self.synced = 0
+
+    # Up to `limit` members whose display name, username or any word of them
+    # starts with `query`, display-name matches first
+    async def search(self, guild_id, query, exclude_user_id=None, limit=25):
+        params = {
+            "guild_id": str(guild_id),
+            "query": query.strip(),
+            "exclude": str(exclude_user_id) if exclude_user_id is not None else None,
+            "scan": self.SCAN_LIMIT,
+            "limit": limit,
+        }
+        async with self.pool.connection() as conn:
+            cur = await conn.execute(SEARCH_SQL, params)
+            return await cur.fetchall()
+
+    async def contains(self, guild_id, user_id):
+        async with self.pool.connection() as conn:
+            cur = await conn.execute(
+                "SELECT 1 FROM guild_members WHERE guild_id = %s AND user_id = %s", (str(guild_id), str(user_id))
+            )
+            return await cur.fetchone() is not None
+
+    async def upsert(self, guild_id, members):
+        members = [m for m in members if not m.bot]
+        if not members:
+            return
+        async with self.pool.connection() as conn:
+            await conn.execute(UPSERT_SQL, (
+                str(guild_id),
+                [str(m.id) for m in members],
+                [m.display_name for m in members],
+                [m.name for m in members],
+            ))
+
+    async def remove(self, guild_id, user_id):
+        async with self.pool.connection() as conn:
+            await conn.execute(
+                "DELETE FROM guild_members WHERE guild_id = %s AND user_id = %s", (str(guild_id), str(user_id))
+            )
+
+    async def forget_guild(self, guild_id):
+        async with self.pool.connection() as conn:
+            await conn.execute("DELETE FROM guild_members WHERE guild_id = %s", (str(guild_id),))
+            await conn.execute("DELETE FROM guild_member_syncs WHERE guild_id = %s", (str(guild_id),))
+
+    # Queues a full sync unless one is already queued; the worker skips guilds
+    # synced within resync_hours unless forced
+    def request_sync(self, guild, force=False):
+        if guild.id not in self._queued:
+            self._queued.add(guild.id)
+            self._queue.put_nowait((guild, force))
+
+    def start(self):
+        if self._worker is None:
+            self._worker = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._worker is not None:
+            self._worker.cancel()
+            self._worker = None
+
+    # One guild at a time: member fetches share the bot's REST rate limits
+    async def _run(self):
+        while True:
+            guild, force = await self._queue.get()
+            try:
+                if force or await self._stale(guild.id):
+                    await self.sync_guild(guild)
+            except Exception as e:
+                print(f"⚠️ Member sync failed for guild {guild.id}: {e!r}")
+            finally:
+                self._queued.discard(guild.id)
+
+    async def _stale(self, guild_id):
+        async with self.pool.connection() as conn:
+            cur = await conn.execute("SELECT synced_at FROM guild_member_syncs WHERE guild_id = %s", (str(guild_id),))
+            row = await cur.fetchone()
+        if row is None:
+            return True
+        return datetime.datetime.now(datetime.timezone.utc) - row["synced_at"] > datetime.timedelta(hours=self.resync_hours)
+
+    # Fetches every member over REST (no member cache needed), then drops the
+    # rows nobody touched since the sync began: members who left while we
+    # weren't listening
+    async def sync_guild(self, guild):
+        async with self.pool.connection() as conn:
+            started = (await (await conn.execute("SELECT now() AS now")).fetchone())["now"]
+        batch = []
+        async for member in guild.fetch_members(limit=None):
+            batch.append(member)
+            if len(batch) >= self.batch_size:
+                await self.upsert(guild.id, batch)
+                batch = []
+        await self.upsert(guild.id, batch)
+        async with self.pool.connection() as conn:
+            await conn.execute(
+                "DELETE FROM guild_members WHERE guild_id = %s AND synced_at < %s", (str(guild.id), started)
+            )
+            await conn.execute("""
+                INSERT INTO guild_member_syncs (guild_id, synced_at) VALUES (%s, %s)
+                ON CONFLICT (guild_id) DO UPDATE SET synced_at = EXCLUDED.synced_at
+            """, (str(guild.id), started))
+        self.synced += 1
@@ -0,0 +1,78 @@
+# Versioned schema migrations.
+# Files in migrations/ are named NNNN_description.sql and applied in order, each
+# in its own transaction, and recorded in schema_version. When the database is
+# already current, startup costs a single query.
+
+import os
+import re
+import psycopg
+from psycopg.rows import dict_row
+from config import DB_CONFIG
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "migrations")
+
+# Advisory lock key so replicas restarting together don't migrate concurrently
+MIGRATION_LOCK_ID = 7_130_001
+
+
+def load_migrations():
+    migrations = []
+    for name in sorted(os.listdir(MIGRATIONS_DIR)):
+        match = re.match(r"^(\d+)_\w+\.sql$", name)
+        if match:
+            migrations.append((int(match.group(1)), name))
+    return migrations
+
+
+async def current_version(conn):
+    try:
+        cur = await conn.execute("SELECT COALESCE(MAX(version), 0) AS version FROM schema_version")
+        return (await cur.fetchone())["version"]
+    except psycopg.errors.UndefinedTable:
+        await conn.rollback()
+        return 0
+
+
+async def migrate(pool):
+    migrations = load_migrations()
+    latest = migrations[-1][0] if migrations else 0
+
+    # Fast path: one query against the pool
+    async with pool.connection() as conn:
+        version = await current_version(conn)
+    if version >= latest:
+        print(f"Database schema up to date (v{version}).")
+        return 0
+
+    # Slow path: a dedicated autocommit connection so the advisory lock spans
+    # every migration while each file still gets its own transaction
+    applied = 0
+    async with await psycopg.AsyncConnection.connect(**DB_CONFIG, autocommit=True, row_factory=dict_row) as conn:
+        await conn.execute("SELECT pg_advisory_lock(%s)", (MIGRATION_LOCK_ID,))
+        try:
+            await conn.execute("""
+                CREATE TABLE IF NOT EXISTS schema_version (
+                    version INTEGER PRIMARY KEY,
+                    name TEXT NOT NULL,
+                    applied_at TIMESTAMP DEFAULT NOW()
+                )
+            """)
+            # Another process may have migrated while we waited for the lock
+            version = await current_version(conn)
+            for number, name in migrations:
+                if number <= version:
+                    continue
+                with open(os.path.join(MIGRATIONS_DIR, name), encoding="utf-8") as f:
+                    sql = f.read()
+                async with conn.transaction():
+                    await conn.execute(sql)
+                    await conn.execute(
+                        "INSERT INTO schema_version (version, name) VALUES (%s, %s)",
+                        (number, name)
+                    )
+                applied += 1
+                print(f"Applied migration {name}")
+        finally:
+            await conn.execute("SELECT pg_advisory_unlock(%s)", (MIGRATION_LOCK_ID,))
+
+    return applied
@@ -0,0 +1,139 @@
+# Read-through cache of parsed user_preferences rows.
+# Each process keeps its own copy and drops entries when Postgres notifies it
+# on the user_preferences_changed channel (migrations/0006_user_preferences_notify.sql),
+# so writes from other bot processes are picked up immediately.
+
+import asyncio
+import datetime
+from collections import OrderedDict
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+import psycopg
+from psycopg import sql
+from config import DB_CONFIG
+
+CHANNEL = "user_preferences_changed"
+
+EDITABLE_FIELDS = {
+    "work_start", "work_end", "lunch_duration_minutes",
+    "lunch_window_start", "lunch_window_end", "time_zone",
+}
+
+
+# A user's time zone, UTC when it is missing or unknown to this system
+def zone(name):
+    try:
+        return ZoneInfo(name)
+    except (ZoneInfoNotFoundError, ValueError, TypeError):
+        return ZoneInfo("UTC")
+
+
+class UserPreferences:
+    __slots__ = (
+        "user_id", "work_start", "work_end", "lunch_duration_minutes",
+        "lunch_window_start", "lunch_window_end", "time_zone", "tz",
+    )
+
+    def __init__(self, row):
+        self.user_id = row["user_id"]
+        self.work_start = row["work_start"]
+        self.work_end = row["work_end"]
+        self.lunch_duration_minutes = row["lunch_duration_minutes"]
+        self.lunch_window_start = row["lunch_window_start"]
+        self.lunch_window_end = row["lunch_window_end"]
+        self.time_zone = row["time_zone"]
+        self.tz = zone(row["time_zone"])
+
+    # The user's wall time now, naive like the times stored on their tasks
+    def local_now(self):
+        return datetime.datetime.now(self.tz).replace(tzinfo=None)
+
+
+class PreferencesCache:
+    RECONNECT_DELAY = 5  # seconds before re-opening a dropped LISTEN connection
+
+    def __init__(self, pool, max_size=50_000):
+        self.pool = pool
+        self.max_size = max_size
+        self._prefs = OrderedDict()  # user id -> UserPreferences, least recently used first
+        self._generation = 0  # bumped on every invalidation
+        self._listener = None
+
+    async def get(self, user_id):
+        user_id = str(user_id)
+        prefs = self._prefs.get(user_id)
+        if prefs is not None:
+            self._prefs.move_to_end(user_id)
+            return prefs
+
+        # Create the defaults row on first use and read it back in one round trip
+        generation = self._generation
+        async with self.pool.connection() as conn:
+            cur = await conn.execute("""
+                WITH created AS (
+                    INSERT INTO user_preferences (user_id) VALUES (%s)
+                    ON CONFLICT (user_id) DO NOTHING
+                    RETURNING *
+                )
+                SELECT * FROM created
+                UNION ALL
+                SELECT * FROM user_preferences WHERE user_id = %s
+                LIMIT 1
+            """, (user_id, user_id))
+            row = await cur.fetchone()
+        prefs = UserPreferences(row)
+        # Don't cache a row that may have been invalidated while we were reading it
+        if generation == self._generation:
+            self._store(prefs)
+        return prefs
+
+    async def update(self, user_id, field_name, value):
+        if field_name not in EDITABLE_FIELDS:
+            raise ValueError(f"Unknown preference {field_name}")
+        user_id = str(user_id)
+        async with self.pool.connection() as conn:
+            cur = await conn.execute(sql.SQL("""
+                INSERT INTO user_preferences (user_id, {field}) VALUES (%s, %s)
+                ON CONFLICT (user_id) DO UPDATE SET {field} = EXCLUDED.{field}
+                RETURNING *
+            """).format(field=sql.Identifier(field_name)), (user_id, value))
+            row = await cur.fetchone()
+        return self._store(UserPreferences(row))
+
+    def invalidate(self, user_id=None):
+        self._generation += 1
+        if user_id is None:
+            self._prefs.clear()
+        else:
+            self._prefs.pop(str(user_id), None)
+
+    def _store(self, prefs):
+        self._prefs[prefs.user_id] = prefs
+        self._prefs.move_to_end(prefs.user_id)
+        while len(self._prefs) > self.max_size:
+            self._prefs.popitem(last=False)
+        return prefs
+
+    def start(self):
+        if self._listener is None:
+            self._listener = asyncio.create_task(self._listen())
+
+    async def stop(self):
+        if self._listener is not None:
+            self._listener.cancel()
+            self._listener = None
+
+    async def _listen(self):
+        while True:
+            try:
+                async with await psycopg.AsyncConnection.connect(**DB_CONFIG, autocommit=True) as conn:
+                    await conn.execute(f"LISTEN {CHANNEL}")
+                    # Anything could have changed while we weren't listening
+                    self.invalidate()
+                    async for notify in conn.notifies():
+                        self.invalidate(notify.payload)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"⚠️ Preferences listener disconnected: {e}")
+            self.invalidate()
+            await asyncio.sleep(self.RECONNECT_DELAY)
@@ -0,0 +1,333 @@
+# In-memory reminder scheduler shared by the bot (`bot.reminders`).
+# Upcoming due_time and deadline moments are loaded a window at a time with one
+# range query and kept in a min-heap; a single timer sleeps until the earliest
+# one. Cogs that create, edit or delete tasks update the heap directly through
+# track() and forget(), so nothing is polled per task.
+# Each moment is reminded once: the time it was sent for is stored on the task
+# (migrations/0011_task_reminders.sql), and moving a due time or deadline re-arms it.
+# Only one process reminds a given user: with a job runner (core/jobs.py) each
+# process schedules the users in the partitions it holds. Changes made by other
+# processes reach it through the task_reminders_changed channel
+# (migrations/0014_task_reminder_notify.sql).
+# Due times and deadlines are the owner's wall time, so each is placed on the
+# heap at its UTC instant in the owner's time zone. A user whose preferences
+# change (user_preferences_changed) has their reminders rescheduled.
+
+import asyncio
+import datetime
+import heapq
+import itertools
+import time
+from collections import deque
+import psycopg
+from config import DB_CONFIG
+from core.jobs import partition_filter, partition_params
+from core.preference_cache import CHANNEL as PREFERENCES_CHANNEL, zone
+
+KINDS = {"due": "due_time", "deadline": "deadline"}
+
+CHANNEL = "task_reminders_changed"
+JOB = "reminders"
+
+# No time zone is further than this from UTC, so a window of UTC instants holds
+# only wall times within it of the window's own
+ZONE_MARGIN = datetime.timedelta(hours=14)
+
+# Everything track() needs, for callers to put in their RETURNING clause. The
+# target table must be named tasks, not aliased, for the time zone lookup.
+TASK_COLUMNS = """id, user_id, description, status, due_time, deadline, due_reminded_at, deadline_reminded_at,
+    (SELECT p.time_zone FROM user_preferences p WHERE p.user_id = tasks.user_id) AS time_zone"""
+
+
+def _utc(wall_time, time_zone):
+    return wall_time.replace(tzinfo=zone(time_zone)).astimezone(datetime.timezone.utc)
+
+
+def _utc_now():
+    return datetime.datetime.now(datetime.timezone.utc)
+
+
+class Reminder:
+    __slots__ = ("task_id", "user_id", "description", "kind", "at", "fire_at", "overdue")
+
+    def __init__(self, task_id, user_id, description, kind, at, fire_at, overdue=False):
+        self.task_id = task_id
+        self.user_id = user_id
+        self.description = description
+        self.kind = kind
+        self.at = at            # the due time or deadline, in the user's wall time
+        self.fire_at = fire_at  # the same moment in UTC
+        self.overdue = overdue  # already past when scheduled (missed during downtime), kept out of lag metrics
+
+
+def _percentile(values, share):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * share))]
+
+
+class ReminderScheduler:
+    RECONNECT_DELAY = 5  # seconds before re-opening a dropped LISTEN connection
+
+    def __init__(self, pool, window_minutes=60, catch_up_minutes=15, lag_samples=1000, jobs=None):
+        self.pool = pool
+        self.jobs = jobs
+        self.window = datetime.timedelta(minutes=window_minutes)
+        self.catch_up = datetime.timedelta(minutes=catch_up_minutes)  # how late a missed reminder may still go out
+        self.send = None
+        self._heap = []      # (fire_at, sequence, Reminder); entries no longer in _pending are stale
+        self._pending = {}   # (task id, kind) -> the live Reminder
+        self._sequence = itertools.count()
+        self._window_end = None  # everything before this UTC instant is in the heap
+        self._reload = False     # set when reminders may have been missed; reloads from the catch-up point
+        self._wake = asyncio.Event()
+        self._runner = None
+        self._listener = None
+        self._deliveries = set()
+        self._lags = deque(maxlen=lag_samples)            # seconds between a reminder's time and firing it
+        self._delivery_times = deque(maxlen=lag_samples)  # seconds spent sending it
+        self.fired = 0
+        self.failed = 0
+        self.caught_up = 0
+        self.max_lag = 0.0
+        if jobs is not None:
+            jobs.subscribe(JOB, self._partitions_changed)
+
+    def track(self, task):
+        if task is None or task["user_id"] is None:
+            return
+        if self.jobs is not None and not self.jobs.owns(JOB, task["user_id"]):
+            self.forget(task["id"])  # another process reminds this user
+            return
+        now = _utc_now()
+        for kind, column in KINDS.items():
+            key = (task["id"], kind)
+            at = task[column]
+            fire_at = _utc(at, task["time_zone"]) if at is not None else None
+            if (
+                task["status"] == "done" or at is None
+                or self._window_end is None or fire_at >= self._window_end  # picked up by a later window
+                or fire_at < now - self.catch_up
+                or task[f"{kind}_reminded_at"] == at
+            ):
+                self._pending.pop(key, None)
+                continue
+
+            current = self._pending.get(key)
+            if current is not None and current.at == at and current.fire_at == fire_at:
+                current.description = task["description"]
+                continue
+            reminder = Reminder(task["id"], task["user_id"], task["description"], kind, at, fire_at, overdue=fire_at < now)
+            self._pending[key] = reminder
+            heapq.heappush(self._heap, (fire_at, next(self._sequence), reminder))
+            if self._heap[0][2] is reminder:
+                self._wake.set()  # new earliest reminder, the timer must sleep less
+
+    def forget(self, task_id):
+        for kind in KINDS:
+            self._pending.pop((task_id, kind), None)
+
+    # Reminders of lost partitions are dropped (their heap entries go stale);
+    # gained ones are loaded by reloading the window from the catch-up point
+    def _partitions_changed(self, gained, lost):
+        if lost:
+            for key, reminder in list(self._pending.items()):
+                if not self.jobs.owns(JOB, reminder.user_id):
+                    del self._pending[key]
+        if gained:
+            self._reload = True
+            self._wake.set()
+
+    # send(reminder) is awaited for each reminder that comes due
+    def start(self, send):
+        self.send = send
+        if self._runner is None:
+            self._runner = asyncio.create_task(self._run())
+            self._listener = asyncio.create_task(self._listen())
+
+    async def stop(self):
+        if self._runner is not None:
+            self._runner.cancel()
+            self._listener.cancel()
+            self._runner = self._listener = None
+
+    # Re-reads the notified tasks, and the upcoming tasks of users whose
+    # preferences changed, in one query per burst of notifications
+    async def _listen(self):
+        while True:
+            try:
+                async with await psycopg.AsyncConnection.connect(**DB_CONFIG, autocommit=True) as conn:
+                    await conn.execute(f"LISTEN {CHANNEL}")
+                    await conn.execute(f"LISTEN {PREFERENCES_CHANNEL}")
+                    # Changes may have been missed while we weren't listening
+                    self._reload = True
+                    self._wake.set()
+                    while True:
+                        task_ids, user_ids = set(), set()
+                        async for notify in conn.notifies(stop_after=1):
+                            self._collect(notify, task_ids, user_ids)
+                        async for notify in conn.notifies(timeout=0.05):
+                            self._collect(notify, task_ids, user_ids)
+                        await self._refresh(task_ids, user_ids)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"⚠️ Reminder listener disconnected: {e}")
+            await asyncio.sleep(self.RECONNECT_DELAY)
+
+    @staticmethod
+    def _collect(notify, task_ids, user_ids):
+        if notify.channel == CHANNEL:
+            task_ids.add(int(notify.payload))
+        else:
+            user_ids.add(notify.payload)
+
+    # Notified task ids with no row left were deleted. Users whose time zone may
+    # have moved drop their reminders and get them back from the rows, at the
+    # new instants; only users this process reminds are read.
+    async def _refresh(self, task_ids, user_ids=()):
+        if self.jobs is not None:
+            user_ids = {user_id for user_id in user_ids if self.jobs.owns(JOB, user_id)}
+        if self._window_end is None:
+            user_ids = ()  # nothing loaded yet, the first load will see the new zone
+        if not task_ids and not user_ids:
+            return
+        async with self.pool.connection() as conn:
+            cur = await conn.execute(f"""
+                SELECT {TASK_COLUMNS} FROM tasks WHERE id = ANY(%(task_ids)s)
+                UNION
+                SELECT {TASK_COLUMNS} FROM tasks
+                WHERE user_id = ANY(%(user_ids)s) AND status <> 'done' AND (
+                    (due_time >= %(start)s AND due_time < %(end)s) OR (deadline >= %(start)s AND deadline < %(end)s)
+                )
+            """, {"task_ids": list(task_ids), "user_ids": list(user_ids), **self._wall_range(
+                _utc_now() - self.catch_up, self._window_end or _utc_now(),
+            )})
+            rows = await cur.fetchall()
+        if user_ids:
+            for key, reminder in list(self._pending.items()):
+                if reminder.user_id in user_ids:
+                    del self._pending[key]
+        for row in rows:
+            self.track(row)
+        for task_id in set(task_ids) - {row["id"] for row in rows}:
+            self.forget(task_id)
+
+    # Wall times that can fall between two UTC instants in some time zone, for
+    # the range conditions (and indexes) on due_time and deadline; track() then
+    # keeps only the rows inside the window in their owner's zone
+    @staticmethod
+    def _wall_range(start, end):
+        return {
+            "start": (start - ZONE_MARGIN).replace(tzinfo=None),
+            "end": (end + ZONE_MARGIN).replace(tzinfo=None),
+        }
+
+    def stats(self):
+        lags = list(self._lags)
+        return {
+            "scheduled": len(self._pending),
+            "heap_entries": len(self._heap),
+            "window_end": self._window_end,
+            "fired": self.fired,
+            "failed": self.failed,
+            "caught_up": self.caught_up,
+            "lag_p50": _percentile(lags, 0.5),
+            "lag_p95": _percentile(lags, 0.95),
+            "lag_max": self.max_lag,
+            "delivery_p95": _percentile(list(self._delivery_times), 0.95),
+        }
+
+    async def _load(self, start, end):
+        self._window_end = end  # set first so track() calls during the query land in the heap too
+        async with self.pool.connection() as conn:
+            cur = await conn.execute(f"""
+                SELECT {TASK_COLUMNS} FROM tasks
+                WHERE status <> 'done' AND {partition_filter("user_id")} AND (
+                    (due_time >= %(start)s AND due_time < %(end)s AND due_reminded_at IS DISTINCT FROM due_time)
+                    OR (deadline >= %(start)s AND deadline < %(end)s AND deadline_reminded_at IS DISTINCT FROM deadline)
+                )
+            """, {**self._wall_range(start, end), **partition_params(self.jobs, JOB)})
+            rows = await cur.fetchall()
+        for row in rows:
+            self.track(row)
+
+    async def _run(self):
+        while True:
+            try:
+                now = _utc_now()
+                if self._window_end is None or self._reload:
+                    self._reload = False
+                    await self._load(now - self.catch_up, max(now + self.window, self._window_end or now))
+                elif now >= self._window_end - self.window / 4:
+                    await self._load(self._window_end, now + self.window)
+
+                self._wake.clear()
+                await self._fire_due(_utc_now())
+                while self._heap and self._pending.get((self._heap[0][2].task_id, self._heap[0][2].kind)) is not self._heap[0][2]:
+                    heapq.heappop(self._heap)  # stale entry from an edit or delete
+
+                wake_at = self._window_end - self.window / 4
+                if self._heap:
+                    wake_at = min(wake_at, self._heap[0][0])
+                delay = (wake_at - _utc_now()).total_seconds()
+                if delay > 0:
+                    try:
+                        await asyncio.wait_for(self._wake.wait(), delay)
+                    except asyncio.TimeoutError:
+                        pass
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"⚠️ Reminder scheduler error: {e}")
+                await asyncio.sleep(5)
+
+    async def _fire_due(self, now):
+        due = []
+        while self._heap and self._heap[0][0] <= now:
+            _, _, reminder = heapq.heappop(self._heap)
+            key = (reminder.task_id, reminder.kind)
+            if self._pending.get(key) is reminder:
+                del self._pending[key]
+                due.append(reminder)
+        if not due:
+            return
+
+        for reminder in due:
+            if reminder.overdue:
+                self.caught_up += 1
+            else:
+                lag = (now - reminder.fire_at).total_seconds()
+                self._lags.append(lag)
+                self.max_lag = max(self.max_lag, lag)
+            delivery = asyncio.create_task(self._deliver(reminder))
+            self._deliveries.add(delivery)
+            delivery.add_done_callback(self._deliveries.discard)
+
+        # One row per task, since a due time and deadline can fire in the same tick
+        fired = {}
+        for reminder in due:
+            fired.setdefault(reminder.task_id, {})[reminder.kind] = reminder.at
+        async with self.pool.connection() as conn:
+            await conn.execute("""
+                UPDATE tasks t SET
+                    due_reminded_at = COALESCE(v.due_at, t.due_reminded_at),
+                    deadline_reminded_at = COALESCE(v.deadline_at, t.deadline_reminded_at)
+                FROM unnest(%s::int[], %s::timestamp[], %s::timestamp[]) AS v(id, due_at, deadline_at)
+                WHERE t.id = v.id
+            """, (
+                list(fired),
+                [kinds.get("due") for kinds in fired.values()],
+                [kinds.get("deadline") for kinds in fired.values()],
+            ))
+
+    async def _deliver(self, reminder):
+        started = time.perf_counter()
+        try:
+            await self.send(reminder)
+            self.fired += 1
+        except Exception as e:
+            self.failed += 1
+            print(f"⚠️ Reminder for task {reminder.task_id} failed: {e}")
+        self._delivery_times.append(time.perf_counter() - started)
@@ -0,0 +1,97 @@
+# Per-user task counters (see migrations/0004_user_task_counters.sql).
+# Triggers keep user_task_counters in step with tasks; this module reads them
+# together with a page of tasks, and can check or rebuild them if they drift.
+
+PAGE_SIZE = 25
+
+
+# Summary counters plus one page of tasks in a single round trip. Always returns
+# at least one row; the task columns are NULL when the page is empty. Pages are
+# keyset-paginated on id, so every page is an index range scan of the same cost.
+def _summary_and_page_sql(keyset, order):
+    return f"""
+        WITH counters AS (
+            SELECT COALESCE(MAX(total), 0) AS total, COALESCE(MAX(done), 0) AS done
+            FROM user_task_counters WHERE user_id = %(user_id)s
+        )
+        SELECT counters.total, counters.done, page.*
+        FROM counters
+        LEFT JOIN LATERAL (
+            SELECT id, description, due_time, duration_minutes, deadline, location, priority
+            FROM tasks
+            WHERE user_id = %(user_id)s AND status = %(status)s {keyset}
+            ORDER BY id {order}
+            LIMIT %(limit)s
+        ) page ON TRUE
+        ORDER BY page.id {order}
+    """
+
+# One fixed statement per direction so prepared plans always keep the id bound
+SUMMARY_AND_PAGE_SQL = {
+    "first": _summary_and_page_sql("", "DESC"),
+    "before": _summary_and_page_sql("AND id < %(cursor)s", "DESC"),
+    "after": _summary_and_page_sql("AND id > %(cursor)s", "ASC"),
+}
+
+ACTUAL_COUNTS_SQL = """
+    SELECT user_id, COUNT(*) AS total, COUNT(*) FILTER (WHERE status = 'done') AS done
+    FROM tasks
+    WHERE user_id IS NOT NULL
+    GROUP BY user_id
+"""
+
+
+# Returns (total, done, tasks, has_more) with tasks newest first. `before_id` pages
+# towards older tasks, `after_id` towards newer ones, and `has_more` says whether
+# another page exists in that direction.
+async def fetch_summary_and_page(pool, user_id, status, before_id=None, after_id=None, limit=PAGE_SIZE):
+    if before_id is not None:
+        direction, cursor = "before", before_id
+    elif after_id is not None:
+        direction, cursor = "after", after_id
+    else:
+        direction, cursor = "first", None
+
+    params = {"user_id": user_id, "status": status, "cursor": cursor, "limit": limit + 1}
+    async with pool.connection() as conn:
+        cur = await conn.execute(SUMMARY_AND_PAGE_SQL[direction], params)
+        rows = await cur.fetchall()
+
+    total, done = rows[0]["total"], rows[0]["done"]
+    tasks = [
+        {k: v for k, v in row.items() if k not in ("total", "done")}
+        for row in rows if row["id"] is not None
+    ]
+    has_more = len(tasks) > limit
+    tasks = tasks[:limit]
+    if direction == "after":
+        tasks.reverse()
+    return total, done, tasks, has_more
+
+
+async def find_drift(pool):
+    async with pool.connection() as conn:
+        cur = await conn.execute(f"""
+            WITH actual AS ({ACTUAL_COUNTS_SQL})
+            SELECT COALESCE(a.user_id, c.user_id) AS user_id,
+                   COALESCE(c.total, 0) AS stored_total, COALESCE(a.total, 0) AS actual_total,
+                   COALESCE(c.done, 0) AS stored_done, COALESCE(a.done, 0) AS actual_done
+            FROM actual a
+            FULL JOIN user_task_counters c ON c.user_id = a.user_id
+            WHERE COALESCE(a.total, 0) <> COALESCE(c.total, 0)
+               OR COALESCE(a.done, 0) <> COALESCE(c.done, 0)
+            ORDER BY 1
+        """)
+        return await cur.fetchall()
+
+
+async def rebuild(pool):
+    async with pool.connection() as conn:
+        # Hold off task writes so no trigger update lands between delete and insert
+        await conn.execute("LOCK TABLE tasks IN SHARE MODE")
+        await conn.execute("DELETE FROM user_task_counters")
+        cur = await conn.execute(f"""
+            INSERT INTO user_task_counters (user_id, total, done)
+            {ACTUAL_COUNTS_SQL}
+        """)
+        return cur.rowcount
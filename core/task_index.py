@@ -0,0 +1,188 @@
+# In-memory prefix index over each user's open (pending or in-progress) tasks,
+# for the task autocomplete of /start, /finish, /delay and /edit
+# (bot.task_index). A user's tasks are loaded on their first keystroke; after
+# that every keystroke is a bisect over a sorted list of description words,
+# with no database round trip. Commands that change tasks in this process
+# call track()/forget() so the index is right at once, and every process drops
+# a user's entry when Postgres notifies task_index_changed
+# (migrations/0023_task_index_notify.sql) about a change made by another
+# process, so it is reloaded on the next keystroke. Notifications tagged with
+# this process's own origin (core/db.py) are skipped: track()/forget() already
+# applied them.
+
+import asyncio
+import bisect
+import datetime
+import heapq
+import re
+from collections import OrderedDict
+import psycopg
+from config import DB_CONFIG
+from core.db import ORIGIN
+
+CHANNEL = "task_index_changed"
+OPEN_STATUSES = ("pending", "in_progress")
+WORD = re.compile(r"\w+")
+
+OPEN_TASKS_SQL = """
+    SELECT id, description, status, due_time FROM tasks
+    WHERE user_id = %s AND status = ANY(%s)
+"""
+
+
+class _UserTasks:
+    __slots__ = ("tasks", "_keys")
+
+    def __init__(self):
+        self.tasks = {}    # task id -> (description, status, due_time)
+        self._keys = None  # sorted (key, task id): whole description and each word, lowercased
+
+    def set(self, task_id, description, status, due_time):
+        self.tasks[task_id] = (description or "", status, due_time)
+        self._keys = None
+
+    def discard(self, task_id):
+        if self.tasks.pop(task_id, None) is not None:
+            self._keys = None
+
+    def keys(self):
+        if self._keys is None:
+            keys = set()
+            for task_id, (description, _, _) in self.tasks.items():
+                text = description.casefold()
+                keys.add((text, task_id))
+                keys.update((word, task_id) for word in WORD.findall(text))
+            self._keys = sorted(keys)
+        return self._keys
+
+
+class TaskIndex:
+    RECONNECT_DELAY = 5  # seconds before re-opening a dropped LISTEN connection
+
+    def __init__(self, pool, max_users=10_000):
+        self.pool = pool
+        self.max_users = max_users
+        self._users = OrderedDict()  # user id -> _UserTasks, least recently used first
+        self._owners = {}            # task id -> user id, for forget()
+        self._generation = 0         # bumped on every change, so in-flight loads aren't kept
+        self._listener = None
+        self._listening = False      # nothing is kept while changes could go unseen
+        self.loads = 0
+
+    # Open tasks whose description, or any word of it, starts with `query`;
+    # those whose description itself matches come first, then by due time
+    async def search(self, user_id, query, statuses=OPEN_STATUSES, limit=25):
+        tasks = await self._load(str(user_id))
+        prefix = query.strip().casefold()
+        if prefix:
+            keys = tasks.keys()
+            ids = set()
+            for i in range(bisect.bisect_left(keys, (prefix,)), len(keys)):
+                key, task_id = keys[i]
+                if not key.startswith(prefix):
+                    break
+                ids.add(task_id)
+        else:
+            ids = tasks.tasks.keys()
+        matches = [(task_id, *tasks.tasks[task_id]) for task_id in ids if tasks.tasks[task_id][1] in statuses]
+        matches = heapq.nsmallest(limit, matches, key=lambda m: (
+            not m[1].casefold().startswith(prefix),
+            m[3] is None, m[3] or datetime.datetime.min,
+            m[0],
+        ))
+        return [(task_id, description, status) for task_id, description, status, _ in matches]
+
+    # `task` is a row with at least id, user_id, description, status and due_time
+    # (core.reminders.TASK_COLUMNS), as returned by the statement that changed it
+    def track(self, task):
+        if task is None or task["user_id"] is None:
+            return
+        user_id = str(task["user_id"])
+        self._generation += 1  # a load already in flight may have read the old row
+        previous = self._owners.get(task["id"])
+        if previous is not None and previous != user_id:
+            self.forget(task["id"])
+        tasks = self._users.get(user_id)
+        if tasks is None:
+            return  # loaded with everything on first use
+        if task["status"] in OPEN_STATUSES:
+            tasks.set(task["id"], task["description"], task["status"], task["due_time"])
+            self._owners[task["id"]] = user_id
+        else:
+            tasks.discard(task["id"])
+            self._owners.pop(task["id"], None)
+
+    def forget(self, task_id):
+        self._generation += 1
+        user_id = self._owners.pop(task_id, None)
+        if user_id in self._users:
+            self._users[user_id].discard(task_id)
+
+    def invalidate(self, user_id=None):
+        self._generation += 1
+        if user_id is None:
+            self._users.clear()
+            self._owners.clear()
+            return
+        tasks = self._users.pop(str(user_id), None)
+        if tasks is not None:
+            for task_id in tasks.tasks:
+                self._owners.pop(task_id, None)
+
+    async def _load(self, user_id):
+        tasks = self._users.get(user_id)
+        if tasks is not None:
+            self._users.move_to_end(user_id)
+            return tasks
+
+        generation = self._generation
+        async with self.pool.connection() as conn:
+            cur = await conn.execute(OPEN_TASKS_SQL, (user_id, list(OPEN_STATUSES)))
+            rows = await cur.fetchall()
+        tasks = _UserTasks()
+        for row in rows:
+            tasks.set(row["id"], row["description"], row["status"], row["due_time"])
+        self.loads += 1
+        # Serve what was read, but don't keep a copy that may already be stale
+        if generation == self._generation and self._listening:
+            self._users[user_id] = tasks
+            for task_id in tasks.tasks:
+                self._owners[task_id] = user_id
+            while len(self._users) > self.max_users:
+                _, evicted = self._users.popitem(last=False)
+                for task_id in evicted.tasks:
+                    self._owners.pop(task_id, None)
+        return tasks
+
+    def stats(self):
+        return {"users": len(self._users), "tasks": len(self._owners), "loads": self.loads}
+
+    def start(self):
+        if self._listener is None:
+            self._listener = asyncio.create_task(self._listen())
+
+    async def stop(self):
+        if self._listener is not None:
+            self._listener.cancel()
+            self._listener = None
+            self._listening = False
+
+    async def _listen(self):
+        while True:
+            try:
+                async with await psycopg.AsyncConnection.connect(**DB_CONFIG, autocommit=True) as conn:
+                    await conn.execute(f"LISTEN {CHANNEL}")
+                    # Anything could have changed while we weren't listening
+                    self.invalidate()
+                    self._listening = True
+                    async for notify in conn.notifies():
+                        user_id, _, origin = notify.payload.partition(" ")
+                        if origin != ORIGIN:
+                            self.invalidate(user_id)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"⚠️ Task index listener disconnected: {e}")
+            self._listening = False
+            self.invalidate()
+            await asyncio.sleep(self.RECONNECT_DELAY)
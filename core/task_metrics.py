@@ -0,0 +1,75 @@
+# Per-task metrics and per-user report rollups (see migrations/0013_task_metrics_rollups.sql).
+# Callers pass the connection of the transaction that changes the task, so the
+# metrics commit or roll back together with it. A trigger folds every
+# task_metrics change into user_task_rollups, which /report reads.
+# `now` is the user's wall time (UserPreferences.local_now()), like the due
+# times and deadlines it is compared with.
+
+RECORD_START_SQL = """
+    INSERT INTO task_metrics (task_id, user_id, sessions_count, first_started_at, started_on_time, start_delay_minutes)
+    SELECT id, user_id, 1, %(now)s,
+           CASE WHEN due_time IS NOT NULL THEN %(now)s <= due_time END,
+           CASE WHEN due_time IS NOT NULL THEN GREATEST(EXTRACT(EPOCH FROM %(now)s - due_time) / 60, 0) END
+    FROM tasks WHERE id = %(task_id)s
+    ON CONFLICT (task_id) DO UPDATE SET
+        sessions_count = task_metrics.sessions_count + 1,
+        first_started_at = COALESCE(task_metrics.first_started_at, EXCLUDED.first_started_at),
+        started_on_time = CASE WHEN task_metrics.first_started_at IS NULL
+                               THEN EXCLUDED.started_on_time ELSE task_metrics.started_on_time END,
+        start_delay_minutes = CASE WHEN task_metrics.first_started_at IS NULL
+                                   THEN EXCLUDED.start_delay_minutes ELSE task_metrics.start_delay_minutes END
+"""
+
+RECORD_FINISH_SQL = """
+    INSERT INTO task_metrics (task_id, user_id, total_time_minutes, finished, finished_on_time,
+                              estimated_minutes, estimated_vs_actual_ratio)
+    SELECT id, user_id, %(minutes)s, TRUE,
+           CASE WHEN deadline IS NOT NULL THEN %(now)s <= deadline END,
+           duration_minutes, duration_minutes / NULLIF(%(minutes)s, 0)
+    FROM tasks WHERE id = %(task_id)s
+    ON CONFLICT (task_id) DO UPDATE SET
+        total_time_minutes = task_metrics.total_time_minutes + EXCLUDED.total_time_minutes,
+        finished = TRUE,
+        finished_on_time = EXCLUDED.finished_on_time,
+        estimated_minutes = EXCLUDED.estimated_minutes,
+        estimated_vs_actual_ratio = EXCLUDED.estimated_minutes
+            / NULLIF(task_metrics.total_time_minutes + EXCLUDED.total_time_minutes, 0)
+"""
+
+# A done task moved back to pending: its time stays worked, but it no longer
+# counts as finished until it is finished again
+RECORD_REOPEN_SQL = """
+    UPDATE task_metrics SET finished = FALSE, finished_on_time = NULL
+    WHERE task_id = %(task_id)s AND finished
+"""
+
+RECORD_DELAY_SQL = """
+    INSERT INTO task_metrics (task_id, user_id, total_time_minutes, delayed_count)
+    SELECT id, user_id, %(minutes)s, 1 FROM tasks WHERE id = %(task_id)s
+    ON CONFLICT (task_id) DO UPDATE SET
+        total_time_minutes = task_metrics.total_time_minutes + EXCLUDED.total_time_minutes,
+        delayed_count = task_metrics.delayed_count + 1
+"""
+
+
+async def record_start(conn, task_id, now):
+    await conn.execute(RECORD_START_SQL, {"task_id": task_id, "now": now})
+
+
+async def record_finish(conn, task_id, now, minutes):
+    await conn.execute(RECORD_FINISH_SQL, {"task_id": task_id, "now": now, "minutes": float(minutes)})
+
+
+async def record_reopen(conn, task_id):
+    await conn.execute(RECORD_REOPEN_SQL, {"task_id": task_id})
+
+
+async def record_delay(conn, task_id, minutes):
+    await conn.execute(RECORD_DELAY_SQL, {"task_id": task_id, "minutes": float(minutes)})
+
+
+async def fetch_report(pool, user_id):
+    async with pool.connection() as conn:
+        cur = await conn.execute("SELECT * FROM user_task_rollups WHERE user_id = %s", (str(user_id),))
+        return await cur.fetchone()
+
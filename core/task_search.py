@@ -0,0 +1,34 @@
+# Full-text task search for /search, over the generated tasks.search_vector
+# column and its GIN index (migrations/0018_task_search.sql). Queries use
+# websearch syntax: "quoted phrases", OR and -excluded words.
+
+SEARCH_SQL = """
+    WITH q AS (
+        SELECT websearch_to_tsquery('english', %(query)s) AS words,
+               quote_literal('@' || %(user_id)s)::tsquery AS owner
+    )
+    SELECT t.id, t.description, t.location, t.status, t.priority, t.due_time, t.stop_time,
+           ts_rank_cd(t.search_vector, q.words) AS rank
+    FROM tasks t, q
+    WHERE numnode(q.words) > 0  -- only stop words: match nothing rather than every task
+      AND t.search_vector @@ (q.words && q.owner)
+      AND t.user_id = %(user_id)s
+      AND (%(status)s::text IS NULL OR t.status = %(status)s)
+      AND (%(priority)s::boolean IS NULL OR t.priority = %(priority)s)
+      AND (%(since)s::date IS NULL OR COALESCE(t.due_time, t.stop_time) >= %(since)s)
+      AND (%(until)s::date IS NULL OR COALESCE(t.due_time, t.stop_time) < %(until)s::date + 1)
+    ORDER BY rank DESC, t.id DESC
+    LIMIT %(limit)s
+"""
+
+
+# Best matches first. `since`/`until` are inclusive dates compared with the
+# task's due time, or when it was finished if it had none.
+async def search_tasks(pool, user_id, query, status=None, priority=None, since=None, until=None, limit=10):
+    params = {
+        "user_id": str(user_id), "query": query, "status": status, "priority": priority,
+        "since": since, "until": until, "limit": limit,
+    }
+    async with pool.connection() as conn:
+        cur = await conn.execute(SEARCH_SQL, params)
+        return await cur.fetchall()
@@ -0,0 +1,87 @@
+# Task state transitions and the work session log behind them
+# (migrations/0020_task_sessions.sql). Each transition is one UPDATE that only
+# matches a task in the state it leaves, so of two racing /start or /finish
+# clicks exactly one gets a row back and the other a None. The winner then
+# holds the task's row lock, so the session it opens or closes in the same
+# transaction can't interleave with another transition. Callers pass the
+# connection of the transaction and `now` in the user's wall time, like
+# core/task_metrics.py.
+
+from core.reminders import TASK_COLUMNS
+
+START_SQL = f"""
+    UPDATE tasks SET status = 'in_progress', start_time = %(now)s
+    WHERE id = %(task_id)s AND user_id = %(user_id)s AND status = 'pending'
+    RETURNING {TASK_COLUMNS}
+"""
+
+# `now` was read before the row lock was granted, so a transition that got in
+# first may have stopped the previous session later than that
+OPEN_SESSION_SQL = """
+    INSERT INTO task_sessions (task_id, started_at)
+    SELECT %(task_id)s, GREATEST(%(now)s, MAX(stopped_at))
+    FROM task_sessions WHERE task_id = %(task_id)s
+"""
+
+# Without a task id, the user's most recently started task
+STOP_SQL = f"""
+    UPDATE tasks SET
+        status = %(status)s,
+        start_time = NULL,
+        stop_time = CASE WHEN %(status)s = 'done' THEN %(now)s ELSE tasks.stop_time END
+    WHERE tasks.id = COALESCE(%(task_id)s::int, (
+              SELECT id FROM tasks running
+              WHERE running.user_id = %(user_id)s AND running.status = 'in_progress'
+              ORDER BY running.start_time DESC LIMIT 1
+          ))
+      AND tasks.user_id = %(user_id)s
+      AND tasks.status = ANY(%(from)s)
+    RETURNING {TASK_COLUMNS}
+"""
+
+# Closes the running session, if any, and recomputes the task's totals from
+# the log: the closed sessions this statement can see (including the row
+# carrying the task's history from before the log), plus the one it closes
+CLOSE_SESSION_SQL = """
+    WITH closed AS (
+        UPDATE task_sessions SET stopped_at = GREATEST(%(now)s, started_at), outcome = %(outcome)s
+        WHERE task_id = %(task_id)s AND stopped_at IS NULL
+        RETURNING task_id, sessions, EXTRACT(EPOCH FROM stopped_at - started_at) / 60 AS minutes
+    ), earlier AS (
+        SELECT COALESCE(SUM(sessions), 0) AS sessions, COALESCE(SUM(EXTRACT(EPOCH FROM stopped_at - started_at)) / 60, 0) AS minutes
+        FROM task_sessions
+        WHERE task_id = %(task_id)s AND stopped_at IS NOT NULL
+    )
+    UPDATE tasks t SET
+        num_sessions = earlier.sessions + closed.sessions,
+        actual_duration = earlier.minutes + closed.minutes
+    FROM closed, earlier
+    WHERE t.id = closed.task_id
+    RETURNING closed.minutes, t.num_sessions AS sessions, t.actual_duration AS total_minutes
+"""
+
+
+# The task, now in progress, or None if it isn't the user's pending task
+async def start_task(conn, user_id, task_id, now):
+    cur = await conn.execute(START_SQL, {"user_id": str(user_id), "task_id": task_id, "now": now})
+    task = await cur.fetchone()
+    if task is not None:
+        await conn.execute(OPEN_SESSION_SQL, {"task_id": task["id"], "now": now})
+    return task
+
+
+# Moves a task in one of `from_statuses` to `status` ('done' or 'pending'),
+# closing its session as finished or delayed. Returns (task, session): task is
+# None if no task was in a state to move; session (minutes, sessions,
+# total_minutes) is None if none was running.
+async def stop_task(conn, user_id, task_id, now, status, from_statuses=("in_progress",)):
+    cur = await conn.execute(STOP_SQL, {
+        "user_id": str(user_id), "task_id": task_id, "now": now, "status": status, "from": list(from_statuses),
+    })
+    task = await cur.fetchone()
+    if task is None:
+        return None, None
+    cur = await conn.execute(CLOSE_SESSION_SQL, {
+        "task_id": task["id"], "now": now, "outcome": "finished" if status == "done" else "delayed",
+    })
+    return task, await cur.fetchone()
@@ -0,0 +1,484 @@
+# Bulk task import and export for /import and /export (cogs/transfer.py), as
+# CSV or iCalendar. An import is parsed while the attachment downloads and each
+# row is COPYed straight into a temporary staging table, then moved into tasks
+# with one INSERT ... SELECT: one transaction, a few round trips and about one
+# chunk of memory however long the file is. A file with any invalid row is
+# rolled back whole and its errors listed. Rows matching a task the user already
+# has (same description and due time) are skipped, so re-importing is harmless.
+# Exports read through a server-side cursor into a file, never into a list.
+#
+# Times in tasks are the user's local wall time: naive times are taken as they
+# are, and times with an offset or TZID are converted to the user's time zone.
+# A task can't be imported as in progress (there is no running session to
+# finish), so in_progress rows come in as pending.
+
+import codecs
+import csv
+import datetime
+import io
+import re
+from collections import deque
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+MAX_REPORTED_ERRORS = 10
+DEFAULT_DURATION = 15
+MAX_DURATION = 2**31 - 1  # tasks.duration_minutes is an INTEGER
+
+# What a CSV export writes; an import reads the same columns by header name,
+# needs only description and ignores the rest (id, actual_duration...)
+CSV_COLUMNS = (
+    "id", "description", "status", "priority", "due_time", "deadline",
+    "duration_minutes", "location", "stop_time", "actual_duration",
+)
+
+STAGING_COLUMNS = (
+    "line", "description", "status", "priority", "due_time", "deadline",
+    "duration_minutes", "location", "stop_time",
+)
+
+STAGING_SQL = """
+    CREATE TEMP TABLE task_import (
+        line INTEGER NOT NULL,
+        description TEXT NOT NULL CHECK (description <> ''),
+        status TEXT NOT NULL CHECK (status IN ('pending', 'done')),
+        priority BOOLEAN NOT NULL,
+        due_time TIMESTAMP,
+        deadline TIMESTAMP,
+        duration_minutes INTEGER NOT NULL CHECK (duration_minutes > 0),
+        location TEXT,
+        stop_time TIMESTAMP
+    ) ON COMMIT DROP
+"""
+
+# Triggers on tasks take it from here: counters, reminders, calendar push,
+# cached views and the autocomplete index all see the new rows
+MOVE_SQL = """
+    WITH fresh AS (
+        SELECT DISTINCT ON (description, due_time) *
+        FROM task_import s
+        WHERE NOT EXISTS (
+            SELECT 1 FROM tasks t
+            WHERE t.user_id = %(user_id)s AND t.description = s.description
+              AND t.due_time IS NOT DISTINCT FROM s.due_time
+        )
+        ORDER BY description, due_time, line
+    ), inserted AS (
+        INSERT INTO tasks (user_id, description, status, priority, due_time, schedule_date, schedule_time,
+                           deadline, duration_minutes, location, stop_time)
+        SELECT %(user_id)s, description, status, priority, due_time, due_time::date, due_time::time,
+               deadline, duration_minutes, location, stop_time
+        FROM fresh
+        ORDER BY line
+        RETURNING 1
+    )
+    SELECT (SELECT COUNT(*) FROM inserted) AS imported
+"""
+
+EXPORT_SQL = """
+    SELECT id, description, status, priority, due_time, deadline, duration_minutes, location, stop_time, actual_duration
+    FROM tasks
+    WHERE user_id = %s AND (%s::text IS NULL OR status = %s)
+    ORDER BY id
+"""
+
+
+class ImportResult:
+    __slots__ = ("rows", "imported", "errors", "error_count")
+
+    def __init__(self):
+        self.rows = 0         # valid rows read from the file
+        self.imported = 0     # of those, new tasks created
+        self.errors = []      # (line, message), the first MAX_REPORTED_ERRORS
+        self.error_count = 0
+
+    def error(self, line, message):
+        self.error_count += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append((line, message))
+
+
+# --- Reading ---
+
+# Decoded lines, each with its "\n", from an async iterator of byte chunks
+async def iter_lines(chunks):
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    pending = ""
+    async for chunk in chunks:
+        pending += decoder.decode(chunk)
+        *lines, pending = pending.split("\n")
+        for line in lines:
+            yield line + "\n"
+    pending += decoder.decode(b"", final=True)
+    if pending:
+        yield pending
+
+
+def _local(value, tz):
+    if value.tzinfo is not None:
+        value = value.astimezone(tz).replace(tzinfo=None)
+    return value.replace(microsecond=0)
+
+
+def _parse_time(value, tz, name):
+    try:
+        return _local(datetime.datetime.fromisoformat(value), tz) if value else None
+    except ValueError:
+        raise ValueError(f"{name} must look like 2025-01-31 14:30, not {value!r}") from None
+    except OverflowError:  # converting a time at the edge of year 1 or 9999
+        raise ValueError(f"{name} {value!r} is out of range") from None
+
+
+def _parse_bool(value):
+    value = value.strip().lower()
+    if value in ("", "0", "false", "no", "n"):
+        return False
+    if value in ("1", "true", "yes", "y"):
+        return True
+    raise ValueError(f"priority must be true or false, not {value!r}")
+
+
+def _parse_status(value):
+    value = value.strip().lower() or "pending"
+    if value == "in_progress":
+        return "pending"
+    if value not in ("pending", "done"):
+        raise ValueError(f"status must be pending, in_progress or done, not {value!r}")
+    return value
+
+
+def _parse_duration(value):
+    if not value:
+        return DEFAULT_DURATION
+    try:
+        minutes = int(float(value))
+    except (ValueError, OverflowError):  # "abc", "nan", "inf"
+        minutes = 0
+    if not 0 < minutes <= MAX_DURATION:
+        raise ValueError(f"duration_minutes must be a positive number up to {MAX_DURATION}, not {value!r}")
+    return minutes
+
+
+def _staging_row(line, description, status="pending", priority=False, due_time=None, deadline=None,
+                 duration_minutes=DEFAULT_DURATION, location=None, stop_time=None):
+    description = (description or "").strip()
+    if not description:
+        raise ValueError("a task needs a description")
+    if not 0 < duration_minutes <= MAX_DURATION:
+        raise ValueError(f"a task can last at most {MAX_DURATION} minutes")
+    # Postgres text can't hold NUL, and COPY would fail the whole import on it
+    if "\0" in description or "\0" in (location or ""):
+        raise ValueError("the description and location can't contain NUL characters")
+    return (line, description, status, priority, due_time, deadline, duration_minutes, location or None, stop_time)
+
+
+# (line, staging row or None, error or None) per CSV record. csv.reader is fed
+# one whole record at a time: lines are gathered until their quotes balance,
+# so a quoted field may span lines and chunks.
+async def csv_tasks(lines, tz):
+    queue = deque()
+    reader = csv.reader(iter(queue.popleft, None))
+    header = None
+    record, quotes, line_no = [], 0, 0
+    async for line in lines:
+        line_no += 1
+        record.append(line)
+        quotes += line.count('"')
+        if quotes % 2:
+            continue
+        first_line = line_no - len(record) + 1
+        queue.extend(record)
+        record, quotes = [], 0
+        try:
+            fields = next(reader)
+        except csv.Error as e:  # e.g. a field over csv.field_size_limit()
+            queue.clear()
+            yield first_line, None, f"unreadable CSV record: {e}"
+            continue
+        if not any(field.strip() for field in fields):
+            continue
+        if header is None:
+            header = {name.strip().lower(): i for i, name in enumerate(fields)}
+            if "description" not in header:
+                yield first_line, None, "the first row must be a header with a description column"
+                return
+            continue
+
+        def field(name):
+            i = header.get(name)
+            return fields[i].strip() if i is not None and i < len(fields) else ""
+
+        try:
+            yield first_line, _staging_row(
+                first_line,
+                field("description"),
+                status=_parse_status(field("status")),
+                priority=_parse_bool(field("priority")),
+                due_time=_parse_time(field("due_time"), tz, "due_time"),
+                deadline=_parse_time(field("deadline"), tz, "deadline"),
+                duration_minutes=_parse_duration(field("duration_minutes")),
+                location=field("location"),
+                stop_time=_parse_time(field("stop_time"), tz, "stop_time"),
+            ), None
+        except (ValueError, OverflowError) as e:
+            yield first_line, None, str(e)
+    if record:
+        yield line_no - len(record) + 1, None, "a quoted field is never closed"
+
+
+ICS_DURATION = re.compile(r"([+-])?P(?:(\d+)W)?(?:(\d+)D)?(?:T(?:(\d+)H)?(?:(\d+)M)?(?:(\d+)S)?)?")
+ICS_UNESCAPE = re.compile(r"\\([\\;,nN])")
+
+
+def _ics_content_line(line):
+    quoted = False
+    for i, ch in enumerate(line):
+        if ch == '"':
+            quoted = not quoted
+        elif ch == ":" and not quoted:
+            break
+    else:
+        raise ValueError(f"not an iCalendar property: {line[:40]!r}")
+    name, *params = line[:i].split(";")
+    params = dict(p.split("=", 1) for p in params if "=" in p)
+    return name.upper(), {k.upper(): v.strip('"') for k, v in params.items()}, line[i + 1:]
+
+
+def _ics_text(value):
+    return ICS_UNESCAPE.sub(lambda m: "\n" if m.group(1) in "nN" else m.group(1), value)
+
+
+def _ics_time(prop, tz):
+    if prop is None:
+        return None
+    params, value = prop
+    try:
+        if params.get("VALUE") == "DATE" or len(value) == 8:
+            return datetime.datetime.strptime(value[:8], "%Y%m%d")
+        moment = datetime.datetime.strptime(value.rstrip("Z"), "%Y%m%dT%H%M%S")
+    except ValueError:
+        raise ValueError(f"invalid date-time {value!r}") from None
+    if value.endswith("Z"):
+        moment = moment.replace(tzinfo=datetime.timezone.utc)
+    elif "TZID" in params:
+        try:
+            moment = moment.replace(tzinfo=ZoneInfo(params["TZID"]))
+        except (ZoneInfoNotFoundError, ValueError):
+            pass  # a TZID we don't know (e.g. a Windows name): keep the wall time
+    try:
+        return _local(moment, tz)
+    except OverflowError:
+        raise ValueError(f"date-time {value!r} is out of range") from None
+
+
+def _ics_minutes(value):
+    match = ICS_DURATION.fullmatch(value)
+    if not match or value in ("P", "PT"):
+        raise ValueError(f"invalid DURATION {value!r}")
+    sign, weeks, days, hours, minutes, seconds = match.groups()
+    try:
+        delta = datetime.timedelta(weeks=int(weeks or 0), days=int(days or 0), hours=int(hours or 0),
+                                   minutes=int(minutes or 0), seconds=int(seconds or 0))
+    except OverflowError:
+        raise ValueError(f"DURATION {value!r} is too long") from None
+    return -delta if sign == "-" else delta
+
+
+# VEVENTs become pending tasks at their start; VTODOs keep their status, with
+# DTSTART as the due time and DUE as the deadline. Cancelled ones are skipped.
+def _ics_task(line, kind, props, tz):
+    start = _ics_time(props.get("DTSTART"), tz)
+    status = props.get("STATUS", ({}, ""))[1].upper()
+    if status == "CANCELLED":
+        return None
+    if "X-DURATION-MINUTES" in props:
+        duration = _parse_duration(props["X-DURATION-MINUTES"][1])
+    elif "DURATION" in props:
+        duration = _ics_minutes(props["DURATION"][1])
+    elif kind == "VEVENT" and start and "DTEND" in props:
+        duration = _ics_time(props["DTEND"], tz) - start
+    else:
+        duration = None
+    if isinstance(duration, datetime.timedelta):
+        duration = max(1, int(duration.total_seconds() // 60)) if duration.total_seconds() > 0 else DEFAULT_DURATION
+
+    priority = props.get("PRIORITY", ({}, "0"))[1].strip()
+    return _staging_row(
+        line,
+        _ics_text(props.get("SUMMARY", ({}, ""))[1]),
+        status="done" if kind == "VTODO" and status == "COMPLETED" else "pending",
+        priority=priority.isdigit() and 1 <= int(priority) <= 4,  # 1-4 is high priority in RFC 5545
+        due_time=start,
+        deadline=_ics_time(props.get("DUE"), tz) if kind == "VTODO" else None,
+        duration_minutes=duration or DEFAULT_DURATION,
+        location=_ics_text(props.get("LOCATION", ({}, ""))[1]),
+        stop_time=_ics_time(props.get("COMPLETED"), tz) if kind == "VTODO" else None,
+    )
+
+
+# (line, staging row or None, error or None) per VEVENT/VTODO; folded lines are
+# joined as they arrive and properties of nested components (alarms) ignored
+async def ics_tasks(lines, tz):
+    component, props, depth, begun = None, None, 0, 0
+    unfolded, unfolded_at, line_no = None, 0, 0
+
+    def handle(line, at):
+        nonlocal component, props, depth, begun
+        name, params, value = _ics_content_line(line)
+        if name == "BEGIN":
+            if component is None and value.upper() in ("VEVENT", "VTODO"):
+                component, props, depth, begun = value.upper(), {}, 0, at
+            elif component is not None:
+                depth += 1
+        elif name == "END" and component is not None:
+            if depth:
+                depth -= 1
+            else:
+                task = _ics_task(begun, component, props, tz)
+                component = None
+                return task
+        elif component is not None and not depth:
+            props.setdefault(name, (params, value))
+        return None
+
+    async def lines_with_eof():
+        async for line in lines:
+            yield line
+        yield None
+
+    async for line in lines_with_eof():
+        if line is not None:
+            line_no += 1
+            line = line.rstrip("\r\n")
+            if line[:1] in (" ", "\t") and unfolded is not None:
+                unfolded += line[1:]
+                continue
+        if unfolded:
+            try:
+                task = handle(unfolded, unfolded_at)
+                if task is not None:
+                    yield begun, task, None
+            except (ValueError, OverflowError) as e:
+                yield begun if component is not None else unfolded_at, None, str(e)
+                if component is not None and not depth:
+                    component = None  # skip the rest of a broken component
+        unfolded, unfolded_at = line, line_no
+    if component is not None:
+        yield begun, None, f"{component} is never closed with END:{component}"
+
+
+async def import_tasks(pool, user_id, tz, chunks, kind, max_rows):
+    result = ImportResult()
+    lines = iter_lines(chunks)
+    rows = csv_tasks(lines, tz) if kind == "csv" else ics_tasks(lines, tz)
+    async with pool.connection() as conn:
+        await conn.execute(STAGING_SQL)
+        async with conn.cursor().copy(f"COPY task_import ({', '.join(STAGING_COLUMNS)}) FROM STDIN") as copy:
+            async for line, row, error in rows:
+                if error is not None:
+                    result.error(line, error)
+                elif result.rows >= max_rows:
+                    result.error(line, f"a file can hold at most {max_rows} tasks; split it and import each part")
+                    break
+                else:
+                    result.rows += 1
+                    if not result.error_count:  # past the first error the import is rolled back anyway
+                        await copy.write_row(row)
+        if result.error_count or not result.rows:
+            await conn.rollback()
+            return result
+        await conn.execute("ANALYZE task_import")
+        cur = await conn.execute(MOVE_SQL, {"user_id": str(user_id)})
+        result.imported = (await cur.fetchone())["imported"]
+    return result
+
+
+# --- Writing ---
+
+def _csv_value(value):
+    if isinstance(value, datetime.datetime):
+        return value.strftime("%Y-%m-%d %H:%M")
+    if isinstance(value, float):
+        return f"{value:g}"
+    return "" if value is None else value
+
+
+def _ics_escape(value):
+    return value.replace("\\", "\\\\").replace(";", "\\;").replace(",", "\\,").replace("\n", "\\n")
+
+
+# Content lines are folded at 75 octets without splitting a UTF-8 character
+def _ics_line(text):
+    data = text.encode("utf-8")
+    out, limit = [], 75
+    while len(data) > limit:
+        cut = limit
+        while cut and (data[cut] & 0xC0) == 0x80:
+            cut -= 1
+        out.append(data[:cut])
+        data, limit = b" " + data[cut:], 75
+    out.append(data)
+    return b"\r\n".join(out) + b"\r\n"
+
+
+def _ics_utc(value, tz):
+    return value.replace(tzinfo=tz).astimezone(datetime.timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+
+
+def _ics_task_lines(task, tz, stamp):
+    status = {"done": "COMPLETED", "in_progress": "IN-PROCESS"}.get(task["status"], "NEEDS-ACTION")
+    lines = [
+        "BEGIN:VTODO",
+        f"UID:task-{task['id']}@discord-organiser",
+        f"DTSTAMP:{stamp}",
+        f"SUMMARY:{_ics_escape(task['description'] or '')}",
+        f"STATUS:{status}",
+    ]
+    # Due times and deadlines are floating: the user's wall time, as stored
+    if task["due_time"]:
+        lines.append(f"DTSTART:{task['due_time'].strftime('%Y%m%dT%H%M%S')}")
+    if task["deadline"]:
+        lines.append(f"DUE:{task['deadline'].strftime('%Y%m%dT%H%M%S')}")
+    # DURATION can't sit beside DUE in a VTODO, so the length travels as an extension
+    if task["duration_minutes"]:
+        lines.append(f"X-DURATION-MINUTES:{task['duration_minutes']}")
+    if task["location"]:
+        lines.append(f"LOCATION:{_ics_escape(task['location'])}")
+    if task["priority"]:
+        lines.append("PRIORITY:1")
+    if task["status"] == "done" and task["stop_time"]:
+        lines.append(f"COMPLETED:{_ics_utc(task['stop_time'], tz)}")
+    lines.append("END:VTODO")
+    return lines
+
+
+# Writes the user's tasks to the binary file `out` and returns how many.
+# The named cursor holds batch_size rows at a time.
+async def export_tasks(pool, user_id, tz, kind, out, status=None, batch_size=2000):
+    count = 0
+    if kind == "csv":
+        text = io.TextIOWrapper(out, encoding="utf-8", newline="", write_through=True)
+        writer = csv.writer(text)
+        writer.writerow(CSV_COLUMNS)
+    else:
+        stamp = datetime.datetime.now(datetime.timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+        for line in ("BEGIN:VCALENDAR", "VERSION:2.0", "PRODID:-//discord-organiser//tasks//EN"):
+            out.write(_ics_line(line))
+
+    async with pool.connection() as conn:
+        async with conn.cursor(name="task_export") as cur:
+            cur.itersize = batch_size
+            await cur.execute(EXPORT_SQL, (str(user_id), status, status))
+            async for task in cur:
+                if kind == "csv":
+                    writer.writerow([_csv_value(task[column]) for column in CSV_COLUMNS])
+                else:
+                    for line in _ics_task_lines(task, tz, stamp):
+                        out.write(_ics_line(line))
+                count += 1
+
+    if kind == "csv":
+        text.detach()  # leave `out` open for the caller
+    else:
+        out.write(_ics_line("END:VCALENDAR"))
+    out.seek(0)
+    return count
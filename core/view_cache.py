@@ -0,0 +1,98 @@
+# Rendered calendar views (e.g. /calendar_week embeds), cached per user.
+# Every user has a version counter, bumped whenever Postgres notifies on the
+# task_views_changed channel (migrations/0016_task_view_notify.sql) that one of
+# their tasks or calendar events changed, in this process or any other. An
+# entry is served only while its user's version is the one it was built at, so
+# a repeat view skips both the database and the rendering.
+
+import asyncio
+from collections import OrderedDict
+import psycopg
+from config import DB_CONFIG
+
+CHANNEL = "task_views_changed"
+
+
+class ViewCache:
+    RECONNECT_DELAY = 5  # seconds before re-opening a dropped LISTEN connection
+
+    def __init__(self, max_size=10_000):
+        self.max_size = max_size
+        self._entries = OrderedDict()   # user id -> (version, key, value), least recently used first
+        self._versions = OrderedDict()  # user id -> changes seen since the epoch began
+        self._epoch = 0                 # bumped when every version is reset at once
+        self._listener = None
+        self._listening = False         # nothing is stored while changes could go unseen
+        self.hits = 0
+        self.misses = 0
+
+    # Take the version before reading what the view is built from, and pass it
+    # to put(): if the user changes meanwhile, the stale result isn't stored
+    def version(self, user_id):
+        return self._epoch, self._versions.get(str(user_id), 0)
+
+    # `key` says which view it is (e.g. the week and time zone); only the
+    # latest one per user is kept
+    def get(self, user_id, key):
+        user_id = str(user_id)
+        entry = self._entries.get(user_id)
+        if entry is not None and entry[0] == self.version(user_id) and entry[1] == key:
+            self._entries.move_to_end(user_id)
+            self.hits += 1
+            return entry[2]
+        self.misses += 1
+        return None
+
+    def put(self, user_id, key, version, value):
+        user_id = str(user_id)
+        if not self._listening or version != self.version(user_id):
+            return
+        self._entries[user_id] = (version, key, value)
+        self._entries.move_to_end(user_id)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def bump(self, user_id=None):
+        if user_id is None:
+            self._entries.clear()
+            self._versions.clear()
+            self._epoch += 1
+            return
+        user_id = str(user_id)
+        self._entries.pop(user_id, None)
+        self._versions[user_id] = self._versions.get(user_id, 0) + 1
+        self._versions.move_to_end(user_id)
+        # Forgetting a count could let it repeat, so past the limit start a new epoch instead
+        if len(self._versions) > self.max_size:
+            self.bump()
+
+    def stats(self):
+        return {"cached": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+    def start(self):
+        if self._listener is None:
+            self._listener = asyncio.create_task(self._listen())
+
+    async def stop(self):
+        if self._listener is not None:
+            self._listener.cancel()
+            self._listener = None
+            self._listening = False
+
+    async def _listen(self):
+        while True:
+            try:
+                async with await psycopg.AsyncConnection.connect(**DB_CONFIG, autocommit=True) as conn:
+                    await conn.execute(f"LISTEN {CHANNEL}")
+                    # Anything could have changed while we weren't listening
+                    self.bump()
+                    self._listening = True
+                    async for notify in conn.notifies():
+                        self.bump(notify.payload)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"⚠️ View cache listener disconnected: {e}")
+            self._listening = False
+            self.bump()
+            await asyncio.sleep(self.RECONNECT_DELAY)
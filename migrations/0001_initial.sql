@@ -0,0 +1,75 @@
+-- Baseline schema. Everything here is idempotent so databases created by the
+-- old init_db() are adopted as version 1 without changes.
+
+-- Task list table
+CREATE TABLE IF NOT EXISTS tasks (
+    id SERIAL PRIMARY KEY,
+    user_id TEXT,
+    description TEXT,
+    schedule_time TIME,
+    schedule_date DATE,
+    duration_minutes INTEGER DEFAULT 15,
+    location TEXT,
+    priority BOOLEAN DEFAULT FALSE,
+    deadline TIMESTAMP,
+    mirrored_users TEXT[],
+    due_time TIMESTAMP,
+    start_time TIMESTAMP,
+    stop_time TIMESTAMP,
+    status TEXT DEFAULT 'pending',
+    num_sessions INTEGER DEFAULT 0,
+    actual_duration FLOAT DEFAULT 0
+);
+
+-- Patch in columns missing from early development installs
+ALTER TABLE tasks
+    ADD COLUMN IF NOT EXISTS schedule_time TIME,
+    ADD COLUMN IF NOT EXISTS schedule_date DATE,
+    ADD COLUMN IF NOT EXISTS duration_minutes INTEGER DEFAULT 15,
+    ADD COLUMN IF NOT EXISTS location TEXT,
+    ADD COLUMN IF NOT EXISTS priority BOOLEAN DEFAULT FALSE,
+    ADD COLUMN IF NOT EXISTS deadline TIMESTAMP,
+    ADD COLUMN IF NOT EXISTS mirrored_users TEXT[],
+    ADD COLUMN IF NOT EXISTS due_time TIMESTAMP,
+    ADD COLUMN IF NOT EXISTS start_time TIMESTAMP,
+    ADD COLUMN IF NOT EXISTS stop_time TIMESTAMP,
+    ADD COLUMN IF NOT EXISTS status TEXT DEFAULT 'pending',
+    ADD COLUMN IF NOT EXISTS num_sessions INTEGER DEFAULT 0,
+    ADD COLUMN IF NOT EXISTS actual_duration FLOAT DEFAULT 0;
+
+-- Guild settings table
+CREATE TABLE IF NOT EXISTS settings (
+    guild_id TEXT PRIMARY KEY,
+    reminder_channel_id TEXT
+);
+
+-- User preferences table
+CREATE TABLE IF NOT EXISTS user_preferences (
+    user_id TEXT PRIMARY KEY,
+    work_start TIME DEFAULT '09:00',
+    work_end TIME DEFAULT '17:00',
+    lunch_duration_minutes INTEGER DEFAULT 30,
+    time_zone TEXT DEFAULT 'GMT',
+    lunch_window_start TIME DEFAULT '12:00',
+    lunch_window_end TIME DEFAULT '14:00'
+);
+
+-- Task metrics table
+CREATE TABLE IF NOT EXISTS task_metrics (
+    task_id INTEGER PRIMARY KEY REFERENCES tasks(id) ON DELETE CASCADE,
+    total_time_minutes INTEGER DEFAULT 0,
+    sessions_count INTEGER DEFAULT 0,
+    delayed_count INTEGER DEFAULT 0,
+    estimated_vs_actual_ratio FLOAT
+);
+
+-- Google Calendar OAuth token storage
+CREATE TABLE IF NOT EXISTS calendar_tokens (
+    user_id TEXT PRIMARY KEY,
+    token TEXT,
+    refresh_token TEXT,
+    token_uri TEXT,
+    client_id TEXT,
+    client_secret TEXT,
+    scopes TEXT
+);
@@ -0,0 +1,8 @@
+-- /start, reminders and scheduling: a user's tasks in one status ordered by due time
+CREATE INDEX IF NOT EXISTS tasks_user_status_due_idx ON tasks (user_id, status, due_time);
+
+-- /list: newest tasks first within a status
+CREATE INDEX IF NOT EXISTS tasks_user_status_id_idx ON tasks (user_id, status, id DESC);
+
+-- /calendar_today and /calendar_week: due_time range per user
+CREATE INDEX IF NOT EXISTS tasks_user_due_idx ON tasks (user_id, due_time);
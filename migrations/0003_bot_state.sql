@@ -0,0 +1,6 @@
+-- Small key/value store for bot-wide state, e.g. the last synced command tree hash
+CREATE TABLE IF NOT EXISTS bot_state (
+    key TEXT PRIMARY KEY,
+    value TEXT,
+    updated_at TIMESTAMP DEFAULT NOW()
+);
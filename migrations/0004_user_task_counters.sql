@@ -0,0 +1,52 @@
+-- Per-user task counters for the /list summary, kept in step with tasks by
+-- triggers so reading them never scans a user's history.
+
+-- Block task writes while the triggers are installed and counters backfilled
+LOCK TABLE tasks IN SHARE ROW EXCLUSIVE MODE;
+
+CREATE TABLE IF NOT EXISTS user_task_counters (
+    user_id TEXT PRIMARY KEY,
+    total INTEGER NOT NULL DEFAULT 0,
+    done INTEGER NOT NULL DEFAULT 0
+);
+
+CREATE OR REPLACE FUNCTION update_user_task_counters() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') AND OLD.user_id IS NOT NULL THEN
+        UPDATE user_task_counters
+        SET total = total - 1,
+            done = done - (OLD.status IS NOT DISTINCT FROM 'done')::int
+        WHERE user_id = OLD.user_id;
+    END IF;
+
+    IF TG_OP IN ('INSERT', 'UPDATE') AND NEW.user_id IS NOT NULL THEN
+        INSERT INTO user_task_counters (user_id, total, done)
+        VALUES (NEW.user_id, 1, (NEW.status IS NOT DISTINCT FROM 'done')::int)
+        ON CONFLICT (user_id) DO UPDATE SET
+            total = user_task_counters.total + 1,
+            done = user_task_counters.done + EXCLUDED.done;
+    END IF;
+
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS tasks_counters_insert_delete ON tasks;
+CREATE TRIGGER tasks_counters_insert_delete
+    AFTER INSERT OR DELETE ON tasks
+    FOR EACH ROW EXECUTE FUNCTION update_user_task_counters();
+
+DROP TRIGGER IF EXISTS tasks_counters_update ON tasks;
+CREATE TRIGGER tasks_counters_update
+    AFTER UPDATE OF user_id, status ON tasks
+    FOR EACH ROW
+    WHEN (OLD.user_id IS DISTINCT FROM NEW.user_id OR OLD.status IS DISTINCT FROM NEW.status)
+    EXECUTE FUNCTION update_user_task_counters();
+
+-- Backfill from existing tasks
+DELETE FROM user_task_counters;
+INSERT INTO user_task_counters (user_id, total, done)
+SELECT user_id, COUNT(*), COUNT(*) FILTER (WHERE status = 'done')
+FROM tasks
+WHERE user_id IS NOT NULL
+GROUP BY user_id;
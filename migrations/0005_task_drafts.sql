@@ -0,0 +1,8 @@
+-- Unsaved /todo drafts for the Postgres-backed draft store (core/drafts.py)
+CREATE TABLE IF NOT EXISTS task_drafts (
+    user_id TEXT PRIMARY KEY,
+    data JSONB NOT NULL,
+    updated_at TIMESTAMP NOT NULL DEFAULT NOW()
+);
+
+CREATE INDEX IF NOT EXISTS task_drafts_updated_idx ON task_drafts (updated_at);
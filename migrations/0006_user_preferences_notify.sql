@@ -0,0 +1,13 @@
+-- Tell every listening bot process when a user's
+-- preferences change so they drop their cached copy (core/preference_cache.py)
+CREATE OR REPLACE FUNCTION notify_user_preferences_changed() RETURNS trigger AS $$
+BEGIN
+    PERFORM pg_notify('user_preferences_changed', COALESCE(NEW.user_id, OLD.user_id));
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS user_preferences_notify ON user_preferences;
+CREATE TRIGGER user_preferences_notify
+    AFTER INSERT OR UPDATE OR DELETE ON user_preferences
+    FOR EACH ROW EXECUTE FUNCTION notify_user_preferences_changed();
@@ -0,0 +1,2 @@
+-- Access token expiry (naive UTC, as google-auth reports it) so refreshed tokens are reused until they lapse
+ALTER TABLE calendar_tokens ADD COLUMN IF NOT EXISTS expiry TIMESTAMP;
@@ -0,0 +1,57 @@
+-- Bookkeeping for pushing tasks to Google Calendar (core/calendar_sync.py).
+-- A trigger marks a task dirty when anything shown on its calendar event changes,
+-- so the sync engine only ever reads and sends tasks that actually changed.
+
+ALTER TABLE tasks
+    ADD COLUMN IF NOT EXISTS gcal_event_id TEXT,
+    ADD COLUMN IF NOT EXISTS gcal_etag TEXT,
+    ADD COLUMN IF NOT EXISTS calendar_dirty BOOLEAN NOT NULL DEFAULT FALSE,
+    ADD COLUMN IF NOT EXISTS calendar_version BIGINT NOT NULL DEFAULT 1;
+
+-- Existing scheduled tasks have never been pushed
+UPDATE tasks SET calendar_dirty = TRUE WHERE due_time IS NOT NULL;
+
+CREATE INDEX IF NOT EXISTS tasks_calendar_dirty_idx ON tasks (user_id) WHERE calendar_dirty;
+
+CREATE OR REPLACE FUNCTION mark_task_calendar_dirty() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        NEW.calendar_dirty := NEW.due_time IS NOT NULL;
+    ELSIF NEW.due_time IS DISTINCT FROM OLD.due_time
+       OR NEW.duration_minutes IS DISTINCT FROM OLD.duration_minutes
+       OR NEW.description IS DISTINCT FROM OLD.description
+       OR NEW.location IS DISTINCT FROM OLD.location THEN
+        -- Either there is an event to create/update or an old one to remove
+        NEW.calendar_dirty := NEW.due_time IS NOT NULL OR NEW.gcal_event_id IS NOT NULL;
+        NEW.calendar_version := OLD.calendar_version + 1;
+    END IF;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS tasks_calendar_dirty ON tasks;
+CREATE TRIGGER tasks_calendar_dirty
+    BEFORE INSERT OR UPDATE ON tasks
+    FOR EACH ROW EXECUTE FUNCTION mark_task_calendar_dirty();
+
+-- Events whose task was deleted, waiting to be removed from Google
+CREATE TABLE IF NOT EXISTS calendar_deletions (
+    id SERIAL PRIMARY KEY,
+    user_id TEXT NOT NULL,
+    event_id TEXT NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS calendar_deletions_user_idx ON calendar_deletions (user_id);
+
+CREATE OR REPLACE FUNCTION queue_calendar_deletion() RETURNS trigger AS $$
+BEGIN
+    INSERT INTO calendar_deletions (user_id, event_id) VALUES (OLD.user_id, OLD.gcal_event_id);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS tasks_calendar_deletion ON tasks;
+CREATE TRIGGER tasks_calendar_deletion
+    AFTER DELETE ON tasks
+    FOR EACH ROW WHEN (OLD.gcal_event_id IS NOT NULL AND OLD.user_id IS NOT NULL)
+    EXECUTE FUNCTION queue_calendar_deletion();
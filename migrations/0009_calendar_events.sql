@@ -0,0 +1,24 @@
+-- Local copy of each linked user's Google Calendar events (core/calendar_sync.py).
+-- Filled by incremental events.list pulls so calendar views never call Google.
+
+CREATE TABLE IF NOT EXISTS calendar_events (
+    user_id TEXT NOT NULL,
+    event_id TEXT NOT NULL,
+    summary TEXT,
+    location TEXT,
+    start_time TIMESTAMPTZ,
+    end_time TIMESTAMPTZ,
+    all_day BOOLEAN NOT NULL DEFAULT FALSE,
+    task_id INTEGER,  -- set on events pushed from a task, which views show from tasks instead
+    updated TIMESTAMPTZ,
+    PRIMARY KEY (user_id, event_id)
+);
+
+CREATE INDEX IF NOT EXISTS calendar_events_user_start_idx ON calendar_events (user_id, start_time);
+
+-- syncToken from the last completed pull; NULL forces a full resync
+CREATE TABLE IF NOT EXISTS calendar_pull_state (
+    user_id TEXT PRIMARY KEY,
+    sync_token TEXT,
+    last_pulled TIMESTAMPTZ
+);
@@ -0,0 +1,33 @@
+-- Google Calendar push notifications (auth_server.py).
+-- Each linked user has an events.watch channel whose webhook calls queue a pull
+-- for that user only; the bot drains the queue (core/calendar_sync.py).
+
+CREATE TABLE IF NOT EXISTS calendar_watch_channels (
+    channel_id TEXT PRIMARY KEY,
+    user_id TEXT NOT NULL,
+    resource_id TEXT NOT NULL,
+    token TEXT NOT NULL,  -- secret Google echoes back in X-Goog-Channel-Token
+    expiration TIMESTAMPTZ NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS calendar_watch_channels_user_idx ON calendar_watch_channels (user_id);
+CREATE INDEX IF NOT EXISTS calendar_watch_channels_expiration_idx ON calendar_watch_channels (expiration);
+
+-- One row per user with an unserved pull request; repeated notifications coalesce
+CREATE TABLE IF NOT EXISTS calendar_pull_requests (
+    user_id TEXT PRIMARY KEY,
+    requested_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+-- Only fires for new rows, so a burst of notifications for one user wakes the bot once
+CREATE OR REPLACE FUNCTION notify_calendar_pull_requested() RETURNS trigger AS $$
+BEGIN
+    PERFORM pg_notify('calendar_pull_requested', NEW.user_id);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS calendar_pull_requests_notify ON calendar_pull_requests;
+CREATE TRIGGER calendar_pull_requests_notify
+    AFTER INSERT ON calendar_pull_requests
+    FOR EACH ROW EXECUTE FUNCTION notify_calendar_pull_requested();
@@ -0,0 +1,10 @@
+-- Reminder scheduler (core/reminders.py).
+-- The moment each reminder was sent for, so a restart doesn't repeat it and
+-- moving the due time or deadline re-arms it.
+ALTER TABLE tasks
+    ADD COLUMN IF NOT EXISTS due_reminded_at TIMESTAMP,
+    ADD COLUMN IF NOT EXISTS deadline_reminded_at TIMESTAMP;
+
+-- The scheduler loads the next window of both across all users in one range query
+CREATE INDEX IF NOT EXISTS tasks_due_reminder_idx ON tasks (due_time) WHERE status <> 'done';
+CREATE INDEX IF NOT EXISTS tasks_deadline_reminder_idx ON tasks (deadline) WHERE status <> 'done';
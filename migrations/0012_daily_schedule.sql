@@ -0,0 +1,14 @@
+-- Generated daily schedules (core/daily_schedule.py), one row per block.
+-- Times are the user's local wall-clock time, like tasks.due_time.
+CREATE TABLE IF NOT EXISTS daily_schedule_entries (
+    user_id TEXT NOT NULL,
+    day DATE NOT NULL,
+    starts_at TIMESTAMP,  -- NULL for tasks that didn't fit into the day
+    ends_at TIMESTAMP,
+    kind TEXT NOT NULL,   -- task, fixed (task with its own due time), event, lunch, unscheduled
+    title TEXT,
+    task_id INTEGER,
+    late BOOLEAN NOT NULL DEFAULT FALSE  -- ends after the task's deadline
+);
+
+CREATE INDEX IF NOT EXISTS daily_schedule_entries_user_day_idx ON daily_schedule_entries (user_id, day);
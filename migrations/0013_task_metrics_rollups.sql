@@ -0,0 +1,109 @@
+-- Task metrics and per-user report rollups (core/task_metrics.py).
+-- /start, /finish and /delay update a task's task_metrics row in their own
+-- transaction; a trigger applies the row's change to user_task_rollups, so
+-- /report reads one row and deleting a task (which cascades to task_metrics)
+-- takes its contribution back out.
+
+LOCK TABLE tasks IN SHARE ROW EXCLUSIVE MODE;
+
+ALTER TABLE task_metrics
+    ADD COLUMN IF NOT EXISTS user_id TEXT,
+    ADD COLUMN IF NOT EXISTS first_started_at TIMESTAMP,
+    ADD COLUMN IF NOT EXISTS started_on_time BOOLEAN,      -- NULL when the task had no due time
+    ADD COLUMN IF NOT EXISTS start_delay_minutes FLOAT,    -- first start minus due time, 0 if early
+    ADD COLUMN IF NOT EXISTS finished BOOLEAN NOT NULL DEFAULT FALSE,
+    ADD COLUMN IF NOT EXISTS finished_on_time BOOLEAN,     -- NULL when the task had no deadline
+    ADD COLUMN IF NOT EXISTS estimated_minutes INTEGER;
+
+-- Sessions rarely last whole minutes
+ALTER TABLE task_metrics ALTER COLUMN total_time_minutes TYPE FLOAT;
+UPDATE task_metrics m SET user_id = t.user_id FROM tasks t WHERE t.id = m.task_id AND m.user_id IS NULL;
+
+CREATE TABLE IF NOT EXISTS user_task_rollups (
+    user_id TEXT PRIMARY KEY,
+    total_minutes FLOAT NOT NULL DEFAULT 0,
+    sessions INTEGER NOT NULL DEFAULT 0,
+    delays INTEGER NOT NULL DEFAULT 0,
+    started INTEGER NOT NULL DEFAULT 0,
+    started_with_due INTEGER NOT NULL DEFAULT 0,
+    started_on_time INTEGER NOT NULL DEFAULT 0,
+    start_delay_minutes FLOAT NOT NULL DEFAULT 0,
+    finished INTEGER NOT NULL DEFAULT 0,
+    finished_with_deadline INTEGER NOT NULL DEFAULT 0,
+    finished_on_time INTEGER NOT NULL DEFAULT 0,
+    finished_minutes FLOAT NOT NULL DEFAULT 0,            -- time worked on finished tasks
+    finished_estimated_minutes FLOAT NOT NULL DEFAULT 0   -- their estimated durations
+);
+
+CREATE OR REPLACE FUNCTION update_user_task_rollups() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') AND OLD.user_id IS NOT NULL THEN
+        UPDATE user_task_rollups SET
+            total_minutes = total_minutes - OLD.total_time_minutes,
+            sessions = sessions - OLD.sessions_count,
+            delays = delays - OLD.delayed_count,
+            started = started - (OLD.first_started_at IS NOT NULL)::int,
+            started_with_due = started_with_due - (OLD.started_on_time IS NOT NULL)::int,
+            started_on_time = started_on_time - COALESCE(OLD.started_on_time, FALSE)::int,
+            start_delay_minutes = start_delay_minutes - COALESCE(OLD.start_delay_minutes, 0),
+            finished = finished - OLD.finished::int,
+            finished_with_deadline = finished_with_deadline - (OLD.finished AND OLD.finished_on_time IS NOT NULL)::int,
+            finished_on_time = finished_on_time - COALESCE(OLD.finished AND OLD.finished_on_time, FALSE)::int,
+            finished_minutes = finished_minutes - CASE WHEN OLD.finished THEN OLD.total_time_minutes ELSE 0 END,
+            finished_estimated_minutes = finished_estimated_minutes - CASE WHEN OLD.finished THEN COALESCE(OLD.estimated_minutes, 0) ELSE 0 END
+        WHERE user_id = OLD.user_id;
+    END IF;
+
+    IF TG_OP IN ('INSERT', 'UPDATE') AND NEW.user_id IS NOT NULL THEN
+        INSERT INTO user_task_rollups AS r (
+            user_id, total_minutes, sessions, delays, started, started_with_due, started_on_time,
+            start_delay_minutes, finished, finished_with_deadline, finished_on_time,
+            finished_minutes, finished_estimated_minutes
+        ) VALUES (
+            NEW.user_id,
+            NEW.total_time_minutes,
+            NEW.sessions_count,
+            NEW.delayed_count,
+            (NEW.first_started_at IS NOT NULL)::int,
+            (NEW.started_on_time IS NOT NULL)::int,
+            COALESCE(NEW.started_on_time, FALSE)::int,
+            COALESCE(NEW.start_delay_minutes, 0),
+            NEW.finished::int,
+            (NEW.finished AND NEW.finished_on_time IS NOT NULL)::int,
+            COALESCE(NEW.finished AND NEW.finished_on_time, FALSE)::int,
+            CASE WHEN NEW.finished THEN NEW.total_time_minutes ELSE 0 END,
+            CASE WHEN NEW.finished THEN COALESCE(NEW.estimated_minutes, 0) ELSE 0 END
+        )
+        ON CONFLICT (user_id) DO UPDATE SET
+            total_minutes = r.total_minutes + EXCLUDED.total_minutes,
+            sessions = r.sessions + EXCLUDED.sessions,
+            delays = r.delays + EXCLUDED.delays,
+            started = r.started + EXCLUDED.started,
+            started_with_due = r.started_with_due + EXCLUDED.started_with_due,
+            started_on_time = r.started_on_time + EXCLUDED.started_on_time,
+            start_delay_minutes = r.start_delay_minutes + EXCLUDED.start_delay_minutes,
+            finished = r.finished + EXCLUDED.finished,
+            finished_with_deadline = r.finished_with_deadline + EXCLUDED.finished_with_deadline,
+            finished_on_time = r.finished_on_time + EXCLUDED.finished_on_time,
+            finished_minutes = r.finished_minutes + EXCLUDED.finished_minutes,
+            finished_estimated_minutes = r.finished_estimated_minutes + EXCLUDED.finished_estimated_minutes;
+    END IF;
+
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS task_metrics_rollups ON task_metrics;
+CREATE TRIGGER task_metrics_rollups
+    AFTER INSERT OR UPDATE OR DELETE ON task_metrics
+    FOR EACH ROW EXECUTE FUNCTION update_user_task_rollups();
+
+-- Seed metrics for tasks worked on before they were tracked (the trigger fills the rollups)
+INSERT INTO task_metrics (task_id, user_id, total_time_minutes, sessions_count, delayed_count, finished, finished_on_time, estimated_minutes)
+SELECT id, user_id, COALESCE(actual_duration, 0), COALESCE(num_sessions, 0), 0,
+       status = 'done',
+       CASE WHEN status = 'done' AND deadline IS NOT NULL AND stop_time IS NOT NULL THEN stop_time <= deadline END,
+       duration_minutes
+FROM tasks
+WHERE user_id IS NOT NULL AND (COALESCE(num_sessions, 0) > 0 OR status = 'done')
+ON CONFLICT (task_id) DO NOTHING;
@@ -0,0 +1,25 @@
+-- Tell the process running the reminder scheduler (core/reminders.py) when a
+-- task's reminder times may have changed, so tasks created or edited by other
+-- bot processes are scheduled without waiting for the next window load
+CREATE OR REPLACE FUNCTION notify_task_reminders_changed() RETURNS trigger AS $$
+BEGIN
+    PERFORM pg_notify('task_reminders_changed', COALESCE(NEW.id, OLD.id)::text);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS tasks_reminders_notify ON tasks;
+CREATE TRIGGER tasks_reminders_notify
+    AFTER INSERT OR DELETE ON tasks
+    FOR EACH ROW EXECUTE FUNCTION notify_task_reminders_changed();
+
+DROP TRIGGER IF EXISTS tasks_reminders_update_notify ON tasks;
+CREATE TRIGGER tasks_reminders_update_notify
+    AFTER UPDATE OF due_time, deadline, status, description, user_id ON tasks
+    FOR EACH ROW
+    WHEN (OLD.due_time IS DISTINCT FROM NEW.due_time
+          OR OLD.deadline IS DISTINCT FROM NEW.deadline
+          OR OLD.status IS DISTINCT FROM NEW.status
+          OR OLD.description IS DISTINCT FROM NEW.description
+          OR OLD.user_id IS DISTINCT FROM NEW.user_id)
+    EXECUTE FUNCTION notify_task_reminders_changed();
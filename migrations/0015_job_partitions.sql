@@ -0,0 +1,15 @@
+-- Background jobs are split across bot processes by user (core/jobs.py). The
+-- same hash is computed in Python by core.jobs.user_partition, so both sides
+-- agree on which partition a user belongs to.
+CREATE OR REPLACE FUNCTION user_partition(user_id TEXT, partitions INTEGER) RETURNS INTEGER AS $$
+    SELECT ((('x' || left(md5(user_id), 8))::bit(32)::bigint) % partitions)::integer
+$$ LANGUAGE sql IMMUTABLE STRICT PARALLEL SAFE;
+
+-- Last day a once-a-day job finished for each partition, so a partition whose
+-- owner died mid-run is completed by whichever process takes it over
+CREATE TABLE IF NOT EXISTS job_runs (
+    job TEXT NOT NULL,
+    partition INTEGER NOT NULL,
+    last_run DATE NOT NULL,
+    PRIMARY KEY (job, partition)
+);
@@ -0,0 +1,47 @@
+-- Tell every bot process when something shown in a user's calendar views
+-- changes, so they drop cached week embeds (core/view_cache.py). Notifications
+-- with the same payload are merged per transaction, so a bulk calendar pull
+-- sends one per user.
+CREATE OR REPLACE FUNCTION notify_task_views_changed() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP <> 'INSERT' AND OLD.user_id IS NOT NULL THEN
+        PERFORM pg_notify('task_views_changed', OLD.user_id);
+    END IF;
+    IF TG_OP <> 'DELETE' AND NEW.user_id IS NOT NULL THEN
+        PERFORM pg_notify('task_views_changed', NEW.user_id);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS tasks_views_notify ON tasks;
+CREATE TRIGGER tasks_views_notify
+    AFTER INSERT OR DELETE ON tasks
+    FOR EACH ROW EXECUTE FUNCTION notify_task_views_changed();
+
+DROP TRIGGER IF EXISTS tasks_views_update_notify ON tasks;
+CREATE TRIGGER tasks_views_update_notify
+    AFTER UPDATE OF due_time, status, description, user_id ON tasks
+    FOR EACH ROW
+    WHEN (OLD.due_time IS DISTINCT FROM NEW.due_time
+          OR OLD.status IS DISTINCT FROM NEW.status
+          OR OLD.description IS DISTINCT FROM NEW.description
+          OR OLD.user_id IS DISTINCT FROM NEW.user_id)
+    EXECUTE FUNCTION notify_task_views_changed();
+
+DROP TRIGGER IF EXISTS calendar_events_views_notify ON calendar_events;
+CREATE TRIGGER calendar_events_views_notify
+    AFTER INSERT OR DELETE ON calendar_events
+    FOR EACH ROW EXECUTE FUNCTION notify_task_views_changed();
+
+-- Pulls upsert every event they see, changed or not
+DROP TRIGGER IF EXISTS calendar_events_views_update_notify ON calendar_events;
+CREATE TRIGGER calendar_events_views_update_notify
+    AFTER UPDATE ON calendar_events
+    FOR EACH ROW
+    WHEN (OLD.summary IS DISTINCT FROM NEW.summary
+          OR OLD.start_time IS DISTINCT FROM NEW.start_time
+          OR OLD.end_time IS DISTINCT FROM NEW.end_time
+          OR OLD.all_day IS DISTINCT FROM NEW.all_day
+          OR OLD.task_id IS DISTINCT FROM NEW.task_id)
+    EXECUTE FUNCTION notify_task_views_changed();
@@ -0,0 +1,64 @@
+-- Searchable copy of each guild's members for the /mirror member picker
+-- (core/member_index.py), so finding someone never walks guild.members.
+-- guild_member_names holds every word of a member's display and user names,
+-- lowercased, under the "C" collation so a prefix search is a plain btree
+-- range scan.
+
+CREATE TABLE IF NOT EXISTS guild_members (
+    guild_id TEXT NOT NULL,
+    user_id TEXT NOT NULL,
+    display_name TEXT NOT NULL,
+    username TEXT NOT NULL,
+    synced_at TIMESTAMPTZ NOT NULL DEFAULT now(),  -- last seen by a full sync or member event
+    PRIMARY KEY (guild_id, user_id)
+);
+
+CREATE TABLE IF NOT EXISTS guild_member_names (
+    guild_id TEXT NOT NULL,
+    name_key TEXT COLLATE "C" NOT NULL,
+    user_id TEXT NOT NULL,
+    PRIMARY KEY (guild_id, name_key, user_id),
+    FOREIGN KEY (guild_id, user_id) REFERENCES guild_members ON DELETE CASCADE
+);
+
+CREATE INDEX IF NOT EXISTS guild_member_names_member_idx ON guild_member_names (guild_id, user_id);
+
+-- When each guild's member list was last fetched in full
+CREATE TABLE IF NOT EXISTS guild_member_syncs (
+    guild_id TEXT PRIMARY KEY,
+    synced_at TIMESTAMPTZ NOT NULL
+);
+
+-- Whole names plus each word, so "smi" finds "John Smith"
+CREATE OR REPLACE FUNCTION member_name_keys(display_name TEXT, username TEXT) RETURNS SETOF TEXT AS $$
+    SELECT DISTINCT key FROM (
+        SELECT lower(display_name) AS key
+        UNION ALL SELECT lower(username)
+        UNION ALL SELECT regexp_split_to_table(lower(display_name || ' ' || username), '[^[:alnum:]]+')
+    ) keys
+    WHERE key <> ''
+$$ LANGUAGE sql IMMUTABLE;
+
+CREATE OR REPLACE FUNCTION update_guild_member_names() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'UPDATE' THEN
+        DELETE FROM guild_member_names WHERE guild_id = NEW.guild_id AND user_id = NEW.user_id;
+    END IF;
+    INSERT INTO guild_member_names (guild_id, name_key, user_id)
+    SELECT NEW.guild_id, key, NEW.user_id FROM member_name_keys(NEW.display_name, NEW.username) AS key;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS guild_members_names_insert ON guild_members;
+CREATE TRIGGER guild_members_names_insert
+    AFTER INSERT ON guild_members
+    FOR EACH ROW EXECUTE FUNCTION update_guild_member_names();
+
+-- Full syncs touch every row; only rename when a name actually changed
+DROP TRIGGER IF EXISTS guild_members_names_update ON guild_members;
+CREATE TRIGGER guild_members_names_update
+    AFTER UPDATE OF display_name, username ON guild_members
+    FOR EACH ROW
+    WHEN (OLD.display_name IS DISTINCT FROM NEW.display_name OR OLD.username IS DISTINCT FROM NEW.username)
+    EXECUTE FUNCTION update_guild_member_names();
@@ -0,0 +1,12 @@
+-- Full-text search for /search (core/task_search.py). Descriptions weigh more
+-- than locations. The vector also carries an '@<user id>' lexeme, so a search
+-- ANDs in its owner and the GIN index only ever walks that user's entries:
+-- latency follows the size of one user's history, not the whole table.
+-- Adding a stored generated column rewrites tasks once.
+ALTER TABLE tasks ADD COLUMN IF NOT EXISTS search_vector tsvector GENERATED ALWAYS AS (
+    setweight(to_tsvector('english', coalesce(description, '')), 'A')
+    || setweight(to_tsvector('english', coalesce(location, '')), 'B')
+    || array_to_tsvector(ARRAY['@' || coalesce(user_id, '')])
+) STORED;
+
+CREATE INDEX IF NOT EXISTS tasks_search_idx ON tasks USING gin (search_vector);
@@ -0,0 +1,53 @@
+-- Count inserted and deleted tasks once per statement instead of once per row.
+-- Bumping the same user_task_counters row for every task in one transaction
+-- gets slower with each bump, so a bulk /import (core/task_transfer.py) or a
+-- mass delete went quadratic. The transition tables are grouped by user and each
+-- counter row is written once. Status and owner changes stay per row:
+-- transition tables can't be combined with an UPDATE OF column list.
+
+LOCK TABLE tasks IN SHARE ROW EXCLUSIVE MODE;
+
+CREATE OR REPLACE FUNCTION add_user_task_counters() RETURNS trigger AS $$
+BEGIN
+    INSERT INTO user_task_counters (user_id, total, done)
+    SELECT user_id, COUNT(*), COUNT(*) FILTER (WHERE status = 'done')
+    FROM inserted_tasks
+    WHERE user_id IS NOT NULL
+    GROUP BY user_id
+    ORDER BY user_id  -- a consistent lock order between concurrent bulk writes
+    ON CONFLICT (user_id) DO UPDATE SET
+        total = user_task_counters.total + EXCLUDED.total,
+        done = user_task_counters.done + EXCLUDED.done;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION subtract_user_task_counters() RETURNS trigger AS $$
+BEGIN
+    UPDATE user_task_counters c
+    SET total = c.total - d.total,
+        done = c.done - d.done
+    FROM (
+        SELECT user_id, COUNT(*) AS total, COUNT(*) FILTER (WHERE status = 'done') AS done
+        FROM deleted_tasks
+        WHERE user_id IS NOT NULL
+        GROUP BY user_id
+    ) d
+    WHERE c.user_id = d.user_id;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS tasks_counters_insert_delete ON tasks;
+
+DROP TRIGGER IF EXISTS tasks_counters_insert ON tasks;
+CREATE TRIGGER tasks_counters_insert
+    AFTER INSERT ON tasks
+    REFERENCING NEW TABLE AS inserted_tasks
+    FOR EACH STATEMENT EXECUTE FUNCTION add_user_task_counters();
+
+DROP TRIGGER IF EXISTS tasks_counters_delete ON tasks;
+CREATE TRIGGER tasks_counters_delete
+    AFTER DELETE ON tasks
+    REFERENCING OLD TABLE AS deleted_tasks
+    FOR EACH STATEMENT EXECUTE FUNCTION subtract_user_task_counters();
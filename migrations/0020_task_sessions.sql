@@ -0,0 +1,60 @@
+-- Log of work sessions on tasks (core/task_sessions.py). /start opens a
+-- session and /finish or /delay closes it; tasks.num_sessions and
+-- tasks.actual_duration are recomputed from the log whenever one closes, so time
+-- worked before a /delay counts. Rows are only ever inserted and closed once.
+
+LOCK TABLE tasks IN SHARE ROW EXCLUSIVE MODE;
+
+CREATE TABLE IF NOT EXISTS task_sessions (
+    id BIGSERIAL PRIMARY KEY,
+    task_id INTEGER NOT NULL REFERENCES tasks(id) ON DELETE CASCADE,
+    started_at TIMESTAMP NOT NULL,
+    stopped_at TIMESTAMP,
+    outcome TEXT CHECK (outcome IN ('finished', 'delayed')),
+    -- Work sessions the row stands for: 1, except for the row summing up a
+    -- task's history from before the log
+    sessions INTEGER NOT NULL DEFAULT 1 CHECK (sessions >= 0),
+    CHECK ((stopped_at IS NULL) = (outcome IS NULL)),
+    CHECK (stopped_at >= started_at)
+);
+
+CREATE INDEX IF NOT EXISTS task_sessions_task_idx ON task_sessions (task_id, started_at);
+
+-- A task has at most one running session, whatever races above it
+CREATE UNIQUE INDEX IF NOT EXISTS task_sessions_open_idx ON task_sessions (task_id) WHERE stopped_at IS NULL;
+
+CREATE OR REPLACE FUNCTION keep_task_sessions_closed() RETURNS trigger AS $$
+BEGIN
+    RAISE EXCEPTION 'task session % is already closed', OLD.id;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS task_sessions_append_only ON task_sessions;
+CREATE TRIGGER task_sessions_append_only
+    BEFORE UPDATE ON task_sessions
+    FOR EACH ROW WHEN (OLD.stopped_at IS NOT NULL)
+    EXECUTE FUNCTION keep_task_sessions_closed();
+
+UPDATE tasks SET start_time = localtimestamp WHERE status = 'in_progress' AND start_time IS NULL;
+
+-- Tasks worked on before the log get one closed row standing for all their
+-- earlier sessions and time, so totals recomputed from the log carry them
+-- over. A running task's count already includes the session it is in. The row
+-- ends when the task stopped, when its running session began, or, for a
+-- delayed task, now.
+INSERT INTO task_sessions (task_id, started_at, stopped_at, outcome, sessions)
+SELECT id, ended - GREATEST(actual_duration, 0) * INTERVAL '1 minute', ended,
+       CASE WHEN status = 'done' THEN 'finished' ELSE 'delayed' END, earlier
+FROM tasks t
+CROSS JOIN LATERAL (
+    SELECT GREATEST(COALESCE(num_sessions, 0) - (status = 'in_progress')::int, 0) AS earlier,
+           CASE WHEN status = 'in_progress' THEN start_time ELSE COALESCE(stop_time, localtimestamp) END AS ended
+) legacy
+WHERE (earlier > 0 OR actual_duration > 0)
+  AND NOT EXISTS (SELECT 1 FROM task_sessions s WHERE s.task_id = t.id);
+
+-- ...and an open session for every task running now
+INSERT INTO task_sessions (task_id, started_at)
+SELECT id, start_time FROM tasks t
+WHERE status = 'in_progress'
+  AND NOT EXISTS (SELECT 1 FROM task_sessions s WHERE s.task_id = t.id AND s.stopped_at IS NULL);
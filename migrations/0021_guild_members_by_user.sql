@@ -0,0 +1,4 @@
+-- A user's guilds, for the reminder channel fallback when they block DMs
+-- (cogs/reminders.py); the primary key only finds members of one guild.
+
+CREATE INDEX IF NOT EXISTS guild_members_user_idx ON guild_members (user_id);
@@ -0,0 +1,5 @@
+-- auth_server.py claims calendar watch channels to renew by setting
+-- renewing_until and committing, then calls Google with no transaction open.
+-- Another process only takes a channel over once the claim has run out.
+
+ALTER TABLE calendar_watch_channels ADD COLUMN IF NOT EXISTS renewing_until TIMESTAMPTZ;
@@ -0,0 +1,35 @@
+-- Tell every bot process when a user's task autocomplete (core/task_index.py)
+-- may be out of date. Unlike task_views_changed, this only fires for the task
+-- columns the index keeps, not for calendar events or sync bookkeeping. The
+-- payload is "<user id> <origin>", where origin is the organiser.origin setting
+-- of the writing connection (core/db.py), so a process can skip the changes it
+-- already applied to its own index. Writers without one (auth_server, scripts)
+-- send an empty origin.
+CREATE OR REPLACE FUNCTION notify_task_index_changed() RETURNS trigger AS $$
+DECLARE
+    origin TEXT := COALESCE(current_setting('organiser.origin', true), '');
+BEGIN
+    IF TG_OP <> 'INSERT' AND OLD.user_id IS NOT NULL THEN
+        PERFORM pg_notify('task_index_changed', OLD.user_id || ' ' || origin);
+    END IF;
+    IF TG_OP <> 'DELETE' AND NEW.user_id IS NOT NULL THEN
+        PERFORM pg_notify('task_index_changed', NEW.user_id || ' ' || origin);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS tasks_index_notify ON tasks;
+CREATE TRIGGER tasks_index_notify
+    AFTER INSERT OR DELETE ON tasks
+    FOR EACH ROW EXECUTE FUNCTION notify_task_index_changed();
+
+DROP TRIGGER IF EXISTS tasks_index_update_notify ON tasks;
+CREATE TRIGGER tasks_index_update_notify
+    AFTER UPDATE OF due_time, status, description, user_id ON tasks
+    FOR EACH ROW
+    WHEN (OLD.due_time IS DISTINCT FROM NEW.due_time
+          OR OLD.status IS DISTINCT FROM NEW.status
+          OR OLD.description IS DISTINCT FROM NEW.description
+          OR OLD.user_id IS DISTINCT FROM NEW.user_id)
+    EXECUTE FUNCTION notify_task_index_changed();
@@ -0,0 +1,103 @@
+# Benchmark the task -> Google Calendar push (core/calendar_sync.py) against
+# the fake Calendar API, using throwaway users in the configured database.
+#
+#   python -m scripts.bench_calendar_sync --users 20 --tasks 100
+#
+# Runs a full first push, a second run with nothing changed, and a run after
+# editing a share of the tasks, printing throughput and HTTP round trips for each.
+
+import argparse
+import asyncio
+import datetime
+import sys
+import time
+from core.db import open_pool
+from core.migrations import migrate
+from core.google_calendar import CalendarClient
+from core.preference_cache import PreferencesCache
+from core.calendar_sync import CalendarSync
+from scripts.fake_calendar_server import FakeCalendarServer
+
+if sys.platform == "win32":
+    asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
+
+USER_PREFIX = "bench-calsync-"
+
+
+async def cleanup(pool):
+    async with pool.connection() as conn:
+        await conn.execute("DELETE FROM tasks WHERE user_id LIKE %s", (USER_PREFIX + "%",))
+        await conn.execute("DELETE FROM calendar_deletions WHERE user_id LIKE %s", (USER_PREFIX + "%",))
+        await conn.execute("DELETE FROM calendar_tokens WHERE user_id LIKE %s", (USER_PREFIX + "%",))
+        await conn.execute("DELETE FROM user_preferences WHERE user_id LIKE %s", (USER_PREFIX + "%",))
+        await conn.execute("DELETE FROM user_task_counters WHERE user_id LIKE %s", (USER_PREFIX + "%",))
+
+
+async def seed(pool, server, users, tasks_per_user):
+    user_ids = [f"{USER_PREFIX}{i}" for i in range(users)]
+    start = datetime.datetime.now().replace(minute=0, second=0, microsecond=0)
+    async with pool.connection() as conn:
+        async with conn.cursor() as cur:
+            await cur.executemany(
+                "INSERT INTO calendar_tokens (user_id, token, refresh_token, token_uri, client_id, client_secret, scopes, expiry) "
+                "VALUES (%s, 'fake-seed', 'refresh', %s, 'bench', 'bench', 'https://www.googleapis.com/auth/calendar.events', %s)",
+                [(user_id, server.url + "token", datetime.datetime.utcnow() + datetime.timedelta(hours=1)) for user_id in user_ids],
+            )
+            await cur.executemany(
+                "INSERT INTO tasks (user_id, description, due_time, duration_minutes) VALUES (%s, %s, %s, 30)",
+                [
+                    (user_id, f"Bench task {n}", start + datetime.timedelta(hours=n))
+                    for user_id in user_ids for n in range(tasks_per_user)
+                ],
+            )
+    return user_ids
+
+
+async def timed_run(label, sync, server, user_ids):
+    http_before, calls_before = server.store.http_requests, server.store.requests
+    started = time.perf_counter()
+    stats = await sync.sync_all(user_ids)
+    elapsed = time.perf_counter() - started
+    pushed = stats["created"] + stats["updated"] + stats["deleted"]
+    print(
+        f"{label:<16} {pushed:>6} tasks in {elapsed:6.2f}s ({pushed / elapsed if elapsed else 0:8.1f} tasks/s), "
+        f"{server.store.http_requests - http_before:>4} HTTP round trips, "
+        f"{server.store.requests - calls_before:>5} API calls, {stats['failed']} failed"
+    )
+
+
+async def main(args):
+    server = FakeCalendarServer().start()
+    pool = await open_pool()
+    await migrate(pool)
+    await cleanup(pool)
+    calendar = CalendarClient(pool, api_root=server.url)
+    preferences = PreferencesCache(pool)
+    sync = CalendarSync(pool, calendar, preferences, batch_size=args.batch_size, max_concurrency=args.concurrency)
+    try:
+        user_ids = await seed(pool, server, args.users, args.tasks)
+        print(f"{args.users} users x {args.tasks} tasks, batch size {args.batch_size}, concurrency {args.concurrency}")
+        await timed_run("initial push", sync, server, user_ids)
+        await timed_run("unchanged", sync, server, user_ids)
+
+        async with pool.connection() as conn:
+            await conn.execute(
+                "UPDATE tasks SET duration_minutes = 45 WHERE user_id LIKE %s AND id %% %s = 0",
+                (USER_PREFIX + "%", round(1 / args.edit_share)),
+            )
+        await timed_run("after edits", sync, server, user_ids)
+    finally:
+        await cleanup(pool)
+        calendar.close()
+        server.stop()
+        await pool.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the batched task -> Google Calendar push")
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--tasks", type=int, default=100, help="tasks per user")
+    parser.add_argument("--batch-size", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--edit-share", type=float, default=0.1, help="share of tasks edited before the last run")
+    asyncio.run(main(parser.parse_args()))
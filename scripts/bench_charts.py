@@ -0,0 +1,117 @@
+# Benchmark /chart rendering (core/charts.py): command latency with PNGs drawn
+# inline on the event loop versus in the renderer's process pool, no DB needed.
+#
+#   python -m scripts.bench_charts --charts 60 --rate 2
+#
+# Chart requests arrive at --rate per second with distinct data, while a probe
+# stands in for every other command by waking up every 20 ms; its lateness is
+# how long the loop was blocked. A last pass repeats the pool run's data to
+# show cache hits.
+
+import argparse
+import asyncio
+import datetime
+import random
+import sys
+import time
+from config import CHART_CONFIG
+from core.charts import ChartRenderer, render_progress, warm_up
+
+if sys.platform == "win32":
+    asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
+
+PROBE_INTERVAL = 0.02
+
+
+def sample_data(rng, days=14):
+    today = datetime.date.today()
+    return {
+        "days": [(today - datetime.timedelta(days=days - 1 - i)).isoformat() for i in range(days)],
+        "finished": [rng.randint(0, 8) for _ in range(days)],
+        "minutes": [round(rng.uniform(0, 480), 1) for _ in range(days)],
+    }
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))] if values else 0.0
+
+
+async def probe(lateness, stop):
+    loop = asyncio.get_running_loop()
+    while not stop.is_set():
+        expected = loop.time() + PROBE_INTERVAL
+        await asyncio.sleep(PROBE_INTERVAL)
+        lateness.append(loop.time() - expected)
+
+
+async def run(render, datasets, rate):
+    latencies, lateness = [], []
+    gaps = random.Random(1)
+    stop = asyncio.Event()
+    probe_task = asyncio.create_task(probe(lateness, stop))
+
+    # Latency counts from when a request was due to arrive, so a blocked loop
+    # that delays arrivals is not hidden from the numbers
+    async def command(data, arrival):
+        await render(data)
+        latencies.append(time.perf_counter() - arrival)
+
+    started = time.perf_counter()
+    arrival = started
+    commands = []
+    for data in datasets:
+        await asyncio.sleep(max(0.0, arrival - time.perf_counter()))
+        commands.append(asyncio.create_task(command(data, arrival)))
+        arrival += gaps.expovariate(rate)
+    await asyncio.gather(*commands)
+    elapsed = time.perf_counter() - started
+    stop.set()
+    await probe_task
+    return latencies, lateness, elapsed
+
+
+def report(name, latencies, lateness, elapsed):
+    print(
+        f"{name:<8} {len(latencies)} charts in {elapsed:.2f}s | "
+        f"/chart p50 {1000 * percentile(latencies, 0.5):7.1f} ms  p99 {1000 * percentile(latencies, 0.99):7.1f} ms | "
+        f"other commands p50 {1000 * percentile(lateness, 0.5):6.1f} ms  p99 {1000 * percentile(lateness, 0.99):6.1f} ms late"
+    )
+
+
+async def main(charts, rate, workers, max_concurrent):
+    rng = random.Random(0)
+    datasets = [sample_data(rng) for _ in range(charts)]
+
+    # Inline: what rendering straight from the command coroutine would do
+    warm_up()
+    render_progress(sample_data(rng))
+
+    async def inline(data):
+        render_progress(data)
+
+    report("inline", *await run(inline, datasets, rate))
+
+    renderer = ChartRenderer(workers=workers, max_concurrent_renders=max_concurrent, cache_entries=charts)
+    for warming in renderer.start():
+        await asyncio.wrap_future(warming)
+    try:
+        report("pool", *await run(lambda data: renderer.render("progress", data), datasets, rate))
+        report("cached", *await run(lambda data: renderer.render("progress", data), datasets, rate))
+        stats = renderer.stats()
+        print(
+            f"renderer: {stats['renders']} renders (avg {stats['avg_render_ms']:.1f} ms per render), "
+            f"{stats['hits']} cache hits, {stats['cached']} PNGs cached ({stats['cache_bytes'] / 1024:.0f} KiB)"
+        )
+    finally:
+        renderer.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare /chart latency with inline and pooled rendering")
+    parser.add_argument("--charts", type=int, default=60, help="chart requests per run")
+    parser.add_argument("--rate", type=float, default=2.0, help="chart requests per second")
+    parser.add_argument("--workers", type=int, default=CHART_CONFIG["workers"])
+    parser.add_argument("--max-concurrent", type=int, default=CHART_CONFIG["max_concurrent_renders"])
+    args = parser.parse_args()
+    asyncio.run(main(args.charts, args.rate, args.workers, args.max_concurrent))
@@ -0,0 +1,117 @@
+# Benchmark /search (core/task_search.py) as task history grows, on a generated
+# copy of the tasks table in its own schema; the real tasks are not touched.
+#
+#   python -m scripts.bench_task_search --stages 250000,1000000,3000000 --users 20000
+#
+# The table is filled to each stage's size with skewed random words (a few are
+# in most tasks, most are rare), vacuumed, and then searched for random users
+# with common, mid-frequency and rare words, two-word queries and a status
+# filter. Each query runs twice: as /search does, with the owner lexeme ANDed
+# in, and with the words alone and user_id as a plain filter, which is what a
+# GIN index without the owner would give.
+
+import argparse
+import asyncio
+import random
+import sys
+import time
+import psycopg
+from psycopg.rows import dict_row
+from config import DB_CONFIG
+from core.task_search import SEARCH_SQL
+
+if sys.platform == "win32":
+    asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
+
+SCHEMA = "bench_task_search"
+VOCABULARY = 5000
+
+# Word i is drawn with probability falling steeply with i, so w0..w9 are very common
+FILL_SQL = """
+    INSERT INTO tasks (id, user_id, description, location, status, priority, due_time, stop_time)
+    SELECT n,
+           'bench' || (hashint4(n) & 2147483647) %% %(users)s,
+           (SELECT string_agg('w' || floor(%(vocabulary)s * power(random(), 4))::int, ' ')
+            FROM generate_series(1, 3 + (n %% 4)) WHERE n IS NOT NULL),
+           CASE WHEN random() < 0.3 THEN 'room w' || floor(%(vocabulary)s * power(random(), 2))::int END,
+           (ARRAY['pending', 'in_progress', 'done', 'done'])[1 + n %% 4],
+           random() < 0.2,
+           CASE WHEN random() < 0.7 THEN now()::timestamp - random() * INTERVAL '1000 days' END,
+           CASE WHEN n %% 4 >= 2 THEN now()::timestamp - random() * INTERVAL '1000 days' END
+    FROM generate_series(%(first)s, %(last)s) AS n
+"""
+
+# The same search without the owner lexeme, for comparison
+WORDS_ONLY_SQL = SEARCH_SQL.replace("@@ (q.words && q.owner)", "@@ q.words")
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))] if values else 0.0
+
+
+def queries(rng, users, count):
+    kinds = {
+        "common": lambda: (f"w{rng.randrange(10)}", None),
+        "mid": lambda: (f"w{rng.randrange(100, 500)}", None),
+        "rare": lambda: (f"w{rng.randrange(2000, VOCABULARY)}", None),
+        "two words": lambda: (f"w{rng.randrange(10)} w{rng.randrange(10, 200)}", None),
+        "common+status": lambda: (f"w{rng.randrange(10)}", "done"),
+    }
+    return [(kind, f"bench{rng.randrange(users)}", *make()) for _ in range(count) for kind, make in kinds.items()]
+
+
+async def run_queries(conn, sql, batch):
+    latencies = {}
+    for kind, user_id, query, status in batch:
+        params = {"user_id": user_id, "query": query, "status": status, "priority": None,
+                  "since": None, "until": None, "limit": 10}
+        started = time.perf_counter()
+        await (await conn.execute(sql, params)).fetchall()
+        latencies.setdefault(kind, []).append(time.perf_counter() - started)
+    return latencies
+
+
+async def main(stages, users, samples, keep):
+    conn = await psycopg.AsyncConnection.connect(**DB_CONFIG, autocommit=True, row_factory=dict_row)
+    try:
+        await conn.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+        await conn.execute(f"CREATE SCHEMA {SCHEMA}")
+        # Same columns, defaults, generated search_vector and indexes as the real table;
+        # no triggers. Ids are given explicitly, so the real id sequence is untouched.
+        await conn.execute(f"CREATE TABLE {SCHEMA}.tasks (LIKE public.tasks INCLUDING DEFAULTS INCLUDING GENERATED INCLUDING INDEXES)")
+        await conn.execute(f"SET search_path = {SCHEMA}, public")
+
+        rng = random.Random(0)
+        size = 0
+        for stage in stages:
+            started = time.perf_counter()
+            for first in range(size + 1, stage + 1, 250_000):
+                await conn.execute(FILL_SQL, {
+                    "users": users, "vocabulary": VOCABULARY, "first": first, "last": min(first + 249_999, stage),
+                })
+            await conn.execute("VACUUM ANALYZE tasks")
+            size = stage
+            print(f"\n{size:,} tasks ({size // users:,} per user), filled in {time.perf_counter() - started:.0f}s")
+
+            batch = queries(rng, users, samples)
+            await run_queries(conn, SEARCH_SQL, batch[:20])  # warm the cache
+            for label, sql in (("owner-scoped", SEARCH_SQL), ("words only", WORDS_ONLY_SQL)):
+                latencies = await run_queries(conn, sql, batch)
+                print(f"  {label}:")
+                for kind, values in latencies.items():
+                    print(f"    {kind:<14} p50 {1000 * percentile(values, 0.5):7.2f} ms  p99 {1000 * percentile(values, 0.99):7.2f} ms")
+    finally:
+        if not keep:
+            await conn.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+        await conn.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure /search latency as the tasks table grows")
+    parser.add_argument("--stages", default="250000,1000000,3000000", help="table sizes to measure at")
+    parser.add_argument("--users", type=int, default=20000)
+    parser.add_argument("--samples", type=int, default=100, help="queries of each kind per stage")
+    parser.add_argument("--keep", action="store_true", help=f"keep the {SCHEMA} schema afterwards")
+    args = parser.parse_args()
+    asyncio.run(main([int(s) for s in args.stages.split(",")], args.users, args.samples, args.keep))
@@ -0,0 +1,316 @@
+# Local stand-in for the Google Calendar API and OAuth token endpoint, for
+# exercising core/google_calendar.py without touching Google.
+#
+#   python -m scripts.fake_calendar_server --port 8085
+#
+# Point the bot at it with GOOGLE_CALENDAR_CONFIG["api_root"] = "http://127.0.0.1:8085/"
+# and give the linked user token_uri = "http://127.0.0.1:8085/token".
+# Access tokens starting with "expired" are rejected with 401 to exercise refreshes.
+# events.list supports pageToken/maxResults and syncToken; expire_sync_tokens()
+# makes every issued syncToken answer 410 to exercise full resyncs.
+# events.watch channels get real webhook notifications (a "sync" message, then
+# "exists" on every change), so it doubles as a push-notification simulator.
+# /token also answers authorization_code grants (as in the OAuth callback),
+# after token_latency seconds, to stand in for Google during auth_server load tests.
+
+import argparse
+import datetime
+import itertools
+import json
+import re
+import threading
+import time
+import urllib.request
+import uuid
+from email.parser import BytesParser
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+WATCH_PATH = re.compile(r"^/calendar/v3/calendars/(?P<calendar>[^/]+)/events/watch$")
+STOP_PATH = "/calendar/v3/channels/stop"
+EVENTS_PATH = re.compile(r"^/calendar/v3/calendars/(?P<calendar>[^/]+)/events(?:/(?P<event_id>[^/]+))?$")
+
+
+class FakeCalendarStore:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.calendars = {}  # calendar id -> {event id: event}
+        self.versions = itertools.count(1)
+        self.changes = {}  # calendar id -> {event id: version of its last change}, deletions included
+        self.sync_generation = 0
+        self.channels = {}  # channel id -> watch request plus resourceId, calendar and message counter
+        self.notifications_sent = 0
+        self.tokens_issued = 0
+        self.token_latency = 0.0  # seconds /token takes to answer
+        self.http_requests = 0  # HTTP round trips, a batch counts once
+        self.requests = 0       # Calendar API calls, each batch part counts
+
+    def events(self, calendar_id):
+        return self.calendars.setdefault(calendar_id, {})
+
+    def save(self, calendar_id, event):
+        now = datetime.datetime.now(datetime.timezone.utc).isoformat()
+        version = next(self.versions)
+        self.changes.setdefault(calendar_id, {})[event["id"]] = version
+        event["etag"] = f'"{version}"'
+        event["updated"] = now
+        event.setdefault("created", now)
+        event.setdefault("status", "confirmed")
+        event["htmlLink"] = f"https://calendar.example/event?eid={event['id']}"
+        self.events(calendar_id)[event["id"]] = event
+        self.notify(calendar_id)
+        return event
+
+    def delete(self, calendar_id, event_id):
+        del self.events(calendar_id)[event_id]
+        self.changes.setdefault(calendar_id, {})[event_id] = next(self.versions)
+        self.notify(calendar_id)
+
+    def watch(self, calendar_id, request):
+        channel = {
+            **request,
+            "resourceId": f"resource-{calendar_id}",
+            "calendar": calendar_id,
+            "expiration": str(int((datetime.datetime.now().timestamp() + int(request.get("params", {}).get("ttl", 604800))) * 1000)),
+            "messages": itertools.count(1),
+        }
+        self.channels[request["id"]] = channel
+        self._send_notification(channel, "sync")
+        return {"kind": "api#channel", "id": request["id"], "resourceId": channel["resourceId"],
+                "resourceUri": f"/calendar/v3/calendars/{calendar_id}/events", "expiration": channel["expiration"]}
+
+    def notify(self, calendar_id):
+        for channel in list(self.channels.values()):
+            if channel["calendar"] == calendar_id:
+                self._send_notification(channel, "exists")
+
+    # Posted from a thread, like Google, so a slow receiver never blocks the API
+    def _send_notification(self, channel, state):
+        headers = {
+            "X-Goog-Channel-ID": channel["id"],
+            "X-Goog-Resource-ID": channel["resourceId"],
+            "X-Goog-Resource-State": state,
+            "X-Goog-Resource-URI": f"/calendar/v3/calendars/{channel['calendar']}/events",
+            "X-Goog-Message-Number": str(next(channel["messages"])),
+            "X-Goog-Channel-Expiration": channel["expiration"],
+        }
+        if channel.get("token"):
+            headers["X-Goog-Channel-Token"] = channel["token"]
+
+        def send():
+            try:
+                urllib.request.urlopen(urllib.request.Request(channel["address"], data=b"", headers=headers), timeout=10).close()
+            except Exception as e:
+                print(f"Notification to {channel['address']} failed: {e}")
+            with self.lock:
+                self.notifications_sent += 1
+
+        threading.Thread(target=send, daemon=True).start()
+
+    def expire_sync_tokens(self):
+        self.sync_generation += 1
+
+    def list_events(self, calendar_id, query):
+        events = self.events(calendar_id)
+        sync_token = query.get("syncToken", [None])[0]
+        if sync_token is None:
+            items = list(events.values())
+        else:
+            generation, _, since = sync_token.partition("-")
+            if generation != str(self.sync_generation) or not since.isdigit():
+                return 410, {"error": {"code": 410, "message": "Sync token is no longer valid, a full sync is required.",
+                                       "errors": [{"domain": "global", "reason": "fullSyncRequired"}]}}
+            items = [
+                events.get(event_id, {"id": event_id, "status": "cancelled"})
+                for event_id, version in self.changes.get(calendar_id, {}).items()
+                if version > int(since)
+            ]
+
+        offset = int(query.get("pageToken", ["0"])[0])
+        size = int(query.get("maxResults", ["250"])[0])
+        body = {"kind": "calendar#events", "items": items[offset:offset + size]}
+        if offset + size < len(items):
+            body["nextPageToken"] = str(offset + size)
+        else:
+            latest = max(self.changes.get(calendar_id, {}).values(), default=0)
+            body["nextSyncToken"] = f"{self.sync_generation}-{latest}"
+        return 200, body
+
+    # Handles one Calendar API call and returns (status, json body or None)
+    def route(self, method, path, body, if_match=None):
+        url = urlparse(path)
+        if method == "POST" and url.path == STOP_PATH:
+            with self.lock:
+                self.requests += 1
+                request = json.loads(body or b"{}")
+                channel = self.channels.get(request.get("id"))
+                if channel is None or channel["resourceId"] != request.get("resourceId"):
+                    return 404, {"error": {"code": 404, "message": "Channel not found"}}
+                del self.channels[request["id"]]
+                return 204, None
+        watch = WATCH_PATH.match(url.path)
+        if method == "POST" and watch:
+            with self.lock:
+                self.requests += 1
+                return 200, self.watch(watch["calendar"], json.loads(body or b"{}"))
+
+        match = EVENTS_PATH.match(url.path)
+        if not match:
+            return 404, {"error": {"code": 404, "message": "Not Found"}}
+
+        calendar_id, event_id = match["calendar"], match["event_id"]
+        with self.lock:
+            self.requests += 1
+            events = self.events(calendar_id)
+            if event_id is None and method == "GET":
+                return self.list_events(calendar_id, parse_qs(url.query))
+            if event_id is None and method == "POST":
+                event = json.loads(body or b"{}")
+                event["id"] = uuid.uuid4().hex
+                return 200, self.save(calendar_id, event)
+            if event_id not in events:
+                return 404, {"error": {"code": 404, "message": "Not Found"}}
+            if method == "GET":
+                return 200, events[event_id]
+            if method in ("PUT", "PATCH"):
+                if if_match and if_match != events[event_id]["etag"]:
+                    return 412, {"error": {"code": 412, "message": "Precondition Failed"}}
+                update = json.loads(body or b"{}")
+                event = update if method == "PUT" else {**events[event_id], **update}
+                event["id"] = event_id
+                event["created"] = events[event_id]["created"]
+                return 200, self.save(calendar_id, event)
+            if method == "DELETE":
+                self.delete(calendar_id, event_id)
+                return 204, None
+        return 405, {"error": {"code": 405, "message": "Method Not Allowed"}}
+
+
+class FakeCalendarHandler(BaseHTTPRequestHandler):
+    store = None  # set by FakeCalendarServer
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status, body=None, content_type="application/json"):
+        if isinstance(body, bytes):
+            payload = body
+        else:
+            payload = json.dumps(body).encode() if body is not None else b""
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _body(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        return self.rfile.read(length) if length else b""
+
+    def _authorized(self):
+        auth = self.headers.get("Authorization", "")
+        if not auth.startswith("Bearer ") or auth[7:].startswith("expired"):
+            self._send(401, {"error": {"code": 401, "message": "Invalid Credentials"}})
+            return False
+        return True
+
+    def _dispatch(self, method):
+        with self.store.lock:
+            self.store.http_requests += 1
+        # Always drain the body first so keep-alive connections stay in sync
+        self.body = self._body()
+        path = urlparse(self.path).path
+        if path == "/token" and method == "POST":
+            time.sleep(self.store.token_latency)
+            form = parse_qs(self.body.decode())
+            with self.store.lock:
+                self.store.tokens_issued += 1
+                token = f"fake-{self.store.tokens_issued}"
+            response = {"access_token": token, "expires_in": 3600, "token_type": "Bearer"}
+            if form.get("grant_type") == ["authorization_code"]:
+                response["refresh_token"] = f"refresh-{token}"
+                response["scope"] = "https://www.googleapis.com/auth/calendar.events https://www.googleapis.com/auth/calendar.readonly"
+            self._send(200, response)
+            return
+
+        if not self._authorized():
+            return
+        if path == "/batch/calendar/v3" and method == "POST":
+            self._handle_batch()
+            return
+        status, body = self.store.route(method, self.path, self.body, self.headers.get("If-Match"))
+        self._send(status, body)
+
+    def _handle_batch(self):
+        # multipart/mixed of application/http parts, answered in the same shape
+        content_type = self.headers["Content-Type"]
+        message = BytesParser().parsebytes(b"Content-Type: " + content_type.encode() + b"\r\n\r\n" + self.body)
+        boundary = uuid.uuid4().hex
+        parts = []
+        for part in message.get_payload():
+            raw = part.get_payload(decode=False)
+            head, _, body = raw.replace("\r\n", "\n").partition("\n\n")
+            request_line, *header_lines = head.split("\n")
+            method, path, _ = request_line.split(" ", 2)
+            headers = {k.lower(): v for k, v in (line.split(": ", 1) for line in header_lines if ": " in line)}
+            status, result = self.store.route(method, path, body.encode(), headers.get("if-match"))
+            payload = json.dumps(result) if result is not None else ""
+            content_id = part["Content-ID"]
+            parts.append(
+                f"--{boundary}\r\nContent-Type: application/http\r\n"
+                f"Content-ID: <response-{content_id[1:]}\r\n\r\n"
+                f"HTTP/1.1 {status} {HTTPStatus(status).phrase}\r\n"
+                f"Content-Type: application/json\r\nContent-Length: {len(payload)}\r\n\r\n"
+                f"{payload}\r\n"
+            )
+        response = "".join(parts) + f"--{boundary}--\r\n"
+        self._send(200, response.encode(), content_type=f"multipart/mixed; boundary={boundary}")
+
+    def do_GET(self):
+        self._dispatch("GET")
+
+    def do_POST(self):
+        self._dispatch("POST")
+
+    def do_PUT(self):
+        self._dispatch("PUT")
+
+    def do_PATCH(self):
+        self._dispatch("PATCH")
+
+    def do_DELETE(self):
+        self._dispatch("DELETE")
+
+
+class FakeCalendarServer:
+    def __init__(self, host="127.0.0.1", port=0):
+        self.store = FakeCalendarStore()
+        handler = type("Handler", (FakeCalendarHandler,), {"store": self.store})
+        self.httpd = ThreadingHTTPServer((host, port), handler)
+        self.thread = None
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}/"
+
+    def start(self):
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run a fake Google Calendar API server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8085)
+    args = parser.parse_args()
+    server = FakeCalendarServer(args.host, args.port)
+    print(f"Fake Calendar API listening on {server.url}")
+    server.httpd.serve_forever()
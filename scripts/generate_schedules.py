@@ -0,0 +1,80 @@
+# Run the daily schedule batch job (core/daily_schedule.py) outside the bot.
+#
+#   python -m scripts.generate_schedules              # plan every user with pending tasks
+#   python -m scripts.generate_schedules --bench 5000 # time the packer on synthetic users, no DB
+#
+# --late sets the share of synthetic users whose working day is already over
+# (planning today after work ends); nothing may be placed for them.
+# Each user is planned for today, or tomorrow once their working day is over.
+
+import argparse
+import asyncio
+import sys
+import time
+import numpy as np
+from config import SCHEDULE_CONFIG
+from core.daily_schedule import generate, pack, pending_users
+
+if sys.platform == "win32":
+    asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
+
+
+async def run(batch_size):
+    from core.db import open_pool
+    pool = await open_pool()
+    try:
+        started = time.perf_counter()
+        user_ids = await pending_users(pool)
+        entries = 0
+        for start in range(0, len(user_ids), batch_size):
+            result = await generate(pool, user_ids[start:start + batch_size])
+            entries += sum(len(user_entries) for _, user_entries in result.values())
+        print(f"Planned {len(user_ids)} users ({entries} entries) in {time.perf_counter() - started:.2f}s")
+    finally:
+        await pool.close()
+
+
+def bench(users, tasks_per_user, events_per_user, late):
+    rng = np.random.default_rng(0)
+    work_start = rng.integers(7 * 60, 10 * 60, users)
+    work_end = work_start + 8 * 60
+    lunch_start = np.full(users, 12 * 60)
+    lunch_end = np.full(users, 14 * 60)
+    lunch_length = np.full(users, 30)
+    not_before = np.zeros(users, dtype=np.int64)
+    is_late = rng.random(users) < late
+    not_before[is_late] = work_end[is_late] + 20
+
+    busy_user = np.repeat(np.arange(users), events_per_user)
+    busy_start = rng.integers(8 * 60, 17 * 60, len(busy_user))
+    busy_end = busy_start + rng.choice([30, 60, 90], len(busy_user))
+    task_user = np.repeat(np.arange(users), tasks_per_user)
+    task_length = rng.choice([15, 30, 45, 60], len(task_user))
+
+    started = time.perf_counter()
+    lunch, task_start = pack(
+        work_start, work_end, lunch_start, lunch_end, lunch_length, not_before,
+        busy_user, busy_start, busy_end, task_user, task_length,
+    )
+    elapsed = time.perf_counter() - started
+    if (lunch[is_late] >= 0).any() or (task_start[np.isin(task_user, np.nonzero(is_late)[0])] >= 0).any():
+        raise SystemExit("placed something for a user whose working day is over")
+    print(
+        f"{users} users x {tasks_per_user} tasks, {events_per_user} events each: packed in {elapsed:.2f}s "
+        f"({users / elapsed:.0f} users/s); {(task_start >= 0).mean():.0%} of tasks placed, "
+        f"{(lunch >= 0).mean():.0%} got lunch, {is_late.sum()} after work"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate daily schedules for every user with pending tasks")
+    parser.add_argument("--batch-size", type=int, default=SCHEDULE_CONFIG["batch_size"])
+    parser.add_argument("--bench", type=int, metavar="USERS", help="time the packer on synthetic users instead")
+    parser.add_argument("--tasks", type=int, default=10, help="tasks per synthetic user")
+    parser.add_argument("--events", type=int, default=3, help="calendar events per synthetic user")
+    parser.add_argument("--late", type=float, default=0.1, help="share of synthetic users past their working day")
+    args = parser.parse_args()
+    if args.bench:
+        bench(args.bench, args.tasks, args.events, args.late)
+    else:
+        asyncio.run(run(args.batch_size))
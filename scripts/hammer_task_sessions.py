@@ -0,0 +1,259 @@
+# Hammer task transitions (core/task_sessions.py) with concurrent, repeated
+# clicks against the configured database and check the session log afterwards.
+#
+#   python -m scripts.hammer_task_sessions --tasks 20 --workers 32 --actions 200 --clicks 3
+#
+# Each worker repeatedly picks one of a few tasks and sends --clicks actions
+# (start, finish, delay, complete or reopen from /list) for it at once, each on
+# its own connection: either one action repeated, the way a double-click does,
+# of which at most one copy may succeed, or a mix of actions racing each other.
+# Afterwards every running task must have exactly one open session, sessions
+# must not overlap, tasks.num_sessions/actual_duration and task_metrics must
+# agree with the log, /report's finished counts with the done tasks, and the
+# log must hold exactly the transitions that succeeded. --legacy runs the
+# statements /start, /finish and /delay used before the log, for comparison
+# (only double counts are checked).
+# Rows of the hammer-sessions user are deleted afterwards.
+
+import argparse
+import asyncio
+import datetime
+import random
+import sys
+import time
+from collections import Counter
+from psycopg.rows import dict_row
+from psycopg_pool import AsyncConnectionPool
+from config import DB_CONFIG
+from core.task_metrics import record_start, record_finish, record_delay, record_reopen
+from core.task_sessions import start_task, stop_task
+
+if sys.platform == "win32":
+    asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
+
+USER_ID = "hammer-sessions"
+
+
+async def start(conn, task_id, now):
+    started = await start_task(conn, USER_ID, task_id, now)
+    if started:
+        await record_start(conn, task_id, now)
+    return "start" if started else None
+
+
+async def finish(conn, task_id, now):
+    finished, session = await stop_task(conn, USER_ID, task_id, now, "done")
+    if finished:
+        await record_finish(conn, finished["id"], now, session["minutes"] if session else 0)
+    return "finish" if finished else None
+
+
+async def delay(conn, task_id, now):
+    delayed, session = await stop_task(conn, USER_ID, task_id, now, "pending")
+    if delayed:
+        await record_delay(conn, delayed["id"], session["minutes"] if session else 0)
+    return "delay" if delayed else None
+
+
+async def complete(conn, task_id, now):
+    completed, session = await stop_task(conn, USER_ID, task_id, now, "done", ("pending", "in_progress"))
+    if completed:
+        await record_finish(conn, task_id, now, session["minutes"] if session else 0)
+    return ("complete running" if session else "complete pending") if completed else None
+
+
+async def reopen(conn, task_id, now):
+    cur = await conn.execute(
+        "UPDATE tasks SET status = 'pending' WHERE id = %s AND user_id = %s AND status = 'done' RETURNING id", (task_id, USER_ID)
+    )
+    if not await cur.fetchone():
+        return None
+    await record_reopen(conn, task_id)
+    return "reopen"
+
+
+# What cogs/tasks.py did before core/task_sessions.py
+async def legacy_start(conn, task_id, now):
+    cur = await conn.execute("""
+        UPDATE tasks SET start_time = %s, status = 'in_progress', num_sessions = COALESCE(num_sessions, 0) + 1
+        WHERE id = %s AND user_id = %s RETURNING id
+    """, (now, task_id, USER_ID))
+    if await cur.fetchone():
+        await record_start(conn, task_id, now)
+        return "start"
+
+
+async def legacy_stop(conn, task_id, now, status):
+    cur = await conn.execute("""
+        SELECT id, start_time FROM tasks WHERE user_id = %s AND status = 'in_progress' AND id = %s
+    """, (USER_ID, task_id))
+    current = await cur.fetchone()
+    if not current:
+        return None
+    minutes = (now - current["start_time"]).total_seconds() / 60
+    if status == "done":
+        await conn.execute("""
+            UPDATE tasks SET stop_time = %s, status = 'done', actual_duration = COALESCE(actual_duration, 0) + %s
+            WHERE id = %s
+        """, (now, minutes, task_id))
+        await record_finish(conn, task_id, now, minutes)
+        return "finish"
+    await conn.execute("UPDATE tasks SET start_time = NULL, status = 'pending' WHERE id = %s", (task_id,))
+    await record_delay(conn, task_id, minutes)
+    return "delay"
+
+
+ACTIONS = {
+    False: {"start": start, "finish": finish, "delay": delay, "complete": complete, "reopen": reopen},
+    True: {
+        "start": legacy_start,
+        "finish": lambda conn, task_id, now: legacy_stop(conn, task_id, now, "done"),
+        "delay": lambda conn, task_id, now: legacy_stop(conn, task_id, now, "pending"),
+        "reopen": reopen,
+    },
+}
+
+CHECKS_SQL = {
+    "running tasks without exactly one open session": """
+        SELECT COUNT(*) FROM tasks t
+        WHERE t.user_id = %(user_id)s AND (t.status = 'in_progress') <>
+              ((SELECT COUNT(*) FROM task_sessions s WHERE s.task_id = t.id AND s.stopped_at IS NULL) = 1)
+    """,
+    "overlapping sessions": """
+        SELECT COUNT(*) FROM (
+            SELECT started_at, LAG(stopped_at) OVER (PARTITION BY task_id ORDER BY started_at, id) AS previous_stop
+            FROM task_sessions WHERE task_id IN (SELECT id FROM tasks WHERE user_id = %(user_id)s)
+        ) s WHERE started_at < previous_stop
+    """,
+    "tasks whose totals disagree with the log": """
+        SELECT COUNT(*) FROM tasks t
+        LEFT JOIN LATERAL (
+            SELECT COALESCE(SUM(sessions), 0) AS sessions, COALESCE(SUM(EXTRACT(EPOCH FROM stopped_at - started_at)) / 60, 0) AS minutes
+            FROM task_sessions WHERE task_id = t.id AND stopped_at IS NOT NULL
+        ) log ON TRUE
+        WHERE t.user_id = %(user_id)s
+          AND (COALESCE(t.num_sessions, 0) <> log.sessions OR abs(COALESCE(t.actual_duration, 0) - log.minutes) > 1e-6)
+    """,
+    "tasks whose metrics disagree with the log": """
+        SELECT COUNT(*) FROM tasks t
+        LEFT JOIN task_metrics m ON m.task_id = t.id
+        LEFT JOIN LATERAL (
+            SELECT COALESCE(SUM(sessions), 0) AS sessions, COUNT(*) FILTER (WHERE outcome = 'delayed') AS delays
+            FROM task_sessions WHERE task_id = t.id
+        ) log ON TRUE
+        WHERE t.user_id = %(user_id)s
+          AND (COALESCE(m.sessions_count, 0) <> log.sessions OR COALESCE(m.delayed_count, 0) <> log.delays)
+    """,
+    "tasks counted as finished by /report but not done, or the other way round": """
+        SELECT COUNT(*) FROM tasks t
+        LEFT JOIN task_metrics m ON m.task_id = t.id
+        WHERE t.user_id = %(user_id)s AND (t.status = 'done') <> COALESCE(m.finished, FALSE)
+    """,
+    "users whose /report finished count disagrees with their done tasks": """
+        SELECT COUNT(*) FROM user_task_rollups r
+        WHERE r.user_id = %(user_id)s
+          AND r.finished <> (SELECT COUNT(*) FROM tasks WHERE user_id = r.user_id AND status = 'done')
+    """,
+}
+
+LOG_COUNTS_SQL = """
+    SELECT COUNT(*) AS sessions,
+           COUNT(*) FILTER (WHERE outcome = 'finished') AS finished,
+           COUNT(*) FILTER (WHERE outcome = 'delayed') AS delayed
+    FROM task_sessions WHERE task_id IN (SELECT id FROM tasks WHERE user_id = %(user_id)s)
+"""
+
+
+async def cleanup(pool):
+    async with pool.connection() as conn:
+        await conn.execute("DELETE FROM tasks WHERE user_id = %s", (USER_ID,))
+
+
+async def click(pool, action, task_id):
+    async with pool.connection() as conn:
+        return await action(conn, task_id, datetime.datetime.now())
+
+
+# Groups on the same task don't overlap, so "at most one copy succeeds" holds
+# for identical clicks; half the groups mix actions to race them against each other
+async def worker(pool, rng, locks, actions, count, clicks, results):
+    for _ in range(count):
+        task_id = rng.choice(list(locks))
+        names = [rng.choice(list(actions))] * clicks
+        if rng.random() < 0.5:
+            names = [rng.choice(list(actions)) for _ in range(clicks)]
+        async with locks[task_id]:
+            outcomes = await asyncio.gather(*(click(pool, actions[name], task_id) for name in names))
+        won = [o for o in outcomes if o]
+        results["clicks"] += 1
+        results["double"] += len(set(names)) == 1 and len(won) > 1
+        for outcome in won:
+            results[outcome] += 1
+        await asyncio.sleep(rng.random() * 0.005)  # give sessions some length
+
+
+async def main(tasks, workers, actions, clicks, legacy, seed):
+    pool = AsyncConnectionPool(
+        kwargs={**DB_CONFIG, "row_factory": dict_row}, min_size=workers * clicks, max_size=workers * clicks, open=False,
+    )
+    await pool.open(wait=True)
+    await cleanup(pool)
+    try:
+        async with pool.connection() as conn:
+            cur = await conn.execute("""
+                INSERT INTO tasks (user_id, description, due_time, deadline)
+                SELECT %s, 'Hammer task ' || n, now()::timestamp, now()::timestamp + INTERVAL '1 hour'
+                FROM generate_series(1, %s) AS n RETURNING id
+            """, (USER_ID, tasks))
+            locks = {row["id"]: asyncio.Lock() for row in await cur.fetchall()}
+
+        results = Counter()
+        started = time.perf_counter()
+        await asyncio.gather(*(
+            worker(pool, random.Random(seed + i), locks, ACTIONS[legacy], actions, clicks, results)
+            for i in range(workers)
+        ))
+        elapsed = time.perf_counter() - started
+
+        print(
+            f"{'legacy' if legacy else 'session log'}: {results['clicks']} clicks x{clicks} on {tasks} tasks "
+            f"by {workers} workers in {elapsed:.1f}s"
+        )
+        print("  succeeded: " + ", ".join(f"{k} {v}" for k, v in sorted(results.items()) if k not in ("clicks", "double")))
+        print(f"  repeated clicks that succeeded more than once: {results['double']}")
+        if legacy:
+            return results["double"] == 0
+
+        failures = 0
+        async with pool.connection() as conn:
+            for label, sql in CHECKS_SQL.items():
+                bad = (await (await conn.execute(sql, {"user_id": USER_ID})).fetchone())["count"]
+                failures += bad
+                print(f"  {label}: {bad}")
+            log = await (await conn.execute(LOG_COUNTS_SQL, {"user_id": USER_ID})).fetchone()
+        expected = {
+            "sessions": results["start"],
+            "finished": results["finish"] + results["complete running"],
+            "delayed": results["delay"],
+        }
+        for key, value in expected.items():
+            print(f"  {key} in log: {log[key]} (successful transitions: {value})")
+            failures += log[key] != value
+        return failures == 0 and results["double"] == 0
+    finally:
+        await cleanup(pool)
+        await pool.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Race start/finish/delay clicks and check the task session log")
+    parser.add_argument("--tasks", type=int, default=20, help="fewer tasks means more collisions")
+    parser.add_argument("--workers", type=int, default=32)
+    parser.add_argument("--actions", type=int, default=200, help="clicks per worker")
+    parser.add_argument("--clicks", type=int, default=3, help="copies of each click sent at once")
+    parser.add_argument("--legacy", action="store_true", help="use the statements from before the session log")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    ok = asyncio.run(main(args.tasks, args.workers, args.actions, args.clicks, args.legacy, args.seed))
+    print("OK" if ok else "FAILED")
+    sys.exit(0 if ok else 1)
@@ -0,0 +1,151 @@
+# Load-test auth_server.py's OAuth callback against the configured database,
+# with scripts/fake_calendar_server.py standing in for Google's token endpoint.
+#
+#   python -m scripts.load_test_auth_server --requests 400 --concurrency 32 --token-latency 0.2
+#
+# Every request is a full /oauth2callback: code exchange (taking --token-latency
+# seconds at the fake Google), prepared token upsert and pull request. With
+# --rate, latency counts from when a request was due to start, so a saturated
+# server can't hide behind a slow client; without it, from when a client sends
+# it. --server werkzeug runs the same test on Flask's development server for
+# comparison. Rows written under the loadtest-auth- prefix are deleted afterwards.
+
+import argparse
+import json
+import logging
+import os
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+import psycopg2
+from waitress.server import create_server
+from werkzeug.serving import make_server
+from config import AUTH_SERVER_CONFIG, DB_CONFIG, CALENDAR_WEBHOOK_CONFIG
+from scripts.fake_calendar_server import FakeCalendarServer
+
+# The fake token endpoint is plain http
+os.environ["OAUTHLIB_INSECURE_TRANSPORT"] = "1"
+CALENDAR_WEBHOOK_CONFIG["address"] = None  # only the callback itself is measured
+
+import auth_server  # noqa: E402  (after the overrides above)
+
+STATE_PREFIX = "loadtest-auth-"
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))] if values else 0.0
+
+
+def start_server(kind, threads):
+    if kind == "waitress":
+        server = create_server(auth_server.app, host="127.0.0.1", port=0, threads=threads)
+        port = server.effective_port
+        thread = threading.Thread(target=server.run, daemon=True)
+        stop = server.close
+    else:
+        server = make_server("127.0.0.1", 0, auth_server.app, threaded=True)
+        port = server.server_port
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        stop = server.shutdown
+    thread.start()
+    return f"http://127.0.0.1:{port}", stop
+
+
+def get(url):
+    try:
+        with urllib.request.urlopen(url, timeout=120) as response:
+            return response.status, response.read()
+    except urllib.error.HTTPError as e:
+        return e.code, e.read()
+
+
+def cleanup():
+    with psycopg2.connect(**DB_CONFIG) as conn:
+        with conn.cursor() as cur:
+            cur.execute("DELETE FROM calendar_pull_requests WHERE user_id LIKE %s", (STATE_PREFIX + "%",))
+            cur.execute("DELETE FROM calendar_tokens WHERE user_id LIKE %s", (STATE_PREFIX + "%",))
+    conn.close()
+
+
+def stored_rows():
+    with psycopg2.connect(**DB_CONFIG) as conn:
+        with conn.cursor() as cur:
+            cur.execute("""
+                SELECT COUNT(*), COUNT(*) FILTER (WHERE refresh_token IS NOT NULL AND expiry IS NOT NULL),
+                       (SELECT COUNT(*) FROM calendar_pull_requests WHERE user_id LIKE %(prefix)s)
+                FROM calendar_tokens WHERE user_id LIKE %(prefix)s
+            """, {"prefix": STATE_PREFIX + "%"})
+            row = cur.fetchone()
+    conn.close()
+    return row
+
+
+def main(server_kind, requests, concurrency, rate, token_latency, threads):
+    google = FakeCalendarServer().start()
+    google.store.token_latency = token_latency
+    auth_server.CLIENT_CONFIG = {"web": {
+        "client_id": "loadtest-client",
+        "client_secret": "loadtest-secret",
+        "auth_uri": google.url + "auth",
+        "token_uri": google.url + "token",
+        "redirect_uris": [AUTH_SERVER_CONFIG["redirect_uri"]],
+    }}
+    logging.getLogger("waitress.queue").setLevel(logging.ERROR)  # expected when clients outnumber threads
+    base, stop = start_server(server_kind, threads)
+    cleanup()
+
+    latencies, statuses = [], Counter()
+    lock = threading.Lock()
+
+    def callback(i, due):
+        due = due or time.perf_counter()
+        query = urllib.parse.urlencode({"code": f"code-{i}", "state": f"{STATE_PREFIX}{i}"})
+        status, _ = get(f"{base}/oauth2callback?{query}")
+        with lock:
+            latencies.append(time.perf_counter() - due)
+            statuses[status] += 1
+
+    try:
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as clients:
+            for i in range(requests):
+                due = started + i / rate if rate else None
+                if due:
+                    time.sleep(max(0.0, due - time.perf_counter()))
+                clients.submit(callback, i, due)
+        elapsed = time.perf_counter() - started
+
+        health_status, health = get(f"{base}/healthz")
+        tokens, complete, pulls = stored_rows()
+        print(
+            f"{server_kind}: {requests} callbacks in {elapsed:.2f}s ({requests / elapsed:.1f}/s) with "
+            f"{concurrency} clients, token endpoint {1000 * token_latency:.0f} ms | "
+            f"p50 {1000 * percentile(latencies, 0.5):.0f} ms  p99 {1000 * percentile(latencies, 0.99):.0f} ms | "
+            f"status {dict(sorted(statuses.items()))}"
+        )
+        print(
+            f"fake Google issued {google.store.tokens_issued} tokens; database has {tokens} token rows "
+            f"({complete} with refresh token and expiry) and {pulls} pull requests"
+        )
+        print(f"/healthz {health_status}: {json.loads(health)}")
+    finally:
+        stop()
+        google.stop()
+        cleanup()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load-test the OAuth callback against a stub token endpoint")
+    parser.add_argument("--server", choices=["waitress", "werkzeug"], default="waitress")
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=32, help="client threads")
+    parser.add_argument("--rate", type=float, default=0, help="callbacks started per second (0: as fast as clients allow)")
+    parser.add_argument("--token-latency", type=float, default=0.2, help="seconds the fake token endpoint takes")
+    parser.add_argument("--threads", type=int, default=AUTH_SERVER_CONFIG["threads"], help="waitress threads")
+    args = parser.parse_args()
+    main(args.server, args.requests, args.concurrency, args.rate, args.token_latency, args.threads)
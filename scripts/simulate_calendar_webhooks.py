@@ -0,0 +1,76 @@
+# Fire Google Calendar push notifications at auth_server's webhook, as Google
+# would, for the watch channels recorded in the database.
+#
+#   python -m scripts.simulate_calendar_webhooks --url http://localhost:8080/calendar/notifications
+#
+# Sends --count "exists" notifications spread over the channels (plus --forged
+# ones with a wrong token, which must be rejected) and reports response codes,
+# latency and how many pull requests ended up queued for the bot.
+
+import argparse
+import itertools
+import random
+import statistics
+import time
+import urllib.error
+import urllib.request
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+import psycopg
+from config import DB_CONFIG
+
+
+def send(url, channel, message_number, token=None):
+    headers = {
+        "X-Goog-Channel-ID": channel["channel_id"],
+        "X-Goog-Resource-ID": channel["resource_id"],
+        "X-Goog-Resource-State": "exists",
+        "X-Goog-Message-Number": str(message_number),
+        "X-Goog-Channel-Token": token if token is not None else channel["token"],
+    }
+    started = time.perf_counter()
+    try:
+        with urllib.request.urlopen(urllib.request.Request(url, data=b"", headers=headers), timeout=10) as response:
+            status = response.status
+    except urllib.error.HTTPError as e:
+        status = e.code
+    return status, time.perf_counter() - started
+
+
+def main(args):
+    with psycopg.connect(**DB_CONFIG, row_factory=psycopg.rows.dict_row) as conn:
+        channels = conn.execute("SELECT channel_id, resource_id, token FROM calendar_watch_channels").fetchall()
+        queued_before = conn.execute("SELECT count(*) AS n FROM calendar_pull_requests").fetchone()["n"]
+    if not channels:
+        print("No watch channels recorded; link a calendar with CALENDAR_WEBHOOK_CONFIG['address'] set first.")
+        return
+
+    numbers = itertools.count(1)
+    jobs = [(random.choice(channels), next(numbers), None) for _ in range(args.count)]
+    jobs += [(random.choice(channels), next(numbers), "forged") for _ in range(args.forged)]
+    random.shuffle(jobs)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        results = list(executor.map(lambda job: (job[2], *send(args.url, *job)), jobs))
+    elapsed = time.perf_counter() - started
+
+    with psycopg.connect(**DB_CONFIG, row_factory=psycopg.rows.dict_row) as conn:
+        queued_after = conn.execute("SELECT count(*) AS n FROM calendar_pull_requests").fetchone()["n"]
+
+    latencies = sorted(latency for _, _, latency in results)
+    genuine = Counter(status for token, status, _ in results if token is None)
+    forged = Counter(status for token, status, _ in results if token is not None)
+    print(f"{len(results)} notifications to {len(channels)} channels in {elapsed:.2f}s ({len(results) / elapsed:.0f}/s)")
+    print(f"latency p50 {statistics.median(latencies) * 1000:.1f}ms, p95 {latencies[int(len(latencies) * 0.95)] * 1000:.1f}ms")
+    print(f"genuine responses: {dict(genuine)}, forged responses: {dict(forged)}")
+    print(f"pull requests queued: {queued_before} -> {queued_after} (the bot drains these as they arrive)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Simulate Google Calendar webhook notifications")
+    parser.add_argument("--url", default="http://localhost:8080/calendar/notifications")
+    parser.add_argument("--count", type=int, default=200)
+    parser.add_argument("--forged", type=int, default=20, help="notifications sent with a wrong channel token")
+    parser.add_argument("--concurrency", type=int, default=8)
+    main(parser.parse_args())
@@ -0,0 +1,146 @@
+# Run several job runners (core/jobs.py) as separate local processes against the
+# configured database and check how they share and hand over partitions.
+#
+#   python -m scripts.simulate_job_runners --processes 3 --check-seconds 1
+#
+# Starts the processes, then adds one, kills one with SIGKILL and stops one
+# cleanly. After each step it waits until every partition of every job is held
+# by exactly one live process, in even shares, with each process's own view
+# matching the locks Postgres reports, and prints how long that took.
+
+import argparse
+import asyncio
+import json
+import math
+import signal
+import sys
+import time
+from core.db import open_pool
+from core.jobs import JOBS, LOCK_CLASS, PARTITIONED_JOBS, JobRunner
+
+if sys.platform == "win32":
+    asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
+
+REPORT_INTERVAL = 0.2
+
+HELD_LOCKS_SQL = """
+    SELECT pid, classid::bigint - %s AS job, objid::bigint AS partition FROM pg_locks
+    WHERE locktype = 'advisory' AND granted AND mode = 'ExclusiveLock' AND objsubid = 2
+      AND database = (SELECT oid FROM pg_database WHERE datname = current_database())
+      AND classid::bigint BETWEEN %s AND %s
+"""
+
+
+async def worker(partitions, check_seconds):
+    runner = JobRunner(partitions=partitions, check_seconds=check_seconds)
+    runner.start()
+    while True:
+        print(json.dumps(runner.stats()), flush=True)
+        await asyncio.sleep(REPORT_INTERVAL)
+
+
+class Simulation:
+    def __init__(self, pool, partitions, check_seconds):
+        self.pool = pool
+        self.partitions = partitions
+        self.check_seconds = check_seconds
+        self.processes = {}  # os pid -> process
+        self.reports = {}    # os pid -> latest stats line
+
+    async def spawn(self):
+        process = await asyncio.create_subprocess_exec(
+            sys.executable, "-m", "scripts.simulate_job_runners", "--worker",
+            "--partitions", str(self.partitions), "--check-seconds", str(self.check_seconds),
+            stdout=asyncio.subprocess.PIPE,
+        )
+        self.processes[process.pid] = process
+        asyncio.create_task(self._read(process))
+        return process
+
+    async def _read(self, process):
+        async for line in process.stdout:
+            try:
+                self.reports[process.pid] = json.loads(line)
+            except ValueError:
+                pass
+
+    async def remove(self, process, sig):
+        process.send_signal(sig)
+        await process.wait()
+        del self.processes[process.pid]
+        self.reports.pop(process.pid, None)
+
+    # None when settled, otherwise what is still wrong
+    async def problem(self):
+        async with self.pool.connection() as conn:
+            cur = await conn.execute(HELD_LOCKS_SQL, (LOCK_CLASS, LOCK_CLASS + 1, LOCK_CLASS + max(JOBS.values())))
+            held = await cur.fetchall()
+        live = [self.reports.get(pid) for pid in self.processes]
+        if None in live or any(report["backend_pid"] is None for report in live):
+            return "waiting for reports"
+        share = math.ceil(self.partitions / len(live))
+        for job in PARTITIONED_JOBS:
+            actual = {(row["pid"], row["partition"]) for row in held if row["job"] == JOBS[job]}
+            claimed = {(report["backend_pid"], p) for report in live for p in report["owned"][job]}
+            if actual != claimed:
+                return f"{job}: process views differ from pg_locks"
+            if sorted(p for _, p in actual) != list(range(self.partitions)):
+                return f"{job}: partitions not held exactly once"
+            if any(len(report["owned"][job]) > share for report in live):
+                return f"{job}: uneven shares"
+        return None
+
+    async def settle(self, label, timeout):
+        started = time.perf_counter()
+        while True:
+            problem = await self.problem()
+            elapsed = time.perf_counter() - started
+            if problem is None:
+                shares = sorted(len(report["owned"]["reminders"]) for report in self.reports.values())
+                print(f"✅ {label}: settled in {elapsed:.2f}s across {len(self.processes)} processes, shares {shares}")
+                return True
+            if elapsed > timeout:
+                print(f"❌ {label}: not settled after {timeout}s ({problem})")
+                return False
+            await asyncio.sleep(0.1)
+
+
+async def main(processes, partitions, check_seconds):
+    pool = await open_pool()
+    simulation = Simulation(pool, partitions, check_seconds)
+    timeout = check_seconds * 10 + 10
+    ok = True
+    try:
+        for _ in range(processes):
+            await simulation.spawn()
+        ok &= await simulation.settle(f"start {processes} processes", timeout)
+
+        await simulation.spawn()
+        ok &= await simulation.settle("add a process", timeout)
+
+        victim = next(iter(simulation.processes.values()))
+        await simulation.remove(victim, signal.SIGKILL)
+        ok &= await simulation.settle("SIGKILL a process", timeout)
+
+        victim = next(iter(simulation.processes.values()))
+        await simulation.remove(victim, signal.SIGTERM)
+        ok &= await simulation.settle("SIGTERM a process", timeout)
+    finally:
+        for process in list(simulation.processes.values()):
+            process.kill()
+            await process.wait()
+        await pool.close()
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Exercise job runner leases with several local processes")
+    parser.add_argument("--processes", type=int, default=3)
+    parser.add_argument("--partitions", type=int, default=16)
+    parser.add_argument("--check-seconds", type=float, default=1.0)
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.worker:
+        asyncio.run(worker(args.partitions, args.check_seconds))
+    else:
+        asyncio.run(main(args.processes, args.partitions, args.check_seconds))
@@ -0,0 +1,40 @@
+# Check or rebuild the per-user task counters behind the /list summary.
+#
+#   python -m scripts.task_counters check     # report users whose counters drifted
+#   python -m scripts.task_counters rebuild   # recompute every user's counters from tasks
+
+import argparse
+import asyncio
+import sys
+from core.db import open_pool
+from core.task_counters import find_drift, rebuild
+
+if sys.platform == "win32":
+    asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
+
+
+async def main(action):
+    pool = await open_pool()
+    try:
+        if action == "check":
+            drift = await find_drift(pool)
+            for row in drift:
+                print(
+                    f"{row['user_id']}: total {row['stored_total']} (actual {row['actual_total']}), "
+                    f"done {row['stored_done']} (actual {row['actual_done']})"
+                )
+            print(f"{len(drift)} user(s) with drifted counters.")
+            return 1 if drift else 0
+        else:
+            count = await rebuild(pool)
+            print(f"Rebuilt counters for {count} user(s).")
+            return 0
+    finally:
+        await pool.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check or rebuild per-user task counters")
+    parser.add_argument("action", choices=["check", "rebuild"])
+    args = parser.parse_args()
+    sys.exit(asyncio.run(main(args.action)))